@@ -0,0 +1,69 @@
+"""Fleet backup collection: one router at a time versus ``fleet_backup``.
+
+Starts ``--routers`` fake routers (each with its own SSH server, latency
+and SFTP bandwidth) and collects a backup from all of them three times:
+one router at a time, with the default concurrency, and once more with
+the default ``max_age`` so every router is skipped. The pool is emptied
+between runs so every run pays for its logins. Archives go to a
+temporary data directory.
+
+Run from the repository root:
+
+    python benchmarks/bench_fleet_backup.py [--routers 40] [--latency 0.03] [--bandwidth 1e6]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import bench_routeros  # puts view/ on the path
+
+os.environ.setdefault("NETEZ_DATA_DIR", tempfile.mkdtemp(prefix="netez-bench-"))
+
+import connection_pool  # noqa: E402
+import fake_routeros  # noqa: E402
+import fleet  # noqa: E402
+import fleet_backup  # noqa: E402
+
+
+def timed_run(label, routers, **options):
+    connection_pool.get_pool().close_all()
+    started = time.perf_counter()
+    results = fleet_backup.collect_fleet(routers, "bench-%Y%m%d", **options)
+    elapsed = time.perf_counter() - started
+    counts = " ".join(f"{status}={count}" for status, count in sorted(fleet.summarize(results).items()))
+    size = sum(result.size for result in results if result.ok)
+    print(f"  {label:<28} {elapsed:8.2f}s  {size / 1024 / 1024:7.1f} MB  {counts}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet backup collection against fake routers")
+    parser.add_argument("--routers", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.03, help="seconds each router adds per request")
+    parser.add_argument("--bandwidth", type=float, default=1e6, help="SFTP bytes per second per router")
+    parser.add_argument("--backup-size", type=int, default=512 * 1024)
+    args = parser.parse_args()
+    bench_routeros._quiet_streamlit()
+
+    fakes = [fake_routeros.FakeRouter(latency=args.latency, bandwidth=args.bandwidth, queues=10,
+                                      backup_size=args.backup_size).start() for _ in range(args.routers)]
+    routers = [fleet.Router(f"r{number}", fake.host, fake.port, fake.username, fake.password)
+               for number, fake in enumerate(fakes)]
+    try:
+        print(f"{args.routers} fake routers, {args.latency * 1000:.0f} ms per request, "
+              f"{args.bandwidth / 1e6:.1f} MB/s SFTP each, {args.backup_size // 1024} KB backups\n")
+        sequential = timed_run("one router at a time", routers, max_parallel=1, max_transfers=1, max_age=0)
+        parallel = timed_run(f"parallel ({fleet_backup.MAX_PARALLEL}/{fleet_backup.MAX_TRANSFERS})", routers,
+                             max_age=0)
+        timed_run("rerun, recent ones skipped", routers)
+        print(f"\n  speedup {sequential / parallel:.1f}x; 500 routers would take about "
+              f"{parallel / args.routers * 500 / 60:.1f} min instead of {sequential / args.routers * 500 / 60:.0f} min")
+    finally:
+        connection_pool.get_pool().close_all()
+        for fake in fakes:
+            fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""End-to-end benchmarks against the fake RouterOS server.
+
+Starts ``fake_routeros.FakeRouter`` on localhost and measures, for the
+``view/*`` modules:
+
+* parse throughput of the router output they consume (terse tables,
+  batch markers, monitor frames, queue stats);
+* latency and round trips (exec channels, SFTP requests) of the actions
+  behind each page, with the server adding ``--latency`` per request and
+  the query cache cleared before every run;
+* round trips per page render, by running each registered page through
+  Streamlit's ``AppTest`` (skipped when Streamlit is not installed).
+
+Modules that cannot be imported here are reported as skipped. Save a run
+with ``--save`` and compare later runs with ``--compare`` to catch
+regressions: rows that got slower by more than ``--tolerance`` or need more
+round trips are flagged.
+
+Run from the repository root:
+
+    python benchmarks/bench_routeros.py [--latency 0.02] [--queues 1000] [--repeat 5]
+                                        [--only parse,actions,pages] [--save FILE] [--compare FILE]
+"""
+import argparse
+import importlib
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VIEW = os.path.join(HERE, "..", "view")
+sys.path.insert(0, VIEW)
+os.environ.setdefault("NETEZ_DATA_DIR", tempfile.mkdtemp(prefix="netez-bench-"))
+
+import connection_pool  # noqa: E402
+import executor  # noqa: E402
+import fake_routeros  # noqa: E402
+import pages  # noqa: E402
+import query_cache  # noqa: E402
+import storage  # noqa: E402
+import terse  # noqa: E402
+import traffic_monitor  # noqa: E402
+
+
+def _quiet_streamlit():
+    """Page modules call Streamlit outside a script run here, which warns on every call."""
+    try:
+        import streamlit.logger
+    except ImportError:
+        return
+    streamlit.logger.set_log_level("error")
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+
+
+def _optional(module):
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        return e
+
+
+def _throughput(parse, text, rows, repeat):
+    best = min(_timed(parse, text) for _ in range(repeat))
+    return rows / best, best
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+# -- parse throughput --------------------------------------------------------
+
+def parse_cases(client, router):
+    """(name, parse, text, rows) for router output captured from the fake server."""
+    queues = executor.execute(client, "/queue simple print terse", timeout=120).output
+    stats = executor.execute(client, "/queue simple print stats terse", timeout=120).output
+    addresses = executor.execute(client, "/ip address print terse", timeout=120).output
+    interfaces = executor.execute(client, "/interface print terse").output
+    names = [r.name for r in terse.iter_terse(interfaces, terse.InterfaceRecord)]
+    monitor = executor.execute(client, "/interface monitor-traffic interface="
+                               f"{executor.quote(','.join(names))} once").output + "\n\n"
+    commands = [f":put {n}" for n in range(1000)]
+    batch = executor.execute(client, executor.build_batch_script(commands, "bench"), timeout=120).output
+
+    cases = [
+        ("terse.parse_terse queues", lambda t: terse.parse_terse(t, terse.QueueRecord), queues,
+         router.state.tables["/queue simple"]),
+        ("terse.parse_terse addresses", lambda t: terse.parse_terse(t, terse.AddressRecord), addresses,
+         router.state.tables["/ip address"]),
+        ("traffic_monitor.queue_frame", traffic_monitor.queue_frame, stats, router.state.tables["/queue simple"]),
+        ("traffic_monitor.MonitorParser", lambda t: traffic_monitor.MonitorParser().feed(t), monitor, names),
+        ("executor.parse_batch_output", lambda t: executor.parse_batch_output(commands, "bench", t), batch,
+         commands),
+    ]
+    return [(name, parse, text, len(rows)) for name, parse, text, rows in cases]
+
+
+def bench_parse(client, router, repeat):
+    results = {}
+    print("\nParse throughput")
+    for name, parse, text, rows in parse_cases(client, router):
+        per_second, seconds = _throughput(parse, text, rows, repeat)
+        results[name] = {"rows_per_s": per_second, "ms": seconds * 1000}
+        print(f"  {name:<36} {rows:>7,} rows {seconds * 1000:8.2f} ms  {per_second:12,.0f} rows/s")
+    return results
+
+
+# -- actions -------------------------------------------------------------------
+
+def actions(router_key, router):
+    """(name, module, action(client)) for the work behind each page.
+
+    Write actions alternate between two targets so every repeat has the
+    same amount of work to do.
+    """
+    router_id = storage.router_id(router_key)
+    runs = itertools.count()
+
+    def ip_tables(client):
+        import ip_configuration
+        ip_configuration.load_tables(client)
+
+    def ip_apply(client):
+        import desired_state
+        state = desired_state.DesiredState(addresses={"ether3": [f"10.200.{next(runs) % 2}.1/24"]})
+        desired_state.apply(client, desired_state.plan(client, state), router_id)
+
+    def dns_read(client):
+        import dns
+        dns.current_servers(client)
+
+    def wifi_read(client):
+        import ssid_password
+        ssid_password.get_current_wifi_settings(client)
+
+    def queues_import(client):
+        import bulk_queues
+        step = next(runs) % 2
+        rows = [bulk_queues.QueueRow(f"10.50.{n >> 8 & 255}.{n & 255}", 5 + n % 10 + step, 10 + n % 20)
+                for n in range(500)]
+        bulk_queues.apply(client, bulk_queues.plan(rows, bulk_queues.fetch_queues(client)))
+
+    def block_push(client):
+        import blocklist
+        store = blocklist.get_store()
+        step = next(runs) % 2
+        store.replace(router_id, [f"site{n}-{step}.example.com" for n in range(2000)])
+        blocklist.sync(client, router_id, "dns")
+
+    def block_noop(client):
+        import blocklist
+        blocklist.sync(client, router_id, "dns")
+
+    def config_plan(client):
+        import desired_state
+        state = desired_state.DesiredState(dns={"servers": ["9.9.9.9"], "allow_remote_requests": True},
+                                           wireless={"wlan1": {"ssid": "NetEZ", "password": "password123"}})
+        desired_state.plan(client, state)
+
+    def accounting_poll(client):
+        import accounting
+        accounting.poll(client, accounting.Accountant())
+
+    def backup_roundtrip(client):
+        import backup_configuration
+        import waiters
+        executor.execute(client, "/system backup save name=bench", timeout=60)
+        with client.open_sftp() as sftp:
+            waiters.wait_for_stable_file(sftp, "/bench.backup", stable_polls=1)
+        for _ in backup_configuration.stream_backup(client, "bench.backup"):
+            pass
+
+    return [
+        ("IP Configuration: load tables", "ip_configuration", ip_tables),
+        ("IP Configuration: apply address", "desired_state", ip_apply),
+        ("DNS Configuration: read servers", "dns", dns_read),
+        ("SSID & Password: read settings", "ssid_password", wifi_read),
+        ("Bandwidth Fix: change 500 queues", "bulk_queues", queues_import),
+        ("Firewall Filtering: replace 2000 domains", "blocklist", block_push),
+        ("Firewall Filtering: re-sync unchanged", "blocklist", block_noop),
+        ("Apply Configuration: plan", "desired_state", config_plan),
+        ("Traffic Monitoring: poll queue stats", "accounting", accounting_poll),
+        ("Backup Configuration: save and download", "backup_configuration", backup_roundtrip),
+    ]
+
+
+def bench_actions(router_key, router, repeat):
+    results = {}
+    print(f"\nActions (server latency {router.latency * 1000:.0f} ms per request)")
+    print(f"  {'action':<42} {'median':>9} {'p95':>9} {'channels':>9} {'sftp':>6}")
+    for name, module, action in actions(router_key, router):
+        loaded = _optional(module)
+        if isinstance(loaded, Exception):
+            print(f"  {name:<42} skipped: {loaded}")
+            continue
+        timings, rounds = [], []
+        for _ in range(repeat):
+            with connection_pool.lease(router_key) as client:
+                query_cache.clear(client)
+                before = router.snapshot()
+                timings.append(_timed(action, client))
+            used = router.snapshot() - before
+            rounds.append((used["channels"], used["sftp_requests"]))
+        channels, sftp = rounds[-1]
+        median = statistics.median(timings)
+        p95 = sorted(timings)[max(0, round(len(timings) * 0.95) - 1)]
+        results[name] = {"ms": median * 1000, "p95_ms": p95 * 1000, "channels": channels, "sftp": sftp}
+        print(f"  {name:<42} {median * 1000:7.1f}ms {p95 * 1000:7.1f}ms {channels:>9} {sftp:>6}")
+    return results
+
+
+# -- page renders --------------------------------------------------------------
+
+def bench_pages(router_key, router, repeat):
+    print("\nPage renders (Streamlit AppTest)")
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError as e:
+        print(f"  skipped: {e}")
+        return {}
+
+    results = {}
+    main = os.path.join(VIEW, "main.py")
+    for page in pages.REGISTRY:
+        if page.name == "Logout":
+            continue
+        timings, rounds = [], []
+        for _ in range(repeat):
+            app = AppTest.from_file(main, default_timeout=60)
+            app.session_state["router"] = router_key
+            app.session_state["currentPage"] = page.name
+            app.session_state["connection_status"] = "🟢 Connected"
+            before = router.snapshot()
+            timings.append(_timed(app.run))
+            used = router.snapshot() - before
+            rounds.append((used["channels"], used["sftp_requests"]))
+            if app.exception:
+                print(f"  {page.name:<28} failed: {app.exception[0].message}")
+                break
+        traffic_monitor.stop_monitor(router_key)
+        if not rounds or len(rounds) < repeat:
+            continue
+        median = statistics.median(timings)
+        channels, sftp = rounds[-1]
+        results[page.name] = {"ms": median * 1000, "channels": channels, "sftp": sftp,
+                              "first_channels": rounds[0][0]}
+        print(f"  {page.name:<28} {median * 1000:8.1f} ms  round trips: first {rounds[0][0] + rounds[0][1]}, "
+              f"then {channels + sftp}")
+    return results
+
+
+# -- regression check ----------------------------------------------------------
+
+def compare(baseline, current, tolerance):
+    """Print rows that got slower than ``tolerance`` allows or need more round trips."""
+    regressions = 0
+    for section, rows in current.items():
+        for name, row in rows.items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                continue
+            problems = []
+            if "ms" in row and row["ms"] > old["ms"] * (1 + tolerance):
+                problems.append(f"{old['ms']:.1f} -> {row['ms']:.1f} ms")
+            for key in ("channels", "sftp"):
+                if row.get(key, 0) > old.get(key, 0):
+                    problems.append(f"{key} {old.get(key, 0)} -> {row[key]}")
+            if "rows_per_s" in row and row["rows_per_s"] < old["rows_per_s"] / (1 + tolerance):
+                problems.append(f"{old['rows_per_s']:,.0f} -> {row['rows_per_s']:,.0f} rows/s")
+            if problems:
+                regressions += 1
+                print(f"  REGRESSION {section}/{name}: {', '.join(problems)}")
+    print(f"\n{regressions} regression(s) against the baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks against the fake RouterOS server")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the server adds per request")
+    parser.add_argument("--queues", type=int, default=1000)
+    parser.add_argument("--addresses", type=int, default=200)
+    parser.add_argument("--interfaces", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default="parse,actions,pages")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+    sections = set(args.only.split(","))
+    _quiet_streamlit()
+
+    router = fake_routeros.FakeRouter(latency=args.latency, queues=args.queues, addresses=args.addresses,
+                                      interfaces=args.interfaces, monitor_interval=0.2).start()
+    results = {}
+    try:
+        key = connection_pool.get_pool().register(router.host, router.port, router.username, router.password)
+        print(f"Fake router on port {router.port}: {args.queues} queues, {args.addresses} addresses, "
+              f"{args.interfaces} interfaces")
+        if "parse" in sections:
+            with connection_pool.lease(key) as client:
+                results["parse"] = bench_parse(client, router, args.repeat)
+        if "actions" in sections:
+            results["actions"] = bench_actions(key, router, args.repeat)
+        if "pages" in sections:
+            results["pages"] = bench_pages(key, router, args.repeat)
+    finally:
+        connection_pool.get_pool().close_all()
+        router.stop()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), results, args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Configuration snapshot diffing on a large export.
+
+Builds a ``/export terse`` of about ``--lines`` lines with the fake
+router's interpreter (no SSH involved), changes a few items in the big
+queue section and elsewhere, and times:
+
+* storing both snapshots (``config_snapshots.SnapshotStore.add``)
+* diffing them warm and with the block cache emptied
+* ``diff_section`` on the two whole exports as plain line lists
+* ``difflib.unified_diff`` on the same texts, for reference
+
+Run from the repository root:
+
+    python benchmarks/bench_snapshots.py [--lines 50000] [--changes 5]
+"""
+import argparse
+import difflib
+import tempfile
+import time
+
+import bench_routeros  # puts view/ on the path
+import config_snapshots
+import fake_routeros
+
+
+def export(interpreter):
+    out = []
+    interpreter.write = out.append
+    interpreter.run("/export terse")
+    return "".join(out)
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot store and structural diff on a large export")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--changes", type=int, default=5, help="queues changed between the snapshots")
+    args = parser.parse_args()
+
+    state = fake_routeros.RouterState(queues=args.lines - 1000, addresses=500, interfaces=20, filters=300,
+                                      dns_static=170)
+    interpreter = fake_routeros.Interpreter(state, lambda text: None)
+    before = export(interpreter)
+    for number in range(args.changes):
+        interpreter.run(f"/queue simple set [find name=client-{number * 997}] max-limit=9M/9M")
+    interpreter.run("/queue simple remove [find name=client-7]")
+    interpreter.run("/queue simple add name=bench target=10.200.0.1/32 max-limit=1M/1M")
+    interpreter.run('/ip firewall filter set [find comment="rule 3"] action=drop')
+    interpreter.run("/ip dns set servers=9.9.9.9")
+    after = export(interpreter)
+
+    store = config_snapshots.SnapshotStore(tempfile.mktemp(suffix=".sqlite"))
+    print(f"Export: {len(after.splitlines()):,} lines, {len(after) / 1024 / 1024:.1f} MB\n")
+    add_first, (first, _) = timed(store.add, "bench", before)
+    add_second, (second, _) = timed(store.add, "bench", after)
+    blocks = store._fetch("SELECT COUNT(*), SUM(lines) FROM blocks")[0]
+    print(f"  {'store first snapshot':<34} {add_first:9.1f} ms")
+    print(f"  {'store second snapshot':<34} {add_second:9.1f} ms  ({blocks[0]} blocks, "
+          f"{blocks[1] - first.lines:,} new lines stored)")
+    warm, sections = timed(store.diff, first.id, second.id)
+    store._cache.clear()
+    cold, _ = timed(store.diff, first.id, second.id)
+    print(f"  {'diff, blocks cached':<34} {warm:9.2f} ms")
+    print(f"  {'diff, cache empty':<34} {cold:9.2f} ms")
+    whole, _ = timed(config_snapshots.diff_section, "/", before.splitlines(), after.splitlines())
+    print(f"  {'diff_section on whole exports':<34} {whole:9.1f} ms")
+    unified, _ = timed(lambda: list(difflib.unified_diff(before.splitlines(), after.splitlines(), lineterm="")))
+    print(f"  {'difflib.unified_diff':<34} {unified:9.1f} ms\n")
+    for section in sections:
+        print(f"  {section.path}: +{len(section.added)} -{len(section.removed)} ~{len(section.changed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Micro-benchmark for the ``print terse`` parser.
+
+Records tokenize their attributes on first use, so parsing alone and
+parsing plus reading the fields the old code read are timed separately.
+
+Run from the repository root:
+
+    python benchmarks/bench_terse.py [--rows 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "view"))
+
+import terse  # noqa: E402
+
+
+def queue_table(rows):
+    lines = []
+    for i in range(rows):
+        flags = " X" if i % 97 == 0 else "  "
+        lines.append(
+            f"{i:>5}{flags} name=\"client {i}\" target=10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}/32 "
+            f"parent=none packet-marks=\"\" priority=8/8 queue=default-small/default-small "
+            f"limit-at=0/0 max-limit={i % 50 + 1}M/{i % 80 + 1}M burst-limit=0/0 "
+            f"burst-threshold=0/0 burst-time=0s/0s bucket-size=0.1/0.1 comment=\"site \\\"A\\\" rack {i % 40}\""
+        )
+    return "\n".join(lines)
+
+
+def address_table(rows):
+    lines = []
+    for i in range(rows):
+        flags = " D" if i % 13 == 0 else "  "
+        lines.append(
+            f"{i:>5}{flags} address=10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}/24 "
+            f"network=10.{i >> 16 & 255}.{i >> 8 & 255}.0 interface=vlan{i % 4000} actual-interface=vlan{i % 4000}"
+        )
+    return "\n".join(lines)
+
+
+def naive_queue(text):
+    """The whitespace split + next() scan fix_bandwidth used before the parser."""
+    found = []
+    for line in text.split("\n"):
+        if "target=" in line and "max-limit=" in line:
+            parts = line.split()
+            ip = next((p.split("=")[1] for p in parts if p.startswith("target=")), None)
+            name = next((p.split("=")[1] for p in parts if p.startswith("name=")), None)
+            limit = next((p.split("=")[1] for p in parts if p.startswith("max-limit=")), None)
+            found.append((ip, name, limit))
+    return found
+
+
+def naive_address(text):
+    """The positional split ip_configuration.get_ip used before the parser."""
+    found = []
+    for line in text.split("\n"):
+        parts = line.split()
+        if len(parts) >= 4:
+            found.append((parts[1].split("=")[-1], parts[2].split("=")[-1], parts[3].split("=")[-1]))
+    return found
+
+
+def check_escapes():
+    """Quoted and escaped values must come out the same whichever way they are read."""
+    line = (r' 0 X name="caf\C3\A9 \"1\"" comment="tab\there\_x" path="c:\\tmp" '
+            r'label=caf\C3\A9 max-limit=1M/1M')
+    expected = {"name": 'café "1"', "comment": "tab\there x", "path": "c:\\tmp", "label": "café",
+                "max-limit": "1M/1M"}
+    record = terse.parse_line(line)
+    by_get = {key: record.get(key) for key in expected}
+    assert by_get == expected, by_get
+    assert record.attrs == expected, record.attrs
+    assert terse.unquote('"tab\\t"') == "tab\t"
+
+
+def timed(label, func, text, rows):
+    start = time.perf_counter()
+    result = func(text)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed * 1000:8.1f} ms  {rows / elapsed:12,.0f} rows/s  ({len(result)} rows)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="print terse parser against the old whitespace split")
+    parser.add_argument("--rows", type=int, default=100_000)
+    rows = parser.parse_args().rows
+    check_escapes()
+    for name, build, naive, record, fields in (
+        ("queue simple", queue_table, naive_queue, terse.QueueRecord,
+         lambda r: (r.get("target"), r.name, r.max_limit)),
+        ("ip address", address_table, naive_address, terse.AddressRecord,
+         lambda r: (r.address, r.network, r.interface)),
+    ):
+        text = build(rows)
+        print(f"{name}: {rows:,} rows, {len(text) / 1e6:.1f} MB")
+        old = timed("naive split (old)", naive, text, rows)
+        records = timed("terse.parse_terse", lambda t: terse.parse_terse(t, record), text, rows)
+        timed("parse_terse + same fields", lambda t: [fields(r) for r in terse.parse_terse(t, record)], text, rows)
+        timed("parse_terse + all attrs", lambda t: [r.attrs for r in terse.parse_terse(t, record)], text, rows)
+        print(f"  sample: {records[1]!r}")
+        if record is terse.QueueRecord:
+            wrong = sum(1 for (_, name, _), r in zip(old, records) if name != r.name)
+            print(f"  naive split got {wrong:,} of {rows:,} queue names wrong (quoted values)")
+        else:
+            wrong = sum(1 for (address, _, _), r in zip(old, records) if address != r.address)
+            print(f"  naive split got {wrong:,} of {rows:,} addresses wrong (flagged rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""SSH versus RouterOS API latency for the same page actions.
+
+Starts the fake router with both its SSH server and its API listener
+(``fake_routeros_api``) over one configuration, then runs every action
+from ``bench_routeros.actions`` through each transport: same commands,
+same executor entry points, query cache cleared before every run.
+Reports the median time and the round trips the instrumentation counted
+(SSH channel opens, API request waves) per transport.
+
+Actions the API cannot serve (backups need SFTP) are shown as ``n/a``.
+
+Run from the repository root:
+
+    python benchmarks/bench_transports.py [--latency 0.02] [--queues 1000] [--repeat 5]
+"""
+import argparse
+import statistics
+
+import bench_routeros  # puts view/ on the path
+import connection_pool
+import fake_routeros
+import fake_routeros_api
+import instrumentation
+import query_cache
+
+TRANSPORTS = ("ssh", "api")
+
+
+def run_action(key, action, repeat):
+    """Median seconds and round trips of the last run, or the error that stopped it."""
+    timings, round_trips = [], 0
+    for _ in range(repeat):
+        with connection_pool.lease(key) as client:
+            query_cache.clear(client)
+            with instrumentation.render("bench") as stats:
+                try:
+                    timings.append(bench_routeros._timed(action, client))
+                except Exception as e:
+                    return None, None, e
+            round_trips = stats.round_trips
+    return statistics.median(timings), round_trips, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH versus RouterOS API against the fake router")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds the server adds per request")
+    parser.add_argument("--queues", type=int, default=1000)
+    parser.add_argument("--addresses", type=int, default=200)
+    parser.add_argument("--interfaces", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench_routeros._quiet_streamlit()
+
+    router = fake_routeros.FakeRouter(latency=args.latency, queues=args.queues, addresses=args.addresses,
+                                      interfaces=args.interfaces, monitor_interval=0.2).start()
+    api = fake_routeros_api.FakeApiServer(router).start()
+    pool = connection_pool.get_pool()
+    try:
+        keys = {
+            "ssh": pool.register(router.host, router.port, router.username, router.password),
+            "api": pool.register(api.host, api.port, router.username, router.password, "api"),
+        }
+        print(f"Fake router: SSH on {router.port}, API on {api.port}, {args.latency * 1000:.0f} ms per request, "
+              f"{args.queues} queues, {args.addresses} addresses, {args.interfaces} interfaces\n")
+        print(f"  {'action':<42} {'ssh':>9} {'api':>9} {'speedup':>8} {'round trips':>12}")
+        per_transport = {transport: bench_routeros.actions(keys[transport], router) for transport in TRANSPORTS}
+        for position, (name, module, _) in enumerate(per_transport["ssh"]):
+            loaded = bench_routeros._optional(module)
+            if isinstance(loaded, Exception):
+                print(f"  {name:<42} skipped: {loaded}")
+                continue
+            rows = {}
+            for transport in TRANSPORTS:
+                action = per_transport[transport][position][2]
+                rows[transport] = run_action(keys[transport], action, args.repeat)
+            (ssh_s, ssh_rt, ssh_error), (api_s, api_rt, api_error) = rows["ssh"], rows["api"]
+            if ssh_error is not None:
+                print(f"  {name:<42} ssh failed: {ssh_error}")
+                continue
+            if api_error is not None:
+                print(f"  {name:<42} {ssh_s * 1000:7.1f}ms {'n/a':>9} {'':>8} {ssh_rt:>5} / -")
+                continue
+            print(f"  {name:<42} {ssh_s * 1000:7.1f}ms {api_s * 1000:7.1f}ms {ssh_s / api_s:7.1f}x "
+                  f"{ssh_rt:>5} / {api_rt}")
+    finally:
+        pool.close_all()
+        api.stop()
+        router.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,893 @@
+"""Local stand-in for a MikroTik router, for benchmarks and manual testing.
+
+Serves SSH exec channels and SFTP with paramiko and interprets the part
+of the RouterOS CLI that NetEZ sends:
+
+* ``print [stats] [terse] [where ...]``, ``add``, ``set``, ``remove``,
+  ``get``, ``find``, ``enable``, ``disable`` and ``export [terse]`` on the
+  menus in ``MENUS``, with ``[find ...]``, item names or item numbers as
+  selectors;
+* ``:put``, ``:local``/``:set``, ``:if``, ``:do ... on-error=``,
+  ``:while``, ``:delay`` and ``[...]`` sub-commands, which is all the
+  batched scripts of ``executor.execute_batch`` and the monitoring loops
+  need;
+* ``/system backup save``, which writes a file that SFTP can list, stat
+  and read, and ``/interface monitor-traffic``, which streams frames until
+  the channel is closed.
+
+Tables are generated in memory at the requested sizes. ``latency`` delays
+every exec channel and SFTP request by that many seconds, roughly one
+WAN round trip; ``bandwidth`` (bytes/s) throttles SFTP reads.
+
+``fake_routeros_api`` adds a RouterOS API listener over the same state.
+
+Run it on its own to point the app at it:
+
+    python benchmarks/fake_routeros.py [--port 2222] [--latency 0.05] [--queues 500]
+
+then log in to 127.0.0.1 on that port as admin / admin.
+"""
+import argparse
+import collections
+import ipaddress
+import os
+import random
+import socket
+import stat
+import threading
+import time
+
+import paramiko
+
+VERBS = {"print", "add", "set", "remove", "get", "find", "enable", "disable", "save", "monitor-traffic", "export"}
+YES = {"yes", "true"}
+
+# Attributes a new item starts with, per menu; None marks a table without unique names
+MENUS = {
+    "/interface": {"type": "ether", "mtu": "1500", "comment": None},
+    "/interface wireless": {"mode": "ap-bridge", "band": "2ghz-b/g/n", "security-profile": "default"},
+    "/interface wireless security-profiles": {"mode": "none", "authentication-types": "",
+                                              "wpa2-pre-shared-key": ""},
+    "/ip address": {},
+    "/ip dns static": {"ttl": "1d"},
+    "/ip firewall filter": {"action": "accept"},
+    "/ip firewall layer7-protocol": {},
+    "/queue simple": {"parent": "none", "priority": "8/8", "queue": "default-small/default-small",
+                      "limit-at": "0/0", "max-limit": "0/0"},
+    "/file": {"type": "file"},
+}
+UNIQUE_NAMES = {"/interface", "/interface wireless", "/interface wireless security-profiles",
+                "/ip firewall layer7-protocol", "/queue simple", "/file"}
+SETTINGS = {"/ip dns", "/system identity"}       # menus that are a single set of values
+EXPORT_ORDER = ["/interface wireless security-profiles", "/interface wireless", "/ip address", "/ip dns",
+                "/ip dns static", "/ip firewall layer7-protocol", "/ip firewall filter", "/queue simple",
+                "/system identity"]
+READ_ONLY = {"/ip address": {"actual-interface", "network"}, "/interface wireless": {"name"}}
+
+
+class CommandError(Exception):
+    """A RouterOS runtime error; ``:do { } on-error={ }`` catches it."""
+
+
+class Item:
+    """One row of a menu: stable id, attributes and flag letters."""
+
+    __slots__ = ("id", "attrs", "flags", "data", "counters")
+
+    def __init__(self, item_id, attrs, flags=""):
+        self.id = item_id
+        self.attrs = attrs
+        self.flags = flags
+        self.data = b""                 # file contents, for /file
+        self.counters = None            # queue statistics, for /queue simple
+
+    def value(self, key):
+        value = self.attrs.get(key)
+        if value is not None:
+            return value
+        if key == "disabled":
+            return "yes" if "X" in self.flags else "no"
+        if key == "dynamic":
+            return "yes" if "D" in self.flags else "no"
+        if key == "running":
+            return "yes" if "R" in self.flags else "no"
+        if key == "default":
+            return "yes" if "*" in self.flags else "no"
+        if key == ".id":
+            return f"*{self.id:X}"
+        return None
+
+
+class RouterState:
+    """Configuration of the fake router, generated at the requested table sizes."""
+
+    def __init__(self, interfaces=8, addresses=8, queues=50, dns_static=0, filters=5,
+                 backup_size=256 * 1024, seed=0):
+        self.lock = threading.RLock()
+        self.random = random.Random(seed)
+        self.tables = {menu: [] for menu in MENUS}
+        self.settings = {
+            "/ip dns": {"servers": "8.8.8.8,1.1.1.1", "allow-remote-requests": "no", "cache-size": "2048KiB"},
+            "/system identity": {"name": "NetEZ-Fake"},
+        }
+        self._next_id = 1
+        self.backup_size = backup_size
+        self._backup = bytes(self.random.getrandbits(8) for _ in range(min(backup_size, 4096))) * (
+            backup_size // 4096 + 1)
+        self.backups = 0
+
+        for n in range(1, interfaces + 1):
+            self.add("/interface", {"name": f"ether{n}", "default-name": f"ether{n}",
+                                    "mac-address": f"AA:BB:CC:00:00:{n:02X}"}, "R" if n <= 2 else "")
+        self.add("/interface", {"name": "wlan1", "default-name": "wlan1", "type": "wlan"}, "R")
+        self.add("/interface wireless", {"name": "wlan1", "default-name": "wlan1", "ssid": "NetEZ"})
+        self.add("/interface wireless security-profiles",
+                 {"name": "default", "mode": "dynamic-keys", "authentication-types": "wpa2-psk",
+                  "wpa2-pre-shared-key": "password123"}, "*")
+        self.add("/ip address", {"address": "192.168.88.1/24", "interface": "ether1"}, "D")
+        for n in range(1, addresses):
+            self.add("/ip address", {"address": f"10.{n >> 8 & 255}.{n & 255}.1/24",
+                                     "interface": f"ether{n % interfaces + 1}"})
+        for n in range(queues):
+            self.add("/queue simple", {"name": f"client-{n}",
+                                       "target": f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}/32",
+                                       "max-limit": f"{n % 50 + 1}M/{n % 80 + 1}M"})
+        for n in range(dns_static):
+            self.add("/ip dns static", {"name": f"host{n}.example.lan", "address": f"10.9.{n >> 8 & 255}.{n & 255}"})
+        for n in range(filters):
+            self.add("/ip firewall filter", {"chain": "input" if n % 2 else "forward",
+                                             "action": "accept", "comment": f"rule {n}"})
+
+    # -- tables ------------------------------------------------------------
+
+    def add(self, menu, attrs, flags=""):
+        defaults = {k: v for k, v in MENUS[menu].items() if v is not None and k not in attrs}
+        item = Item(self._next_id, {**attrs, **defaults}, flags)
+        self._next_id += 1
+        if menu == "/ip address":
+            interface = ipaddress.ip_interface(item.attrs["address"])
+            item.attrs["network"] = str(interface.network.network_address)
+            item.attrs["actual-interface"] = item.attrs.get("interface", "")
+        self.tables[menu].append(item)
+        return item
+
+    def by_name(self, menu, name):
+        return next((item for item in self.tables[menu] if item.attrs.get("name") == name), None)
+
+    def save_backup(self, name):
+        """Write ``name.backup``; successive backups share most of their bytes, like real ones."""
+        self.backups += 1
+        stamp = f"backup {self.backups} {time.time()}".encode()
+        data = stamp + self._backup[len(stamp):self.backup_size]
+        item = self.by_name("/file", f"{name}.backup") or self.add("/file", {"name": f"{name}.backup",
+                                                                            "type": "backup"})
+        item.data = data
+        item.attrs["size"] = str(len(data))
+        return item
+
+    def queue_stats(self, item, now):
+        """Advance a queue's byte counters to ``now`` at a random share of its max-limit."""
+        if item.counters is None:
+            item.counters = {"time": now, "bytes": [0, 0], "packets": [0, 0], "rate": [0, 0]}
+        counters = item.counters
+        elapsed = now - counters["time"]
+        limits = [_rate(part) for part in item.attrs.get("max-limit", "0/0").split("/")] + [0]
+        for side in (0, 1):
+            rate = int((limits[side] or 10_000_000) * self.random.random() * 0.8)
+            counters["rate"][side] = rate
+            counters["bytes"][side] += int(rate * elapsed / 8)
+            counters["packets"][side] += int(rate * elapsed / 8 / 1000)
+        counters["time"] = now
+        return counters
+
+
+def _rate(value):
+    value = value.strip()
+    multiplier = {"k": 1000, "M": 1000 ** 2, "G": 1000 ** 3}.get(value[-1:], 1)
+    try:
+        return int(float(value[:-1] if multiplier > 1 else value or 0) * multiplier)
+    except ValueError:
+        return 0
+
+
+def _format_rate(bits, unit="bps"):
+    for suffix, size in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if bits >= size:
+            return f"{bits / size:.1f}{suffix}{unit}"
+    return f"{bits}{unit}"
+
+
+def _split(text, separators):
+    """Split ``text`` on ``separators`` that are outside quotes and brackets."""
+    parts, depth, quoted, escaped, start = [], 0, False, False, 0
+    for position, char in enumerate(text):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif quoted:
+            quoted = char != '"'
+        elif char == '"':
+            quoted = True
+        elif char in "[{(":
+            depth += 1
+        elif char in "]})":
+            depth -= 1
+        elif depth == 0 and char in separators:
+            parts.append(text[start:position])
+            start = position + 1
+    if quoted or depth:
+        raise CommandError(f"syntax error (line 1 column {len(text)})")
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _unquote(value):
+    if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+        return value
+    out, chars = [], iter(value[1:-1])
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            char = {"n": "\n", "r": "\r", "t": "\t", "_": " "}.get(char, char)
+        out.append(char)
+    return "".join(out)
+
+
+def _is_option(word):
+    return "=" in word and word[:1] not in '"[{($'
+
+
+def _quote(value):
+    if value and not any(char in value for char in ' "\\$?;=[]{}\t\n'):
+        return value
+    for char in ("\\", '"', "$", "?"):
+        value = value.replace(char, "\\" + char)
+    return f'"{value}"'
+
+
+class Interpreter:
+    """Runs one exec request against a ``RouterState``.
+
+    ``write`` receives output text; ``closed`` tells long-running commands
+    (``:while``, ``monitor-traffic``) that the client has gone away.
+    """
+
+    def __init__(self, state, write, closed=lambda: False, monitor_interval=1.0):
+        self.state = state
+        self.write = write
+        self.closed = closed
+        self.monitor_interval = monitor_interval
+        self.variables = {}
+        self.statements = 0
+        self.depth = 0                  # > 0 while evaluating a [...] sub-command
+        self.menu = []                  # menu path that bare commands such as "find" run in
+
+    def run(self, script):
+        value = None
+        for statement in _split(script, ";\n"):
+            if self.closed():
+                break
+            value = self.statement(statement)
+        return value
+
+    def statement(self, text):
+        self.statements += 1
+        words = _split(text, " \t")
+        if words[0].startswith(":"):
+            return self.builtin(words[0][1:], words[1:])
+        if words[0].startswith("/"):
+            with self.state.lock:
+                return self.menu_command(words)
+        if words[0] in VERBS and self.menu:
+            with self.state.lock:
+                return self.menu_command(["/" + self.menu[0]] + self.menu[1:] + words)
+        raise CommandError(f"bad command name {words[0]}")
+
+    # -- values ------------------------------------------------------------
+
+    def value(self, token):
+        if token.startswith("["):
+            self.depth += 1
+            try:
+                result = self.run(token[1:-1])
+            finally:
+                self.depth -= 1
+            return "" if result is None else result
+        if token.startswith("("):
+            return self.value(token[1:-1].strip())
+        if token.startswith("$"):
+            return self.variables.get(token[1:], "")
+        return _unquote(token)
+
+    @staticmethod
+    def text(value):
+        if isinstance(value, list):
+            return ";".join(item.value(".id") for item in value)
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+
+    def truthy(self, token):
+        value = self.value(token)
+        return value is True or str(value) in YES
+
+    def block(self, token):
+        if not token.startswith("{"):
+            raise CommandError("expected {")
+        return self.run(token[1:-1])
+
+    # -- scripting ---------------------------------------------------------
+
+    def builtin(self, name, args):
+        options = dict(arg.split("=", 1) for arg in args if _is_option(arg))
+        positional = [arg for arg in args if not _is_option(arg)]
+        if name == "put":
+            self.write(self.text(self.value(positional[0]) if positional else "") + "\r\n")
+        elif name in ("local", "global", "set"):
+            value = self.value(positional[1]) if len(positional) > 1 else ""
+            self.variables[positional[0]] = {"true": True, "false": False}.get(value, value)
+        elif name == "if":
+            branch = options.get("do") if self.truthy(positional[0]) else options.get("else")
+            if branch:
+                self.block(branch)
+        elif name == "do":
+            try:
+                self.block(positional[0])
+            except CommandError:
+                if "on-error" not in options:
+                    raise
+                self.block(options["on-error"])
+        elif name == "while":
+            while not self.closed() and self.truthy(positional[0]):
+                self.block(options["do"])
+        elif name == "delay":
+            self.delay(positional[0] if positional else "1s")
+        elif name == "len":
+            value = self.value(positional[0])
+            return len(value) if isinstance(value, (list, str)) else 0
+        else:
+            raise CommandError(f"bad command name :{name}")
+
+    def delay(self, text):
+        seconds = float(text[:-2]) / 1000 if text.endswith("ms") else float(text.rstrip("s") or 1)
+        self.write(None)                                  # flush before going quiet
+        end = time.monotonic() + seconds
+        while not self.closed() and time.monotonic() < end:
+            time.sleep(min(0.05, max(0.0, end - time.monotonic())))
+
+    # -- menus -------------------------------------------------------------
+
+    def menu_command(self, words):
+        path = [words[0].lstrip("/")] if words[0] != "/" else []
+        rest = words[1:]
+        if path and path[0] in VERBS:
+            rest = words[:]
+            rest[0] = path.pop()
+        while rest and rest[0] not in VERBS:
+            path.append(rest.pop(0))
+        if not rest:
+            raise CommandError("bad command name")
+        menu = "/" + " ".join(path)
+        verb, args = rest[0], rest[1:]
+        outer, self.menu = self.menu, path
+        try:
+            return self._menu_command(menu, path, verb, args)
+        finally:
+            self.menu = outer
+
+    def _menu_command(self, menu, path, verb, args):
+        where = []
+        if "where" in args:
+            position = args.index("where")
+            args, where = args[:position], args[position + 1:]
+        options = {}
+        positional = []
+        for arg in args:
+            if _is_option(arg):
+                key, value = arg.split("=", 1)
+                options[key] = self.value(value)
+            else:
+                positional.append(arg)
+
+        if verb == "export":
+            return self.export(menu if path else None, "terse" in positional)
+        if menu == "/system backup" and verb == "save":
+            self.state.save_backup(options.get("name") or f"backup{self.state.backups + 1}")
+            self.write("Configuration backup saved\r\n")
+            return None
+        if menu == "/interface" and verb == "monitor-traffic":
+            return self.monitor(options, positional)
+        if menu in SETTINGS:
+            return self.settings(menu, verb, options, positional)
+        if menu not in self.state.tables:
+            raise CommandError(f"bad command name {' '.join(path)}")
+
+        table = self.state.tables[menu]
+        if verb == "print":
+            return self.print(menu, table, positional, where)
+        if verb == "find":
+            conditions = self.conditions(args + where)
+            return [item for item in table if self.matches(item, conditions)]
+        if verb == "add":
+            return self.add(menu, table, options)
+        targets = self.select(menu, table, options.pop("numbers", None) or (positional[0] if positional else None))
+        if verb == "get":
+            if not targets or len(positional) < 2:
+                raise CommandError("no such item")
+            value = targets[0].value(positional[1])
+            if value is None:
+                raise CommandError(f"no such property {positional[1]}")
+            if not self.depth:
+                self.write(f"{value}\r\n")            # typed at the prompt: print it
+            return value
+        if verb == "remove":
+            for item in targets:
+                table.remove(item)
+        elif verb in ("enable", "disable"):
+            for item in targets:
+                item.flags = item.flags.replace("X", "") + ("X" if verb == "disable" else "")
+        elif verb == "set":
+            disabled = options.pop("disabled", None)
+            for item in targets:
+                if "name" in options and menu in UNIQUE_NAMES:
+                    other = self.state.by_name(menu, options["name"])
+                    if other is not None and other is not item:
+                        raise CommandError("failure: already have such name")
+                item.attrs.update(options)
+                if disabled is not None:
+                    item.flags = item.flags.replace("X", "") + ("X" if disabled in YES else "")
+        return None
+
+    def select(self, menu, table, selector):
+        if selector is None:
+            raise CommandError("expected item number")
+        value = self.value(selector) if selector[:1] in "[$" else _unquote(selector)
+        if isinstance(value, list):
+            return value
+        items = []
+        for part in str(value).split(","):
+            if part.isdigit():
+                if int(part) >= len(table):
+                    raise CommandError("no such item")
+                items.append(table[int(part)])
+                continue
+            if part.startswith("*"):
+                wanted = int(part[1:], 16)
+                item = next((i for i in table if i.id == wanted), None)
+            else:
+                item = next((i for i in table if i.attrs.get("name") == part), None)
+            if item is None:
+                raise CommandError("no such item")
+            items.append(item)
+        return items
+
+    def conditions(self, words):
+        """Compile ``key=value and key!=value ...`` into ``[(key, negated, wanted), ...]``."""
+        compiled = []
+        for word in words:
+            if word in ("and", "where"):
+                continue
+            negated = "!=" in word
+            key, sep, value = word.partition("!=" if negated else "=")
+            if not sep:
+                continue                                # bare flags such as "dynamic" are ignored
+            wanted = self.text(self.value(value))
+            if key in ("disabled", "dynamic", "running", "default"):
+                wanted = "yes" if wanted in YES else "no"
+            compiled.append((key, negated, wanted))
+        return compiled
+
+    @staticmethod
+    def matches(item, conditions):
+        for key, negated, wanted in conditions:
+            if (item.value(key) == wanted) == negated:
+                return False
+        return True
+
+    def add(self, menu, table, options):
+        disabled = options.pop("disabled", "no") in YES
+        if menu in UNIQUE_NAMES:
+            if "name" not in options:
+                options["name"] = f"{menu.rsplit(' ', 1)[-1].rstrip('s')}{len(table) + 1}"
+            if self.state.by_name(menu, options["name"]) is not None:
+                raise CommandError("failure: already have such name")
+        if menu == "/ip address":
+            if "address" not in options or "interface" not in options:
+                raise CommandError("failure: address and interface are required")
+            if self.state.by_name("/interface", options["interface"]) is None:
+                raise CommandError("input does not match any value of interface")
+            try:
+                ipaddress.ip_interface(options["address"])
+            except ValueError:
+                raise CommandError(f"invalid value for argument address: {options['address']}")
+        if menu == "/queue simple" and "target" not in options:
+            raise CommandError("failure: target is required")
+        item = self.state.add(menu, options, "X" if disabled else "")
+        return [item]
+
+    def print(self, menu, table, words, where):
+        terse = "terse" in words
+        stats = "stats" in words
+        now = time.time()
+        lines = []
+        where = self.conditions(where)
+        for number, item in enumerate(table):
+            if where and not self.matches(item, where):
+                continue
+            if stats and menu == "/queue simple":
+                counters = self.state.queue_stats(item, now)
+                attrs = {"name": item.attrs["name"], "target": item.attrs["target"],
+                         "rate": "/".join(map(str, counters["rate"])),
+                         "packet-rate": "/".join(str(rate // 8000) for rate in counters["rate"]),
+                         "queued-bytes": "0/0", "queued-packets": "0/0",
+                         "bytes": "/".join(map(str, counters["bytes"])),
+                         "packets": "/".join(map(str, counters["packets"])), "dropped": "0/0"}
+            else:
+                attrs = {key: value for key, value in item.attrs.items() if key != "default-name"}
+            pairs = " ".join(f"{key}={_quote(str(value))}" for key, value in attrs.items())
+            flags = item.flags
+            lines.append(f"{number:>2} {flags} {pairs}" if terse else f"{number:>2} {flags:<2} {pairs}")
+        if "count-only" in words:
+            lines = [str(len(lines))]
+        self.write("".join(line + "\r\n" for line in lines))
+        return None
+
+    def settings(self, menu, verb, options, positional):
+        values = self.state.settings[menu]
+        if verb == "get":
+            if not positional or positional[0] not in values:
+                raise CommandError("no such property")
+            if not self.depth:
+                self.write(f"{values[positional[0]]}\r\n")
+            return values[positional[0]]
+        if verb == "set":
+            unknown = set(options) - set(values)
+            if unknown:
+                raise CommandError(f"expected end of command (line 1 column {len(menu)})")
+            values.update(options)
+            return None
+        if verb == "print":
+            width = max(map(len, values)) + 1
+            self.write("".join(f"{key + ':':>{width}} {value}\r\n" for key, value in values.items()))
+            return None
+        raise CommandError(f"bad command name {verb}")
+
+    def export(self, menu, terse):
+        lines = []
+        for section in EXPORT_ORDER:
+            if menu and section != menu:
+                continue
+            if section in SETTINGS:
+                values = self.state.settings[section]
+                lines.append((section, "set " + " ".join(f"{k}={_quote(v)}" for k, v in sorted(values.items()))))
+                continue
+            hidden = READ_ONLY.get(section, set())
+            for item in self.state.tables[section]:
+                if "D" in item.flags:
+                    continue
+                attrs = {k: v for k, v in item.attrs.items() if k not in hidden and k != "default-name"}
+                if "X" in item.flags:
+                    attrs["disabled"] = "yes"
+                pairs = " ".join(f"{k}={_quote(str(v))}" for k, v in attrs.items())
+                if "default-name" in item.attrs or "*" in item.flags:
+                    finder = (f"default-name={item.attrs['default-name']}" if "default-name" in item.attrs
+                              else "default=yes")
+                    lines.append((section, f"set [ find {finder} ] {pairs}"))
+                else:
+                    lines.append((section, f"add {pairs}"))
+        out = []
+        current = None
+        for section, line in lines:
+            if terse:
+                out.append(f"{section} {line}")
+                continue
+            if section != current:
+                out.append(section)
+                current = section
+            out.append(line)
+        self.write("".join(line + "\r\n" for line in out))
+        return None
+
+    def monitor(self, options, words):
+        names = [name for name in str(options.get("interface", "")).split(",") if name]
+        for name in names:
+            if self.state.by_name("/interface", name) is None:
+                raise CommandError("input does not match any value of interface")
+        rows = dict((key, []) for key in (
+            "name", "rx-packets-per-second", "rx-bits-per-second", "fp-rx-packets-per-second",
+            "tx-packets-per-second", "tx-bits-per-second", "fp-tx-packets-per-second"))
+        while not self.closed():
+            for values in rows.values():
+                values.clear()
+            for name in names:
+                rx, tx = (self.state.random.randint(0, 200_000_000) for _ in range(2))
+                rows["name"].append(name)
+                rows["rx-packets-per-second"].append(str(rx // 8000))
+                rows["rx-bits-per-second"].append(_format_rate(rx))
+                rows["fp-rx-packets-per-second"].append("0")
+                rows["tx-packets-per-second"].append(str(tx // 8000))
+                rows["tx-bits-per-second"].append(_format_rate(tx))
+                rows["fp-tx-packets-per-second"].append("0")
+            self.write("".join(f"{key + ':':>26} " + " ".join(f"{v:>12}" for v in values) + "\r\n"
+                               for key, values in rows.items()) + "\r\n")
+            if "once" in words:
+                break
+            self.delay(f"{self.monitor_interval}s")
+        return None
+
+
+# -- SSH -------------------------------------------------------------------
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def host_key():
+    """One RSA host key per process; generating it takes a moment."""
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self, router):
+        self.router = router
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.router.username, self.router.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.router._exec, args=(channel, command.decode(errors="replace")),
+                         name="fake-routeros-exec", daemon=True).start()
+        return True
+
+
+class _Handle(paramiko.SFTPHandle):
+    def __init__(self, router, item):
+        super().__init__()
+        self.router = router
+        self.item = item
+
+    def read(self, offset, length):
+        data = self.item.data[offset:offset + length]
+        self.router._sftp_read(len(data))
+        return data
+
+    def stat(self):
+        return _attributes(self.item)
+
+
+def _attributes(item):
+    attributes = paramiko.SFTPAttributes()
+    attributes.filename = item.attrs["name"]
+    attributes.st_size = len(item.data)
+    attributes.st_mode = stat.S_IFREG | 0o644
+    attributes.st_mtime = int(time.time())
+    return attributes
+
+
+class _Sftp(paramiko.SFTPServerInterface):
+    """SFTP view of the router's ``/file`` table: list, stat, read and remove."""
+
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.router = server.router
+
+    def session_started(self):
+        self.router._count(sftp_sessions=1)
+
+    def _item(self, path):
+        self.router._sftp_request()
+        with self.router.state.lock:
+            return self.router.state.by_name("/file", path.strip("/"))
+
+    def list_folder(self, path):
+        self.router._sftp_request()
+        with self.router.state.lock:
+            return [_attributes(item) for item in self.router.state.tables["/file"]]
+
+    def stat(self, path):
+        if path.strip("/") == "":
+            attributes = paramiko.SFTPAttributes()
+            attributes.st_mode = stat.S_IFDIR | 0o755
+            return attributes
+        item = self._item(path)
+        return paramiko.SFTP_NO_SUCH_FILE if item is None else _attributes(item)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            return paramiko.SFTP_PERMISSION_DENIED
+        item = self._item(path)
+        if item is None:
+            return paramiko.SFTP_NO_SUCH_FILE
+        handle = _Handle(self.router, item)
+        handle.filename = path
+        return handle
+
+    def remove(self, path):
+        item = self._item(path)
+        if item is None:
+            return paramiko.SFTP_NO_SUCH_FILE
+        with self.router.state.lock:
+            self.router.state.tables["/file"].remove(item)
+        return paramiko.SFTP_OK
+
+    def canonicalize(self, path):
+        return "/" + path.strip("/")
+
+
+class FakeRouter:
+    """A fake RouterOS SSH server listening on localhost.
+
+    ``stats`` counts what clients cost the router: ``channels`` (exec
+    requests, i.e. round trips), ``statements`` run, ``sftp_sessions``,
+    ``sftp_requests`` and ``bytes_sent``. Use as a context manager or call
+    ``start``/``stop``.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, username="admin", password="admin",
+                 latency=0.0, bandwidth=None, monitor_interval=1.0, **sizes):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.monitor_interval = monitor_interval
+        self.state = RouterState(**sizes)
+        self.stats = collections.Counter()
+        self._stats_lock = threading.Lock()
+        self._socket = None
+        self._transports = []
+        self._stopping = threading.Event()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        host_key()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(64)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="fake-routeros", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._socket is not None:
+            self._socket.close()
+        for transport in self._transports:
+            transport.close()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats.clear()
+
+    def snapshot(self):
+        with self._stats_lock:
+            return collections.Counter(self.stats)
+
+    def _count(self, **amounts):
+        with self._stats_lock:
+            self.stats.update(amounts)
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection,), name="fake-routeros-ssh", daemon=True).start()
+
+    def _serve(self, connection):
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(connection)
+        transport.add_server_key(host_key())
+        transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _Sftp)
+        self._transports = [t for t in self._transports if t.is_active()] + [transport]
+        self._count(connections=1)
+        try:
+            transport.start_server(server=_Server(self))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+    def _sftp_request(self):
+        self._count(sftp_requests=1)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _sftp_read(self, size):
+        # Reads are pipelined by the client, so they cost bandwidth rather than a round trip each
+        self._count(sftp_requests=1, bytes_sent=size)
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def _exec(self, channel, command):
+        self._count(channels=1)
+        if self.latency:
+            time.sleep(self.latency)
+        buffer = []
+        pending = [0]
+
+        def flush():
+            if buffer:
+                data = "".join(buffer).encode()
+                buffer.clear()
+                pending[0] = 0
+                channel.sendall(data)
+                self._count(bytes_sent=len(data))
+
+        def write(text):
+            if text is None:
+                flush()
+                return
+            buffer.append(text)
+            pending[0] += len(text)
+            if pending[0] >= 32768:
+                flush()
+
+        interpreter = Interpreter(self.state, write, closed=lambda: channel.closed or self._stopping.is_set(),
+                                  monitor_interval=self.monitor_interval)
+        status = 0
+        try:
+            try:
+                interpreter.run(command)
+            except CommandError as e:
+                flush()
+                channel.sendall_stderr(f"{e}\r\n".encode())
+                status = 1
+            flush()
+            channel.send_exit_status(status)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass                                           # the client went away mid-stream
+        finally:
+            self._count(statements=interpreter.statements)
+            # Leave closing to the client: a close sent now could overtake the
+            # reply to its exec request, which paramiko reports as "Channel closed"
+            channel.shutdown_write()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="SFTP bytes per second")
+    for table, default in (("interfaces", 8), ("addresses", 8), ("queues", 50), ("dns-static", 0)):
+        parser.add_argument(f"--{table}", type=int, default=default)
+    parser.add_argument("--backup-size", type=int, default=256 * 1024)
+    args = parser.parse_args()
+
+    router = FakeRouter(args.host, args.port, latency=args.latency, bandwidth=args.bandwidth,
+                        interfaces=args.interfaces, addresses=args.addresses, queues=args.queues,
+                        dns_static=args.dns_static, backup_size=args.backup_size).start()
+    print(f"Fake RouterOS on {router.host}:{router.port} (admin / admin), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        router.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""RouterOS API (port 8728) listener for the fake router in ``fake_routeros``.
+
+Speaks the binary API protocol over the same ``RouterState`` as the SSH
+server, so both transports see one configuration:
+
+* ``/login`` with ``=name=``/``=password=``;
+* ``print`` with ``?key=value`` queries, ``=.proplist=`` and ``=stats=``,
+  and ``add``, ``set``, ``remove``, ``enable``, ``disable`` by ``=.id=``
+  on the tables of ``fake_routeros.MENUS`` and the settings menus;
+* ``/system/backup/save`` and ``/interface/monitor-traffic``, which
+  streams ``!re`` rows until ``/cancel``.
+
+Writes go through the SSH interpreter, so validation errors come back as
+``!trap`` with the same messages. Every reply is delayed by the router's
+``latency`` after its request arrived, but requests are answered
+independently, so a pipelined batch costs one round trip rather than one
+per sentence.
+
+Run it on its own together with the SSH server:
+
+    python benchmarks/fake_routeros_api.py [--port 8728] [--ssh-port 2222] [--latency 0.05]
+"""
+import argparse
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "view"))
+
+import routeros_api  # noqa: E402
+from fake_routeros import (MENUS, SETTINGS, CommandError, FakeRouter, Interpreter,  # noqa: E402
+                           _quote)
+
+# Flags the API reports as boolean attributes, per menu (all menus report disabled and dynamic)
+FLAG_ATTRS = {"disabled": "X", "dynamic": "D"}
+MENU_FLAGS = {"/interface": {"running": "R"}, "/interface wireless security-profiles": {"default": "*"}}
+
+
+def _api_value(value):
+    value = str(value)
+    return {"yes": "true", "no": "false"}.get(value, value)
+
+
+def item_row(menu, item):
+    """An item as the API reports it: ``.id``, attributes, flags as booleans, true/false not yes/no."""
+    row = {".id": item.value(".id")}
+    row.update((key, _api_value(value)) for key, value in item.attrs.items())
+    for key, letter in {**FLAG_ATTRS, **MENU_FLAGS.get(menu, {})}.items():
+        row[key] = "true" if letter in item.flags else "false"
+    return row
+
+
+def stats_row(state, item, now):
+    counters = state.queue_stats(item, now)
+    return {".id": item.value(".id"), "name": item.attrs["name"], "target": item.attrs["target"],
+            "rate": "/".join(map(str, counters["rate"])),
+            "packet-rate": "/".join(str(rate // 8000) for rate in counters["rate"]),
+            "queued-bytes": "0/0", "queued-packets": "0/0",
+            "bytes": "/".join(map(str, counters["bytes"])),
+            "packets": "/".join(map(str, counters["packets"])), "dropped": "0/0"}
+
+
+def _compile(queries):
+    """``?key=value``, ``?key`` (has it) and ``?-key`` (lacks it) as ``[(key, test, wanted), ...]``."""
+    compiled = []
+    for query in queries:
+        key, sep, value = query.partition("=")
+        if key.startswith("-"):
+            compiled.append((key[1:], "absent", None))
+        elif sep:
+            compiled.append((key, "equal", {"true": "yes", "false": "no"}.get(value, value)))
+        else:
+            compiled.append((key, "present", None))
+    return compiled
+
+
+def _matches(item, compiled):
+    for key, test, wanted in compiled:
+        actual = item.attrs.get(key)
+        if actual is None:
+            actual = item.value(key)
+        if test == "equal" and actual != wanted or (actual is None) != (test == "absent"):
+            return False
+    return True
+
+
+class _Trap(Exception):
+    def __init__(self, message, category=None):
+        super().__init__(message)
+        self.category = category
+
+
+class _Connection:
+    """One API client: a reader answering sentences and a sender that applies the latency."""
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.router = server.router
+        self.sock = sock
+        self.outbox = queue.Queue()
+        self.logged_in = False
+        self.streams = {}           # tag -> threading.Event that stops it
+        self.closed = threading.Event()
+
+    def serve(self):
+        threading.Thread(target=self._send_loop, name="fake-routeros-api-send", daemon=True).start()
+        reader = routeros_api.SentenceReader()
+        try:
+            while not self.closed.is_set():
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                arrived = time.monotonic()
+                for sentence in reader.feed(data):
+                    self.router._count(api_sentences=1)
+                    self.handle(sentence, arrived + self.router.latency)
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.closed.set()
+        for stop in self.streams.values():
+            stop.set()
+        self.outbox.put(None)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _send_loop(self):
+        while True:
+            item = self.outbox.get()
+            if item is None:
+                return
+            due, data = item
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                return
+            self.router._count(bytes_sent=len(data))
+
+    def reply(self, due, *sentences):
+        data = b"".join(routeros_api.encode_sentence(words) for words in sentences)
+        self.outbox.put((due, data))
+
+    # -- requests ----------------------------------------------------------
+
+    def handle(self, sentence, due):
+        command = sentence[0] if sentence else ""
+        tag = next((word[5:] for word in sentence if word.startswith(".tag=")), None)
+        tagged = [f".tag={tag}"] if tag is not None else []
+        attrs = {}
+        queries = []
+        for word in sentence[1:]:
+            if word.startswith("="):
+                key, _, value = word[1:].partition("=")
+                attrs[key] = value
+            elif word.startswith("?"):
+                queries.append(word[1:])
+        try:
+            if command == "/login":
+                if (attrs.get("name"), attrs.get("password")) != (self.router.username, self.router.password):
+                    raise _Trap("invalid user name or password (6)")
+                self.logged_in = True
+                rows, ret = [], None
+            elif not self.logged_in:
+                raise _Trap("not logged in")
+            elif command == "/cancel":
+                stop = self.streams.get(attrs.get("tag"))
+                if stop is not None:
+                    stop.set()
+                rows, ret = [], None
+            elif command == "/interface/monitor-traffic":
+                self.monitor(attrs, tagged)
+                return
+            else:
+                with self.router.state.lock:
+                    rows, ret = self.command(command, attrs, queries)
+        except (_Trap, CommandError) as e:
+            trap = ["!trap", f"=message={e}"]
+            if getattr(e, "category", None) is not None:
+                trap.insert(1, f"=category={e.category}")
+            self.reply(due, trap + tagged, ["!done"] + tagged)
+            return
+        replies = [["!re", *(f"={key}={value}" for key, value in row.items()), *tagged] for row in rows]
+        replies.append(["!done", *([f"=ret={ret}"] if ret is not None else []), *tagged])
+        self.reply(due, *replies)
+
+    def command(self, command, attrs, queries):
+        path = command.strip("/").split("/")
+        verb = path.pop()
+        menu = "/" + " ".join(path)
+        state = self.router.state
+        if menu == "/system backup" and verb == "save":
+            state.save_backup(attrs.get("name") or f"backup{state.backups + 1}")
+            return [], None
+        if menu not in MENUS and menu not in SETTINGS:
+            raise _Trap("no such command prefix", 0)
+
+        proplist = attrs.pop(".proplist", None)
+        if verb == "print":
+            if menu in SETTINGS:
+                rows = [{key: _api_value(value) for key, value in state.settings[menu].items()}]
+            else:
+                compiled = _compile(queries)
+                items = [item for item in state.tables[menu] if _matches(item, compiled)]
+                if "stats" in attrs and menu == "/queue simple":
+                    now = time.time()
+                    rows = [stats_row(state, item, now) for item in items]
+                else:
+                    rows = [item_row(menu, item) for item in items]
+            if proplist is not None:
+                keys = proplist.split(",")
+                rows = [{key: row[key] for key in keys if key in row} for row in rows]
+            return rows, None
+
+        # Writes run through the CLI interpreter so they validate exactly like SSH commands
+        selector = attrs.pop(".id", None) or attrs.pop("numbers", None)
+        args = [f"{key}={_quote(value)}" for key, value in attrs.items()]
+        if selector is not None:
+            args.append(selector)
+        interpreter = Interpreter(state, lambda text: None)
+        result = interpreter._menu_command(menu, path, verb, args)
+        if verb == "add" and result:
+            return [], result[0].value(".id")
+        return [], None
+
+    def monitor(self, attrs, tagged):
+        names = [name for name in attrs.get("interface", "").split(",") if name]
+        with self.router.state.lock:
+            unknown = [name for name in names if self.router.state.by_name("/interface", name) is None]
+        if unknown:
+            self.reply(time.monotonic() + self.router.latency,
+                       ["!trap", "=message=input does not match any value of interface", *tagged],
+                       ["!done", *tagged])
+            return
+        stop = threading.Event()
+        tag = tagged[0][5:] if tagged else None
+        self.streams[tag] = stop
+        threading.Thread(target=self._monitor_loop, args=(names, tagged, stop, "once" in attrs),
+                         name="fake-routeros-api-monitor", daemon=True).start()
+
+    def _monitor_loop(self, names, tagged, stop, once):
+        rng = self.router.state.random
+        due = time.monotonic() + self.router.latency
+        while not stop.is_set() and not self.closed.is_set():
+            rows = []
+            for name in names:
+                rx, tx = rng.randint(0, 200_000_000), rng.randint(0, 200_000_000)
+                rows.append(["!re", f"=name={name}", f"=rx-packets-per-second={rx // 8000}",
+                             f"=rx-bits-per-second={rx}", "=fp-rx-packets-per-second=0",
+                             f"=tx-packets-per-second={tx // 8000}", f"=tx-bits-per-second={tx}",
+                             "=fp-tx-packets-per-second=0", *tagged])
+            self.reply(due, *rows)
+            if once:
+                self.reply(due, ["!done", *tagged])
+                return
+            stop.wait(self.router.monitor_interval)
+            due = time.monotonic()
+        self.reply(time.monotonic() + self.router.latency,
+                   ["!trap", "=category=2", "=message=interrupted", *tagged], ["!done", *tagged])
+
+
+class FakeApiServer:
+    """API listener for a ``FakeRouter``: same state, credentials, latency and ``stats``.
+
+    Adds ``api_connections`` and ``api_sentences`` to the router's stats;
+    reply bytes count towards ``bytes_sent`` like SSH output does.
+    """
+
+    def __init__(self, router, host=None, port=0):
+        self.router = router
+        self.host = host or router.host
+        self.port = port
+        self._socket = None
+        self._connections = []
+        self._stopping = threading.Event()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(64)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="fake-routeros-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._socket is not None:
+            self._socket.close()
+        for connection in self._connections:
+            connection.close()
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(self, sock)
+            self._connections = [c for c in self._connections if not c.closed.is_set()] + [connection]
+            self.router._count(api_connections=1)
+            threading.Thread(target=connection.serve, name="fake-routeros-api-conn", daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8728)
+    parser.add_argument("--ssh-port", type=int, default=2222)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    for table, default in (("interfaces", 8), ("addresses", 8), ("queues", 50), ("dns-static", 0)):
+        parser.add_argument(f"--{table}", type=int, default=default)
+    args = parser.parse_args()
+
+    router = FakeRouter(args.host, args.ssh_port, latency=args.latency, interfaces=args.interfaces,
+                        addresses=args.addresses, queues=args.queues, dns_static=args.dns_static).start()
+    api = FakeApiServer(router, port=args.port).start()
+    print(f"Fake RouterOS: SSH on {router.host}:{router.port}, API on {api.host}:{api.port} "
+          f"(admin / admin), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api.stop()
+        router.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Cold-start import profiler for the app's page modules.
+
+Imports each module from ``pages.REGISTRY`` (or the ones named on the
+command line) in a fresh interpreter with ``python -X importtime`` and
+reports its cumulative import cost plus the most expensive modules it
+pulled in.
+
+Run from the repository root:
+
+    python benchmarks/profile_imports.py [module ...] [--top N]
+"""
+import os
+import subprocess
+import sys
+
+VIEW = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "view")
+sys.path.insert(0, VIEW)
+
+import pages  # noqa: E402
+
+
+def profile(module):
+    """Return (cumulative us, [(self us, cumulative us, name), ...]) or raise with the import error."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=VIEW, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(own), int(cumulative), name.rstrip()))
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total = next((cumulative for _, cumulative, name in rows if name.strip() == module), 0)
+    return total, rows
+
+
+def main():
+    args = sys.argv[1:]
+    top = 5
+    if "--top" in args:
+        position = args.index("--top")
+        top = int(args[position + 1])
+        del args[position:position + 2]
+    modules = args or ["main_deps"] + [page.module for page in pages.REGISTRY]
+
+    for module in modules:
+        if module == "main_deps":
+            module = "pages"          # what main.py imports before any page
+        try:
+            total, rows = profile(module)
+        except RuntimeError as e:
+            print(f"{module:<24} failed: {e}")
+            continue
+        heavy = sorted(rows, key=lambda row: row[0], reverse=True)[:top]
+        loaded = {name.strip() for _, _, name in rows}
+        flags = [name for name in ("paramiko", "numpy", "pandas", "streamlit") if name in loaded]
+        print(f"{module:<24} {total / 1000:8.1f} ms   loads: {', '.join(flags) or '-'}")
+        for own, _, name in heavy:
+            print(f"    {own / 1000:8.1f} ms self  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
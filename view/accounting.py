@@ -0,0 +1,144 @@
+import heapq
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+
+import numpy as np
+
+import executor
+import traffic_monitor
+
+TOP_N = 10
+
+
+@dataclass
+class ClientUsage:
+    """Traffic of one simple queue: current rates in bits/s and bytes counted so far."""
+    name: str
+    target: str
+    rate_up: float
+    rate_down: float
+    total_up: int
+    total_down: int
+
+
+class Accountant:
+    """Per-client rates and byte totals from successive queue counter samples.
+
+    Counters live in NumPy arrays indexed by queue, so each sample is a
+    handful of vectorised operations however many queues the router has.
+    A counter that goes backwards (queue reset or re-created) counts its
+    new value as the traffic since the last sample.
+    """
+
+    def __init__(self, capacity=256):
+        self._lock = threading.Lock()
+        self.names = []
+        self.targets = []
+        self._index = {}
+        self._size = 0
+        self._prev = np.zeros((2, capacity))      # last byte counters, row 0 up / row 1 down
+        self._totals = np.zeros((2, capacity))
+        self._rates = np.zeros((2, capacity))
+        self._seen = np.full(capacity, np.nan)    # time of each queue's last sample
+
+    def _grow(self, capacity):
+        def grow(array, fill):
+            grown = np.full(array.shape[:-1] + (capacity,), fill)
+            grown[..., :self._size] = array[..., :self._size]
+            return grown
+
+        self._prev, self._totals, self._rates = (grow(a, 0.0) for a in (self._prev, self._totals, self._rates))
+        self._seen = grow(self._seen, np.nan)
+
+    def _rows(self, frame):
+        for name, sample in frame.items():
+            row = self._index.get(name)
+            if row is None:
+                row = self._index[name] = len(self.names)
+                self.names.append(name)
+                self.targets.append(sample.get("target", ""))
+            else:
+                self.targets[row] = sample.get("target", self.targets[row])
+        if len(self.names) > self._prev.shape[1]:
+            self._grow(max(len(self.names), 2 * self._prev.shape[1]))
+        self._size = len(self.names)
+        return np.fromiter((self._index[name] for name in frame), dtype=np.intp, count=len(frame))
+
+    def update(self, timestamp, frame):
+        """Account one queue frame (as built by ``traffic_monitor.queue_frame``)."""
+        if not frame:
+            return
+        with self._lock:
+            rows = self._rows(frame)
+            current = np.array([[s["bytes_up"] for s in frame.values()],
+                                [s["bytes_down"] for s in frame.values()]], dtype=np.float64)
+            elapsed = timestamp - self._seen[rows]
+            known = ~np.isnan(elapsed) & (elapsed > 0)
+            delta = current - self._prev[:, rows]
+            delta = np.where(delta < 0, current, delta)          # counter reset
+            delta = np.where(known, delta, 0)
+
+            self._rates[:, :self._size] = 0                       # queues gone from the frame stop counting
+            self._rates[:, rows] = np.where(known, delta * 8 / np.where(known, elapsed, 1), 0)
+            self._totals[:, rows] += delta
+            self._prev[:, rows] = current
+            self._seen[rows] = timestamp
+
+    def listener(self, kind, timestamp, frame):
+        """``TrafficMonitor`` listener; accounts queue frames and ignores interfaces."""
+        if kind == "queues":
+            self.update(timestamp, frame)
+
+    def _usage(self, row):
+        return ClientUsage(self.names[row], self.targets[row],
+                           float(self._rates[0, row]), float(self._rates[1, row]),
+                           int(self._totals[0, row]), int(self._totals[1, row]))
+
+    def top(self, n=TOP_N, by="down"):
+        """The ``n`` heaviest clients by current ``up`` or ``down`` rate.
+
+        ``heapq.nlargest`` keeps only ``n`` entries on its heap, so this is
+        O(queues * log n) rather than a full sort.
+        """
+        axis = 0 if by == "up" else 1
+        with self._lock:
+            rates = self._rates[axis, :self._size].tolist()
+            rows = heapq.nlargest(n, range(len(rates)), key=rates.__getitem__)
+            return [self._usage(row) for row in rows if rates[row] > 0]
+
+    def top_totals(self, n=TOP_N, by="down"):
+        """The ``n`` clients that moved the most bytes since accounting started."""
+        axis = 0 if by == "up" else 1
+        with self._lock:
+            totals = self._totals[axis, :self._size].tolist()
+            rows = heapq.nlargest(n, range(len(totals)), key=totals.__getitem__)
+            return [self._usage(row) for row in rows if totals[row] > 0]
+
+    def usage(self):
+        with self._lock:
+            return [self._usage(row) for row in range(self._size)]
+
+
+def poll(client, accountant, timestamp=None):
+    """Take one sample with a single ``print stats`` read, for use without a running monitor."""
+    output = executor.execute(client, "/queue simple print stats terse", timeout=60).output
+    accountant.update(timestamp or time.time(), traffic_monitor.queue_frame(output))
+
+
+_accountants = {}
+_attached = weakref.WeakSet()
+_lock = threading.Lock()
+
+
+def get_accountant(router, monitor=None):
+    """Process-wide accountant for ``router``, fed by ``monitor`` if one is given."""
+    with _lock:
+        accountant = _accountants.get(router)
+        if accountant is None:
+            accountant = _accountants[router] = Accountant()
+        if monitor is not None and monitor not in _attached:
+            monitor.listeners.append(accountant.listener)
+            _attached.add(monitor)
+        return accountant
@@ -0,0 +1,344 @@
+import time
+
+import instrumentation
+import query_cache
+import routeros_api
+import terse
+from executor import BatchResult, CommandResult, DEFAULT_TIMEOUT, MAX_OUTPUT, quote
+
+# API booleans that ``print terse`` shows as flag letters instead of attributes
+FLAG_ATTRS = {"disabled": "X", "dynamic": "D", "invalid": "I", "running": "R", "slave": "S", "default": "*"}
+# ``print`` shows booleans as yes/no; ``get`` (and the API) as true/false
+PRINTED_BOOLEANS = {"true": "yes", "false": "no"}
+QUERY_BOOLEANS = {"yes": "true", "no": "false"}
+
+
+class Unsupported(Exception):
+    """The command is a script or uses syntax that has no API equivalent."""
+
+
+def split_words(text):
+    """Split a CLI command on whitespace, keeping quoted values and ``[...]`` together."""
+    words, current = [], []
+    depth, quoted, escaped = 0, False, False
+    for char in text:
+        if escaped:
+            escaped = False
+        elif char == "\\" and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == "[":
+            depth += 1
+        elif not quoted and char == "]":
+            depth -= 1
+        elif char.isspace() and not quoted and depth == 0:
+            if current:
+                words.append("".join(current))
+                current = []
+            continue
+        current.append(char)
+    if current:
+        words.append("".join(current))
+    return words
+
+
+def _conditions(words):
+    """``?key=value`` query words for ``key=value [and ...]`` conditions."""
+    queries = []
+    for word in words:
+        if word in ("and", "where"):
+            continue
+        key, sep, value = word.partition("=")
+        if not key or any(char in key for char in "!~<>()[]"):
+            raise Unsupported(f"condition not available over the RouterOS API: {word}")
+        value = terse.unquote(value) if sep else "true"     # a bare ``disabled`` means disabled=yes
+        queries.append(f"?{key}={QUERY_BOOLEANS.get(value, value)}")
+    return queries
+
+
+def _selector(selector):
+    """Classify an item selector as ``(kind, query words)``: find, ids, numbers or name."""
+    if selector.startswith("["):
+        inner = selector[1:-1].strip()
+        if not inner.startswith("find"):
+            raise Unsupported(f"selector not available over the RouterOS API: {selector}")
+        return "find", _conditions(split_words(inner[4:]))
+    if selector.startswith("*"):
+        return "ids", []
+    if selector.replace(",", "").isdigit():
+        return "numbers", []
+    return "name", [f"?name={terse.unquote(selector)}"]
+
+
+class Call:
+    """One CLI command translated to RouterOS API sentences.
+
+    Writes that name their items by ``[find ...]``, name or print number
+    need the item ids first, so they come with a ``lookup`` sentence whose
+    rows are handed to ``request``.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        text = command.strip()
+        if text.startswith(":put ["):
+            text = text[5:].strip()[1:-1].strip()     # ``:put [/menu get prop]`` prints what get returns
+        if not text.startswith("/"):
+            raise Unsupported(f"scripts are not available over the RouterOS API: {command}")
+        words = split_words(text)
+        path = []
+        while words and words[0].strip("/") not in query_cache.READ_VERBS | query_cache.WRITE_VERBS:
+            if "=" in words[0] or words[0][:1] in '["':
+                raise Unsupported(f"no command verb in: {command}")
+            path.append(words.pop(0).strip("/"))
+        if not words:
+            raise Unsupported(f"no command verb in: {command}")
+        self.path = tuple(path)
+        self.menu = "/" + "/".join(path)
+        self.verb = words.pop(0).strip("/")
+        self.params, self.positional, self.where = {}, [], []
+        for position, word in enumerate(words):
+            if word == "where":
+                self.where = _conditions(words[position + 1:])
+                break
+            key, sep, value = word.partition("=")
+            if sep and word[:1] not in '["':
+                self.params[key] = terse.unquote(value)
+            else:
+                self.positional.append(word)
+
+        self.selector, self.prop = None, None
+        if self.verb == "get":
+            if not self.positional:
+                raise Unsupported(f"get without a property: {command}")
+            self.prop = self.positional[-1]
+            self.selector = self.positional[0] if len(self.positional) > 1 else None
+        elif self.verb != "print":
+            self.selector = self.params.pop("numbers", None) or (self.positional[0] if self.positional else None)
+        self.kind, self.queries = _selector(self.selector) if self.selector else (None, [])
+
+    @property
+    def reads(self):
+        return self.verb in ("print", "get")
+
+    def lookup(self):
+        """Sentence that finds the ids a write applies to; ``None`` when none is needed."""
+        if self.reads or self.kind in (None, "ids"):
+            return None
+        return [f"{self.menu}/print", "=.proplist=.id", *self.queries]
+
+    def request(self, rows=None):
+        """The sentence that runs the command; ``None`` when a ``[find]`` matched nothing."""
+        if self.verb == "print":
+            return [f"{self.menu}/print", *(["=stats="] if "stats" in self.positional else []), *self.where]
+        if self.verb == "get":
+            if self.kind == "numbers":
+                raise Unsupported(f"get by item number: {self.command}")
+            queries = [f"?.id={self.selector}"] if self.kind == "ids" else self.queries
+            return [f"{self.menu}/print", f"=.proplist={self.prop}", *queries]
+        words = [f"{self.menu}/{self.verb}", *(f"={key}={value}" for key, value in self.params.items())]
+        if self.kind is not None:
+            ids = self._ids(rows)
+            if not ids:
+                if self.kind == "find":
+                    return None
+                raise routeros_api.ApiError(f"no such item ({self.selector})")
+            words.append(f"=.id={','.join(ids)}")
+        return words
+
+    def _ids(self, rows):
+        if self.kind == "ids":
+            return self.selector.split(",")
+        if self.kind == "numbers":
+            return [rows[int(number)][".id"] for number in self.selector.split(",") if int(number) < len(rows)]
+        return [row[".id"] for row in rows if ".id" in row]
+
+    def output(self, rows):
+        """What the CLI would have printed for this command."""
+        if self.verb == "print":
+            return render(rows)
+        if self.verb == "get":
+            if not rows:
+                raise routeros_api.ApiError(f"no such item ({self.selector})")
+            return rows[0].get(self.prop, "")
+        return ""
+
+
+def split_row(row):
+    """Flag letters and printable attributes of one ``!re`` row, as ``print terse`` shows them."""
+    flags = "".join(letter for key, letter in FLAG_ATTRS.items() if row.get(key) == "true")
+    attrs = {key: PRINTED_BOOLEANS.get(value, value) for key, value in row.items()
+             if not (key in FLAG_ATTRS and value in ("true", "false"))}
+    return flags, attrs
+
+
+def to_records(rows, record=terse.TerseRecord):
+    """Records straight from API rows, numbered like ``print`` numbers them."""
+    return [record(index, *split_row(row)) for index, row in enumerate(rows)]
+
+
+def render(rows):
+    """``print terse`` text for API rows, for callers that read command output."""
+    lines = []
+    for index, row in enumerate(rows):
+        flags, attrs = split_row(row)
+        pairs = " ".join(f"{key}={_printable(value)}" for key, value in attrs.items() if key[:1] != ".")
+        lines.append(f"{index:>2} {flags} {pairs}" if flags else f"{index:>2} {pairs}")
+    return "\n".join(lines)
+
+
+def _printable(value):
+    return quote(value) if not value or any(char in value for char in ' "\\$?=\t\n') else value
+
+
+# -- running -----------------------------------------------------------------
+
+class _Outcome:
+    def __init__(self, command):
+        self.command = command
+        self.status = "skipped"
+        self.rows = []
+        self.output = ""
+        self.error = ""
+        self.timed_out = False
+
+    def fail(self, error):
+        self.status = "failed"
+        self.timed_out = isinstance(error, TimeoutError)
+        self.error = str(error)
+
+
+def _waves(calls, stop_on_error):
+    """Group calls into waves whose sentences can share a round trip.
+
+    Consecutive reads always share one; consecutive writes only when they
+    use the same menu and verb, so writes to different menus still reach
+    the router in order. With ``stop_on_error`` every write waits for the
+    one before it.
+    """
+    wave, key = [], None
+    for outcome, call in calls:
+        if call is None:
+            wave_key = None
+        elif call.reads:
+            wave_key = "read"
+        else:
+            wave_key = None if stop_on_error else (call.path, call.verb)
+        if wave and (wave_key is None or wave_key != key):
+            yield wave
+            wave = []
+        wave.append((outcome, call))
+        key = wave_key
+    if wave:
+        yield wave
+
+
+def _send(client, items, timeout):
+    """Pipeline ``(outcome, call, words)`` items and wait for every reply; return their rows."""
+    started = time.perf_counter()
+    requests = client.pipeline([words for _, _, words in items])
+    deadline = time.monotonic() + timeout
+    replies = []
+    for (outcome, _, _), request in zip(items, requests):
+        try:
+            replies.append(request.result(max(0.0, deadline - time.monotonic())))
+        except (routeros_api.ApiError, TimeoutError) as e:
+            if isinstance(e, TimeoutError):
+                client.cancel(request)
+                e = TimeoutError(f"command timed out after {timeout}s")
+            outcome.fail(e)
+            replies.append(None)
+    seconds = time.perf_counter() - started
+    instrumentation.api_round_trip(client, len(requests), seconds)
+    return replies, requests, seconds
+
+
+def _run_wave(client, wave, timeout):
+    runnable = []
+    for outcome, call in wave:
+        if call is None:
+            continue
+        runnable.append((outcome, call, call.lookup()))
+
+    lookup_rows = {}
+    lookups = [item for item in runnable if item[2]]
+    if lookups:
+        replies, _, _ = _send(client, lookups, timeout)
+        for (outcome, _, _), rows in zip(lookups, replies):
+            lookup_rows[id(outcome)] = rows
+
+    sends = []
+    for outcome, call, lookup in runnable:
+        if outcome.status == "failed":
+            continue
+        try:
+            words = call.request(lookup_rows.get(id(outcome)))
+        except (routeros_api.ApiError, Unsupported) as e:
+            outcome.fail(e)
+            continue
+        if words is None:
+            outcome.status = "ok"
+        else:
+            sends.append((outcome, call, words))
+    if not sends:
+        return
+    replies, requests, seconds = _send(client, sends, timeout)
+    for (outcome, call, words), rows, request in zip(sends, replies, requests):
+        if rows is not None:
+            try:
+                outcome.output = call.output(rows)
+                outcome.rows = rows
+                outcome.status = "ok"
+            except routeros_api.ApiError as e:
+                outcome.fail(e)
+        status = "timeout" if outcome.timed_out else outcome.status.replace("failed", "error")
+        instrumentation.command_done(client, outcome.command, seconds, sum(len(word) + 1 for word in words),
+                                     request.received, status)
+
+
+def run(client, commands, stop_on_error=False, timeout=DEFAULT_TIMEOUT):
+    """Run CLI commands over the API connection ``client``; one ``_Outcome`` per command."""
+    outcomes = [_Outcome(command) for command in commands]
+    calls = []
+    for outcome in outcomes:
+        try:
+            calls.append((outcome, Call(outcome.command)))
+        except Unsupported as e:
+            outcome.error = str(e)
+            calls.append((outcome, None))
+
+    for wave in _waves(calls, stop_on_error):
+        for outcome, call in wave:
+            if call is None:
+                outcome.status = "failed"
+        _run_wave(client, wave, timeout)
+        for outcome, call in wave:
+            if call is not None and not call.reads:
+                query_cache.invalidate(client, outcome.command)
+        if stop_on_error and any(outcome.status == "failed" for outcome, _ in wave):
+            break
+    return outcomes
+
+
+def execute(client, command, timeout=DEFAULT_TIMEOUT, max_output=MAX_OUTPUT):
+    """``executor.execute`` for an API client."""
+    outcome = run(client, [command], timeout=timeout)[0]
+    output = outcome.output
+    result = CommandResult(command, 0 if outcome.status == "ok" else 1, output[:max_output],
+                           outcome.error, outcome.timed_out, len(output) > max_output)
+    if outcome.timed_out:
+        result.exit_status = -1
+    return result
+
+
+def execute_batch(client, commands, stop_on_error=False, timeout=DEFAULT_TIMEOUT):
+    """``executor.execute_batch`` for an API client: pipelined sentences instead of one script."""
+    return [BatchResult(o.command, o.status, o.output, o.error)
+            for o in run(client, list(commands), stop_on_error, timeout)]
+
+
+def query(client, command, record=terse.TerseRecord, timeout=DEFAULT_TIMEOUT):
+    """Records for a ``print`` built from the reply rows, with no text parsing; returns ``(records, ok)``."""
+    outcome = run(client, [command], timeout=timeout)[0]
+    return to_records(outcome.rows, record), outcome.status == "ok"
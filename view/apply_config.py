@@ -0,0 +1,82 @@
+import streamlit as st
+import connection_pool
+import desired_state
+import storage
+
+EXAMPLE = """addresses:
+  ether2: [192.168.10.1/24]
+dns:
+  servers: [1.1.1.1, 8.8.8.8]
+  allow_remote_requests: true
+queues:
+  - {ip: 192.168.10.20, up: 5, down: 10}
+prune_queues: false
+blocks: [facebook.com, tiktok.com]
+wireless:
+  wlan1: {ssid: Office, password: change-me-please}
+"""
+
+def load_uploaded_state(uploaded):
+    try:
+        text = uploaded.getvalue().decode("utf-8")
+        fmt = "json" if uploaded.name.endswith(".json") else "yaml"
+        st.session_state["desired_state"] = desired_state.load_state(text, fmt)
+        st.session_state.pop("desired_plan", None)
+        st.success(f"✅ Loaded `{uploaded.name}`")
+    except Exception as e:
+        st.session_state.pop("desired_state", None)
+        st.error(f"❌ Invalid configuration: {e}")
+
+def show_plan(plan):
+    if not plan.changes:
+        st.success("✅ Router already matches the configuration. Nothing to apply.")
+        return
+    st.write(" · ".join(f"**{section}**: {count}" for section, count in plan.summary().items()))
+    st.dataframe(
+        [{"Section": c.section, "Change": c.description} for c in plan.changes],
+        width="stretch",
+    )
+
+def run():
+    st.header("📄 Apply Configuration")
+    st.write("Describe how the router should look; only the differences are applied.")
+
+    router = st.session_state.get("router")
+    if not router:
+        st.warning("❌ No connection detected. Please log in first.")
+        return
+
+    uploaded = st.file_uploader("Configuration (YAML or JSON)", type=["yaml", "yml", "json"])
+    if uploaded is not None and st.session_state.get("desired_state_name") != uploaded.name:
+        load_uploaded_state(uploaded)
+        st.session_state["desired_state_name"] = uploaded.name
+    with st.expander("Example configuration"):
+        st.code(EXAMPLE, language="yaml")
+
+    state = st.session_state.get("desired_state")
+    if state is None:
+        return
+
+    if st.button("Check Differences"):
+        try:
+            with connection_pool.lease(router) as client:
+                st.session_state["desired_plan"] = desired_state.plan(client, state)
+        except Exception as e:
+            st.error(f"❌ Failed to read router state: {e}")
+
+    plan = st.session_state.get("desired_plan")
+    if plan is None:
+        return
+    show_plan(plan)
+
+    if plan.changes and st.button("Apply Changes"):
+        try:
+            with connection_pool.lease(router) as client:
+                failed = desired_state.apply(client, plan, storage.router_id(router))
+            st.session_state.pop("desired_plan", None)
+            if failed:
+                st.error(f"⚠️ {len(failed)} changes failed, first: `{failed[0].command}`: {failed[0].error or 'not applied'}")
+            else:
+                st.success(f"✅ Applied {len(plan.changes)} changes.")
+        except Exception as e:
+            st.error(f"❌ Failed to apply configuration: {e}")
@@ -0,0 +1,154 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import instrumentation
+import query_cache
+import terse
+from executor import CommandResult, DEFAULT_TIMEOUT, MAX_OUTPUT, READ_SIZE
+
+POLL_MIN = 0.002           # first wait between channel polls
+POLL_MAX = 0.05            # polls back off to this while a command is quiet
+UI_CHECK_INTERVAL = 0.25   # how often the sync facade lets Streamlit interrupt the wait
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """Return the process-wide event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="router-io", daemon=True).start()
+        return _loop
+
+
+def _drain(read, ready, buffer, max_output):
+    """Read everything ``ready()`` reports without blocking; return (got_data, dropped)."""
+    got = dropped = False
+    while ready():
+        data = read(READ_SIZE)
+        got = True
+        room = max_output - len(buffer)
+        if room > 0:
+            buffer += data[:room]
+        dropped |= len(data) > room
+    return got, dropped
+
+
+async def execute_async(client, command, timeout=DEFAULT_TIMEOUT, max_output=MAX_OUTPUT):
+    """Async counterpart of ``executor.execute``.
+
+    The channel is opened in a worker thread (it costs a round trip) and then
+    polled from the event loop, so many commands can be in flight on one
+    loop. Cancelling the task closes the channel, which stops the command on
+    the router. An API client runs the command in a worker thread; its
+    replies are already multiplexed on one socket.
+    """
+    if getattr(client, "is_api", False):
+        import api_cli
+        return await asyncio.to_thread(api_cli.execute, client, command, timeout, max_output)
+
+    result = CommandResult(command)
+    out, err = bytearray(), bytearray()
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+
+    transport = client.get_transport()
+    channel = await asyncio.to_thread(transport.open_session, timeout=timeout)
+    instrumentation.channel_opened(client, time.perf_counter() - started)
+    try:
+        channel.setblocking(False)
+        await asyncio.to_thread(channel.exec_command, command)
+        delay = POLL_MIN
+        while True:
+            got_out, dropped_out = _drain(channel.recv, channel.recv_ready, out, max_output)
+            got_err, dropped_err = _drain(channel.recv_stderr, channel.recv_stderr_ready, err, max_output)
+            result.truncated |= dropped_out or dropped_err
+            if got_out or got_err:
+                delay = POLL_MIN
+            elif channel.exit_status_ready():
+                result.exit_status = channel.recv_exit_status()
+                break
+            else:
+                delay = min(delay * 2, POLL_MAX)
+            if time.monotonic() >= deadline:
+                result.timed_out = True
+                break
+            await asyncio.sleep(delay)
+    finally:
+        channel.close()
+        instrumentation.command_done(client, command, time.perf_counter() - started, len(command),
+                                     len(out) + len(err), instrumentation.outcome(result, err))
+
+    query_cache.invalidate(client, command)
+    result.output = out.decode(errors="replace").strip()
+    result.error = err.decode(errors="replace").strip()
+    if result.timed_out and not result.error:
+        result.error = f"command timed out after {timeout}s"
+    return result
+
+
+async def query_async(client, command, record=terse.TerseRecord, ttl=query_cache.DEFAULT_TTL):
+    """Async counterpart of ``executor.query``, sharing the same cache."""
+    cache = query_cache.cache_for(client)
+    key = (command, record)
+    records = cache.get(key)
+    if records is None:
+        if getattr(client, "is_api", False):
+            import api_cli
+            records, ok = await asyncio.to_thread(api_cli.query, client, command, record)
+        else:
+            result = await execute_async(client, command)
+            records, ok = terse.parse_terse(result.output, record), result.ok
+        if ok:
+            cache.put(key, query_cache.split_command(command)[0], records, ttl)
+    return records
+
+
+async def _gather(coroutines, render=None):
+    # Tasks copy this context, so the page render that asked for the work gets its I/O counted
+    instrumentation.attach(render)
+    return await asyncio.gather(*coroutines)
+
+
+def gather(*coroutines, interruptible=True):
+    """Run coroutines concurrently on the engine loop and return their results in order.
+
+    This is the sync facade for page code. While waiting, the Streamlit
+    script thread periodically hands control back to Streamlit so a
+    navigation or rerun can interrupt the page; the in-flight router
+    commands are then cancelled instead of running to completion.
+    """
+    future = asyncio.run_coroutine_threadsafe(_gather(coroutines, instrumentation.current_render()),
+                                              get_loop())
+    placeholder = _placeholder() if interruptible else None
+    try:
+        while True:
+            try:
+                return future.result(timeout=UI_CHECK_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                if placeholder is not None:
+                    # Any Streamlit call checks for a pending rerun/stop request
+                    # and raises if there is one, which lands in ``finally``.
+                    placeholder.empty()
+    finally:
+        if not future.done():
+            future.cancel()
+
+
+def run(coroutine, interruptible=True):
+    """Run a single coroutine through ``gather`` and return its result."""
+    return gather(coroutine, interruptible=interruptible)[0]
+
+
+def _placeholder():
+    try:
+        import streamlit as st
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    return st.empty() if get_script_run_ctx() is not None else None
@@ -1,12 +1,23 @@
 import streamlit as st
-import paramiko
+import datetime
+import io
 import time
-import os
+import backup_store
+import connection_pool
+import executor
+import instrumentation
+import job_panel
+import jobs
+import storage
+import waiters
+
+CHUNK_SIZE = 32768          # SFTP read size per request
+PREFETCH_WINDOW = 16        # read requests kept in flight
 
 def list_backup_files(client):
     """Retrieve a list of backup files from MikroTik via SFTP."""
     try:
-        with client.open_sftp() as sftp:
+        with instrumentation.open_sftp(client) as sftp:
             files = sftp.listdir("/")
             backup_files = [file for file in files if file.endswith('.backup')]
             return backup_files
@@ -14,73 +25,189 @@ def list_backup_files(client):
         st.error(f"Failed to get the list of backup files: {e}")
         return []
 
-def create_backup(ssh_client, backup_name):
-    """Create a new backup file on MikroTik."""
-    try:
-        command = f'/system backup save name={backup_name}'
-        ssh_client.exec_command(command)
-        time.sleep(2)  # Wait for backup to be created
-        st.success(f"✅ Backup `{backup_name}.backup` created successfully!")
-    except Exception as e:
-        st.error(f"❌ Failed to create backup: {e}")
+def save_backup(ssh_client, backup_name):
+    """Save ``backup_name``.backup on the router and wait until it is complete; return its size.
+
+    An older file of the same name (names repeat within a day) is removed
+    first, so its size is never taken for the new backup's.
+    """
+    path = f"/{backup_name}.backup"
+    command = f'/system backup save name={backup_name}'
+    with instrumentation.open_sftp(ssh_client) as sftp:
+        try:
+            sftp.remove(path)
+        except FileNotFoundError:
+            pass
+        result = executor.execute(ssh_client, command, timeout=60)
+        if result.error:
+            raise RuntimeError(result.error)
+        # Wait until the file is on flash and no longer growing
+        return waiters.wait_for_stable_file(sftp, path)
+
+def backup_job(ssh_client, job, name, archive=False):
+    """Background job: save a backup and optionally archive it locally.
+
+    ``name`` goes through ``time.strftime``, so a schedule can use
+    ``nightly-%Y%m%d`` to get a new file every run.
+    """
+    name = time.strftime(name)
+    steps = 3 if archive else 2
+    job.progress(0, steps, f"Saving {name}.backup")
+    size = save_backup(ssh_client, name)
+    job.progress(1, steps, f"Saved {size:,} bytes")
+    if archive:
+        done = 0
+        def counted():
+            nonlocal done
+            for chunk in stream_backup(ssh_client, f"{name}.backup"):
+                done += len(chunk)
+                job.progress(1, steps, f"Archiving: {done:,} of {size:,} bytes")
+                yield chunk
+        backup_store.get_store().ingest(job.router, f"{name}.backup", counted())
+        job.progress(2, steps, "Archived")
+    return f"{name}.backup ({size:,} bytes){' archived' if archive else ''}"
+
+def stream_backup(ssh_client, backup_name, chunk_size=CHUNK_SIZE, window=PREFETCH_WINDOW, offset=0):
+    """Yield a remote backup file in chunks without touching the local disk.
+
+    Reads are pipelined: ``window`` chunk requests are kept in flight at a
+    time, so the transfer is not one round trip per chunk, while at most
+    ``window * chunk_size`` bytes are buffered. ``offset`` skips the first
+    bytes, to resume a transfer.
+    """
+    with instrumentation.open_sftp(ssh_client) as sftp:
+        with sftp.open(f"/{backup_name}", "rb") as remote:
+            size = remote.stat().st_size
+            for start in range(offset, size, chunk_size * window):
+                end = min(start + chunk_size * window, size)
+                requests = [(offset, min(chunk_size, end - offset)) for offset in range(start, end, chunk_size)]
+                for chunk in remote.readv(requests):
+                    instrumentation.transferred(ssh_client, len(chunk))
+                    yield chunk
 
 def download_backup(ssh_client, backup_name):
     """Download a backup file from MikroTik to the client device."""
     try:
-        with ssh_client.open_sftp() as sftp:
-            local_path = f"./{backup_name}"
-            remote_path = f"/{backup_name}"
-            sftp.get(remote_path, local_path)
-
-        with open(local_path, "rb") as file:
-            file_bytes = file.read()
+        buffer = io.BytesIO()
+        started = time.perf_counter()
+        for chunk in stream_backup(ssh_client, backup_name):
+            buffer.write(chunk)
+        elapsed = time.perf_counter() - started
+        size = buffer.tell()
+        buffer.seek(0)
 
         # Provide a download button
         st.download_button(
             label="⬇️ Download Backup File",
-            data=file_bytes,
+            data=buffer,
             file_name=backup_name,
             mime="application/octet-stream"
         )
 
-        os.remove(local_path)  # Cleanup temporary file after download
-        st.success(f"✅ Backup `{backup_name}` is ready to download!")
+        rate = size / elapsed / 1024 / 1024 if elapsed else 0
+        st.success(f"✅ Backup `{backup_name}` is ready to download! ({size:,} bytes in {elapsed:.2f}s, {rate:.2f} MB/s)")
     except Exception as e:
         st.error(f"❌ Failed to download backup: {e}")
 
+def archive_backup(ssh_client, router, backup_name):
+    """Stream a backup from the router straight into the local archive."""
+    try:
+        entry = backup_store.get_store().ingest(storage.router_id(router), backup_name,
+                                                stream_backup(ssh_client, backup_name))
+        st.success(f"✅ Archived `{backup_name}` ({entry.size:,} bytes)")
+    except Exception as e:
+        st.error(f"❌ Failed to archive backup: {e}")
+
+def show_archive(router):
+    """List archived backups for this router from the local index."""
+    store = backup_store.get_store()
+    entries = store.list_backups(storage.router_id(router))
+    stats = store.stats()
+    st.caption(f"{stats['backups']} backups, {stats['logical_bytes']:,} bytes stored in "
+               f"{stats['stored_bytes']:,} bytes on disk (×{stats['ratio']:.1f})")
+    if not entries:
+        st.info("No archived backups for this router yet.")
+        return
+
+    labels = {f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(e.created))} · {e.name} · {e.size:,} bytes": e
+              for e in entries}
+    selected = labels[st.selectbox("Archived backups:", list(labels))]
+    if st.button("📦 Prepare Archived Copy"):
+        buffer = io.BytesIO()
+        for chunk in store.read(selected.id):
+            buffer.write(chunk)
+        buffer.seek(0)
+        st.download_button(
+            label="⬇️ Download Archived Backup",
+            data=buffer,
+            file_name=selected.name,
+            mime="application/octet-stream"
+        )
+
+def schedule_backups(router):
+    """Daily backup schedules for this router, run by the background scheduler."""
+    job_panel.show_schedules(router, kinds=["backup"])
+    with st.form("backup_schedule"):
+        col1, col2 = st.columns(2)
+        with col1:
+            at = st.time_input("Run daily at", value=datetime.time(2, 0))
+        with col2:
+            name = st.text_input("Backup name (strftime codes allowed)", value="nightly-%Y%m%d")
+        archive = st.checkbox("Also archive it locally", value=True)
+        if st.form_submit_button("➕ Add Schedule"):
+            jobs.get_scheduler().add_schedule("backup", router, {"name": name, "archive": archive},
+                                              at=at.strftime("%H:%M"))
+            st.success(f"✅ Backup scheduled daily at {at.strftime('%H:%M')}")
+            st.rerun()
+
 def run():
     """Backup Configuration Page"""
     st.subheader("📂 MikroTik Backup Configuration")
 
     # Ensure an active connection
-    if "ssh_client" not in st.session_state or st.session_state["ssh_client"] is None:
+    router = st.session_state.get("router")
+    if router is None:
         st.error("⚠️ No active MikroTik connection. Please log in first.")
         return
 
-    ssh_client = st.session_state["ssh_client"]
+    with connection_pool.lease(router) as ssh_client:
+        # Display backup files
+        st.write("### 🔍 Available Backup Files")
+        backup_files = list_backup_files(ssh_client)
 
-    # Display backup files
-    st.write("### 🔍 Available Backup Files")
-    backup_files = list_backup_files(ssh_client)
+        if backup_files:
+            selected_file = st.selectbox("Select a backup file to download:", backup_files)
 
-    if backup_files:
-        selected_file = st.selectbox("Select a backup file to download:", backup_files)
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("⬇️ Fetch Backup for Download"):
+                    download_backup(ssh_client, selected_file)
+            with col2:
+                if st.button("🗄️ Archive Locally"):
+                    archive_backup(ssh_client, router, selected_file)
+        else:
+            st.warning("No backup files found.")
 
-        if st.button("⬇️ Fetch Backup for Download"):
-            download_backup(ssh_client, selected_file)
-    else:
-        st.warning("No backup files found.")
+        # Local archive
+        st.write("### 🗄️ Local Archive")
+        show_archive(router)
 
-    # Create new backup
-    st.write("### ✨ Create New Backup")
-    backup_name = st.text_input("Enter backup name (without .backup extension):")
+        # Create new backup
+        st.write("### ✨ Create New Backup")
+        backup_name = st.text_input("Enter backup name (without .backup extension):")
+        archive = st.checkbox("Archive the new backup locally", key="archive_new_backup")
 
-    if st.button("🛠️ Create Backup"):
-        if backup_name:
-            create_backup(ssh_client, backup_name)
-            st.rerun()  # Refresh the file list
-        else:
-            st.warning("⚠️ Please enter a backup name.")
+        if st.button("🛠️ Create Backup"):
+            if backup_name:
+                # Runs in the background; the job list below reruns the page when it is done
+                jobs.submit("backup", router, name=backup_name, archive=archive)
+            else:
+                st.warning("⚠️ Please enter a backup name.")
+        job_panel.show_jobs(router, kinds=["backup"])
+
+        # Scheduled backups
+        st.write("### 🌙 Scheduled Backups")
+        schedule_backups(router)
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+
+import storage
+
+MIN_CHUNK = 2 * 1024
+AVG_CHUNK = 8 * 1024          # must be a power of two
+MAX_CHUNK = 64 * 1024
+COMPRESSION_LEVEL = 6
+
+# Gear table for the rolling hash; seeded so chunk boundaries never change between runs
+_rng = random.Random(0x6E65747A)
+_GEAR = [_rng.getrandbits(32) for _ in range(256)]
+del _rng
+_MASK = (AVG_CHUNK - 1) << 16   # test high bits, which mix in the most recent bytes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id INTEGER PRIMARY KEY,
+    router TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS backups_router ON backups (router, created);
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backup_chunks (
+    backup_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (backup_id, seq)
+);
+"""
+
+
+@dataclass
+class BackupEntry:
+    """Index row describing one archived backup."""
+    id: int
+    router: str
+    name: str
+    created: float
+    size: int
+    sha256: str
+
+
+def _find_boundary(data, start):
+    """Return the end of the chunk starting at ``start`` or -1 if ``data`` ends first."""
+    end = len(data)
+    limit = min(start + MAX_CHUNK, end)
+    position = start + MIN_CHUNK
+    if position >= limit:
+        return limit if limit - start >= MAX_CHUNK else -1
+    gear, mask = _GEAR, _MASK
+    h = 0
+    for position in range(position, limit):
+        h = ((h << 1) + gear[data[position]]) & 0xFFFFFFFF
+        if not h & mask:
+            return position + 1
+    return limit if limit - start >= MAX_CHUNK else -1
+
+
+def chunk_stream(blocks):
+    """Split an iterable of byte blocks into content-defined chunks.
+
+    Boundaries depend on the content (a gear rolling hash), so an edit
+    early in a file only changes the chunks around it instead of shifting
+    every fixed-size block after it.
+    """
+    buffer = bytearray()
+    for block in blocks:
+        buffer += block
+        start = 0
+        while True:
+            end = _find_boundary(buffer, start)
+            if end < 0:
+                break
+            yield bytes(buffer[start:end])
+            start = end
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+class BackupStore:
+    """Content-addressed, deduplicated and compressed archive of router backups.
+
+    Chunks an ingest has written or decided to reuse are held in
+    ``_pending`` until its backup is recorded, and ``delete`` leaves their
+    files alone, so a chunk cannot vanish between the two.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or storage.data_dir("backups")
+        self.chunk_dir = os.path.join(self.root, "chunks")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._pending = Counter()    # chunk hash -> ingests that will reference it
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def _write_chunk(self, chunk, pending):
+        """Store ``chunk`` under its hash unless it is already there; return (hash, stored size).
+
+        The hash is added to ``pending`` (and ``self._pending``) under the
+        lock before the existence check, so ``delete`` cannot remove the
+        file once it has been found.
+        """
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self._chunk_path(digest)
+        with self._lock:
+            self._pending[digest] += 1
+            pending.append(digest)
+            exists = os.path.exists(path)
+        if exists:
+            return digest, os.path.getsize(path)
+        data = zlib.compress(chunk, COMPRESSION_LEVEL)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as file:
+            file.write(data)
+        os.replace(temp, path)
+        return digest, len(data)
+
+    def ingest(self, router, name, blocks, created=None):
+        """Archive a backup given as bytes or an iterable of byte blocks.
+
+        Chunk files are written while the data streams in; the index is
+        only locked for the short transaction that records the backup.
+        """
+        if isinstance(blocks, (bytes, bytearray)):
+            blocks = [blocks]
+        whole = hashlib.sha256()
+        chunks = []
+        pending = []
+        try:
+            for chunk in chunk_stream(blocks):
+                whole.update(chunk)
+                chunks.append((len(chunk),) + self._write_chunk(chunk, pending))
+            size = sum(length for length, _, _ in chunks)
+
+            with self._lock, self._db:
+                cursor = self._db.execute(
+                    "INSERT INTO backups (router, name, created, size, sha256) VALUES (?, ?, ?, ?, ?)",
+                    (router, name, created or time.time(), size, whole.hexdigest()))
+                backup_id = cursor.lastrowid
+                for seq, (length, digest, stored) in enumerate(chunks):
+                    self._db.execute(
+                        "INSERT INTO chunks (hash, size, stored_size, refs) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT (hash) DO UPDATE SET refs = refs + 1",
+                        (digest, length, stored))
+                    self._db.execute("INSERT INTO backup_chunks (backup_id, seq, hash) VALUES (?, ?, ?)",
+                                     (backup_id, seq, digest))
+        finally:
+            with self._lock:
+                self._pending.subtract(pending)
+                self._pending += Counter()      # drop hashes no ingest holds any more
+        return self.get(backup_id)
+
+    def _fetch(self, query, args=()):
+        # One connection is shared by all sessions; don't read in the middle of an ingest
+        with self._lock:
+            return self._db.execute(query, args).fetchall()
+
+    def get(self, backup_id):
+        rows = self._fetch(
+            "SELECT id, router, name, created, size, sha256 FROM backups WHERE id = ?", (backup_id,))
+        return BackupEntry(*rows[0]) if rows else None
+
+    def list_backups(self, router=None):
+        """Archived backups, newest first, optionally for one router."""
+        query = "SELECT id, router, name, created, size, sha256 FROM backups"
+        args = ()
+        if router is not None:
+            query += " WHERE router = ?"
+            args = (router,)
+        return [BackupEntry(*row) for row in self._fetch(query + " ORDER BY created DESC", args)]
+
+    def latest(self, router, name=None):
+        """Newest backup for ``router`` (and ``name`` if given), or None."""
+        query = "SELECT id, router, name, created, size, sha256 FROM backups WHERE router = ?"
+        args = [router]
+        if name is not None:
+            query += " AND name = ?"
+            args.append(name)
+        rows = self._fetch(query + " ORDER BY created DESC LIMIT 1", args)
+        return BackupEntry(*rows[0]) if rows else None
+
+    def read(self, backup_id):
+        """Yield the original backup bytes chunk by chunk."""
+        hashes = [row[0] for row in self._fetch(
+            "SELECT hash FROM backup_chunks WHERE backup_id = ? ORDER BY seq", (backup_id,))]
+        for digest in hashes:
+            with open(self._chunk_path(digest), "rb") as file:
+                yield zlib.decompress(file.read())
+
+    def delete(self, backup_id):
+        """Remove a backup and any chunks no other backup uses."""
+        with self._lock, self._db:
+            hashes = [row[0] for row in self._db.execute(
+                "SELECT hash FROM backup_chunks WHERE backup_id = ?", (backup_id,))]
+            self._db.execute("DELETE FROM backup_chunks WHERE backup_id = ?", (backup_id,))
+            self._db.execute("DELETE FROM backups WHERE id = ?", (backup_id,))
+            for digest in hashes:
+                self._db.execute("UPDATE chunks SET refs = refs - 1 WHERE hash = ?", (digest,))
+            orphans = [row[0] for row in self._db.execute("SELECT hash FROM chunks WHERE refs <= 0")]
+            self._db.execute("DELETE FROM chunks WHERE refs <= 0")
+            for digest in orphans:
+                if self._pending[digest]:
+                    continue            # an ingest in progress is about to reference it again
+                try:
+                    os.remove(self._chunk_path(digest))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        """Logical bytes archived versus bytes actually on disk."""
+        logical = self._fetch("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM backups")[0]
+        stored = self._fetch("SELECT COALESCE(SUM(stored_size), 0), COUNT(*) FROM chunks")[0]
+        return {
+            "backups": logical[1],
+            "logical_bytes": logical[0],
+            "stored_bytes": stored[0],
+            "chunks": stored[1],
+            "ratio": logical[0] / stored[0] if stored[0] else 0.0,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide archive shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BackupStore()
+        return _store
@@ -0,0 +1,423 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import executor
+import storage
+import terse
+
+LAYER7_NAME = "BlockWebsites"
+DNS_COMMENT = "netez-block"
+DOMAIN_RE = re.compile(r"^(?=.{1,253}$)([a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$")
+
+LAYER7_MAX_DOMAINS = 2000   # past this, use DNS entries; one huge regex is not worth it
+BATCH_SIZE = 500            # DNS entries per RouterOS script
+READ_LIMIT = 64 * 1024 * 1024
+FETCH_TIMEOUT = 60          # seconds for a whole blocklist download
+FETCH_LIMIT = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocked (
+    router TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    PRIMARY KEY (router, domain)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS on_router (
+    router TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    PRIMARY KEY (router, domain)
+) WITHOUT ROWID;
+"""
+
+
+def normalize(domain):
+    """Lower-case a domain and strip schemes, paths, ports and a leading ``www.``/``*.``.
+
+    Returns ``None`` if what is left is not a valid domain.
+    """
+    domain = domain.strip().lower()
+    if "://" in domain:
+        domain = domain.split("://", 1)[1]
+    domain = domain.split("/", 1)[0].split(":", 1)[0].rstrip(".")
+    for prefix in ("*.", "www."):
+        if domain.startswith(prefix):
+            domain = domain[len(prefix):]
+    return domain if DOMAIN_RE.match(domain) else None
+
+
+def parse_list(lines):
+    """Yield domains from a blocklist in plain, hosts-file or adblock (``||domain^``) format.
+
+    Works line by line, so a list of any size is never held in memory.
+    Invalid entries are skipped; duplicates are left to the store.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        line = line.split("#", 1)[0].strip()
+        if not line or line[0] in "![":
+            continue
+        if line.startswith("||"):
+            candidates = [line[2:].split("^", 1)[0].split("$", 1)[0]]
+        else:
+            candidates = line.split()
+            if len(candidates) > 1 and not DOMAIN_RE.match(candidates[0].lower()):
+                candidates = candidates[1:]      # hosts file: "0.0.0.0 domain [domain...]"
+        for candidate in candidates:
+            domain = normalize(candidate)
+            if domain:
+                yield domain
+
+
+def _http_opener():
+    """An opener that only speaks http(s), so redirects cannot reach ``file:`` or ``ftp:`` either."""
+    opener = urllib.request.OpenerDirector()
+    for handler in (urllib.request.HTTPHandler, urllib.request.HTTPSHandler, urllib.request.HTTPRedirectHandler,
+                    urllib.request.HTTPDefaultErrorHandler, urllib.request.HTTPErrorProcessor):
+        opener.add_handler(handler())
+    return opener
+
+
+def fetch_list(url, limit=FETCH_LIMIT, timeout=FETCH_TIMEOUT):
+    """Yield the lines of a blocklist served over http(s).
+
+    Other schemes are refused. The download stops with ``ValueError``
+    past ``limit`` bytes and with ``TimeoutError`` after ``timeout``
+    seconds, so it can be fed to ``parse_list`` without trusting the
+    server.
+    """
+    if urllib.parse.urlsplit(url).scheme.lower() not in ("http", "https"):
+        raise ValueError("only http:// and https:// URLs can be imported")
+    deadline = time.monotonic() + timeout
+    with _http_opener().open(url, timeout=timeout) as response:
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > limit:
+            raise ValueError(f"blocklist is larger than {limit:,} bytes")
+        remaining = limit
+        while True:
+            line = response.readline(remaining + 1)
+            if not line:
+                return
+            remaining -= len(line)
+            if remaining < 0:
+                raise ValueError(f"blocklist is larger than {limit:,} bytes")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"blocklist download took longer than {timeout}s")
+            yield line
+
+
+# -- regex compiler --------------------------------------------------------
+
+def _escape(text):
+    return text.replace(".", "\\.")
+
+
+def _literal_alternation(words):
+    """Regex for a set of literal words with shared prefixes factored out."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node):
+        end = "" in node
+        branches = [_escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not (end and len(branches[0]) > 1):
+            body = branches[0]
+        else:
+            body = "(" + "|".join(branches) + ")"
+        return body + "?" if end else body
+
+    return emit(trie)
+
+
+def _collapse(domains):
+    """Drop domains whose parent is also blocked; layer7 matches substrings anyway."""
+    kept = set()
+    for domain in sorted(set(domains), key=lambda d: d.count(".")):
+        labels = domain.split(".")
+        if not any(".".join(labels[i:]) in kept for i in range(1, len(labels) - 1)):
+            kept.add(domain)
+    return sorted(kept)
+
+
+def compile_regex(domains):
+    """Compile domains into one minimal layer7 regex.
+
+    Subdomains of blocked domains are dropped and the rest are merged
+    into a prefix trie, so at every payload position the regex engine
+    only follows the branch for the next character instead of trying
+    each domain in turn.
+    """
+    domains = [d for d in domains if d]
+    if not domains:
+        return ""
+    return _literal_alternation(_collapse(domains))
+
+
+def naive_regex(domains):
+    """Plain alternation of escaped domains, for comparison."""
+    return "|".join(_escape(d) for d in sorted(set(domains)))
+
+
+# -- local blocklist -------------------------------------------------------
+
+class BlocklistStore:
+    """Blocked domains per router, kept locally as the source of truth.
+
+    ``on_router`` mirrors the DNS entries last seen on each router so a
+    refresh can be pushed as a delta.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.path.join(storage.data_dir("blocklists"), "blocklist.sqlite")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def add(self, router, domains):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO blocked (router, domain) VALUES (?, ?)",
+                                 ((router, d) for d in domains))
+
+    def remove(self, router, domains):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM blocked WHERE router = ? AND domain = ?",
+                                 ((router, d) for d in domains))
+
+    def domains(self, router, contains="", limit=-1):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT domain FROM blocked WHERE router = ? AND instr(domain, ?) ORDER BY domain LIMIT ?",
+                (router, contains, limit))]
+
+    def count(self, router):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM blocked WHERE router = ?", (router,)).fetchone()[0]
+
+    def replace(self, router, domains):
+        """Make ``domains`` (any iterable, e.g. ``parse_list``) the router's whole list.
+
+        Domains are staged in a temporary table and deduped by SQLite, so
+        memory stays flat however long the list is. Returns
+        ``{"added", "removed", "total"}``.
+        """
+        with self._lock, self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (domain TEXT PRIMARY KEY) WITHOUT ROWID")
+            self._db.execute("DELETE FROM incoming")
+            self._db.executemany("INSERT OR IGNORE INTO incoming (domain) VALUES (?)", ((d,) for d in domains))
+            removed = self._db.execute(
+                "DELETE FROM blocked WHERE router = ? AND domain NOT IN (SELECT domain FROM incoming)",
+                (router,)).rowcount
+            added = self._db.execute(
+                "INSERT OR IGNORE INTO blocked (router, domain) SELECT ?, domain FROM incoming",
+                (router,)).rowcount
+            total = self._db.execute("SELECT COUNT(*) FROM incoming").fetchone()[0]
+            self._db.execute("DELETE FROM incoming")
+        return {"added": added, "removed": removed, "total": total}
+
+    def set_on_router(self, router, domains):
+        """Replace the mirror of what the router holds."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM on_router WHERE router = ?", (router,))
+            self._db.executemany("INSERT OR IGNORE INTO on_router (router, domain) VALUES (?, ?)",
+                                 ((router, d) for d in domains))
+
+    def mark_on_router(self, router, added=(), removed=()):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO on_router (router, domain) VALUES (?, ?)",
+                                 ((router, d) for d in added))
+            self._db.executemany("DELETE FROM on_router WHERE router = ? AND domain = ?",
+                                 ((router, d) for d in removed))
+
+    def delta(self, router, after="", limit=BATCH_SIZE):
+        """Next page of (domain, action) pairs the router is missing or should drop.
+
+        Pages are keyed on the domain, so entries that fail to apply are
+        not returned again within one pass.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT domain, action FROM ("
+                " SELECT domain, 'add' AS action FROM blocked WHERE router = ?1"
+                "  AND domain NOT IN (SELECT domain FROM on_router WHERE router = ?1)"
+                " UNION ALL"
+                " SELECT domain, 'remove' FROM on_router WHERE router = ?1"
+                "  AND domain NOT IN (SELECT domain FROM blocked WHERE router = ?1)"
+                ") WHERE domain > ?2 ORDER BY domain LIMIT ?3",
+                (router, after, limit)).fetchall()
+
+    def delta_size(self, router):
+        with self._lock:
+            return self._db.execute(
+                "SELECT"
+                " (SELECT COUNT(*) FROM blocked WHERE router = ?1"
+                "  AND domain NOT IN (SELECT domain FROM on_router WHERE router = ?1)),"
+                " (SELECT COUNT(*) FROM on_router WHERE router = ?1"
+                "  AND domain NOT IN (SELECT domain FROM blocked WHERE router = ?1))",
+                (router,)).fetchone()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlocklistStore()
+        return _store
+
+
+# -- router sync -----------------------------------------------------------
+
+def layer7_commands(domains):
+    """Commands that replace every BlockWebsites rule with one consolidated rule set."""
+    commands = [
+        f"/ip firewall filter remove [find layer7-protocol={LAYER7_NAME}]",
+        f"/ip firewall layer7-protocol remove [find name={LAYER7_NAME}]",
+    ]
+    regex = compile_regex(domains)
+    if regex:
+        commands += [
+            f"/ip firewall layer7-protocol add name={LAYER7_NAME} regexp={executor.quote(regex)}",
+            f"/ip firewall filter add chain=forward layer7-protocol={LAYER7_NAME} action=drop",
+        ]
+    return commands
+
+
+def layer7_in_sync(client, domains):
+    """True if the router already holds exactly the one rule set for ``domains``."""
+    protocols = [r for r in terse.iter_terse(executor.execute(
+        client, f"/ip firewall layer7-protocol print terse where name={LAYER7_NAME}").output)]
+    filters = [r for r in terse.iter_terse(executor.execute(
+        client, f"/ip firewall filter print terse where layer7-protocol={LAYER7_NAME}").output)]
+    return layer7_matches(protocols, filters, domains)
+
+
+def layer7_matches(protocols, filters, domains):
+    """True if the ``BlockWebsites`` protocol and filter records are exactly the rule set for ``domains``."""
+    regex = compile_regex(domains)
+    if not regex:
+        return not protocols and not filters
+    return (len(protocols) == 1 and protocols[0].get("regexp") == regex
+            and len(filters) == 1 and filters[0].get("action") == "drop" and not filters[0].disabled)
+
+
+def dns_commands(add, remove):
+    """DNS static entries that answer blocked names (and their subdomains) with 0.0.0.0."""
+    commands = [f"/ip dns static remove [find comment={DNS_COMMENT} and name={executor.quote(d)}]"
+                for d in remove]
+    commands += [f"/ip dns static add name={executor.quote(d)} address=0.0.0.0 match-subdomain=yes "
+                 f"comment={DNS_COMMENT}" for d in add]
+    return commands
+
+
+def read_router_entries(client, router):
+    """Load the router's DNS block entries into the local mirror; return how many there are."""
+    result = executor.execute(client, f"/ip dns static print terse where comment={DNS_COMMENT}",
+                              timeout=300, max_output=READ_LIMIT)
+    if not result.ok or result.truncated:
+        raise RuntimeError(result.error or "DNS static table too large to read")
+    store = get_store()
+    store.set_on_router(router, (r.get("name") for r in terse.iter_terse(result.output) if r.get("name")))
+    return store.delta_size(router)
+
+
+def push_delta(client, router, batch_size=BATCH_SIZE, progress=None):
+    """Send only the additions and removals in batched scripts; return failed results.
+
+    Call ``read_router_entries`` first so the delta is against what the
+    router really has. ``progress(done, total)`` is called after every batch.
+    """
+    store = get_store()
+    total = sum(store.delta_size(router))
+    done, after, failed = 0, "", []
+    while True:
+        page = store.delta(router, after, batch_size)
+        if not page:
+            break
+        after = page[-1][0]
+        adds = [domain for domain, action in page if action == "add"]
+        removes = [domain for domain, action in page if action == "remove"]
+        results = executor.execute_batch(client, dns_commands(adds, removes),
+                                         timeout=max(30, len(page) // 10))
+        status = dict(zip(removes + adds, results))
+        store.mark_on_router(router, [d for d in adds if status[d].ok], [d for d in removes if status[d].ok])
+        failed.extend(result for result in results if not result.ok)
+        done += len(page)
+        if progress is not None:
+            progress(done, total)
+    return failed
+
+
+def sync(client, router, mode="layer7", progress=None):
+    """Bring the router in line with the local blocklist; return the failed results.
+
+    ``layer7`` keeps exactly one layer7 protocol and one drop rule and
+    removes any DNS block entries. ``dns`` removes the layer7 rule set and
+    pushes only the difference between the list and the router's DNS
+    entries.
+    """
+    store = get_store()
+    failed = []
+    if mode == "layer7":
+        if store.count(router) > LAYER7_MAX_DOMAINS:
+            raise ValueError(f"more than {LAYER7_MAX_DOMAINS} domains; use DNS static entries instead")
+        domains = store.domains(router)
+        commands = [] if layer7_in_sync(client, domains) else layer7_commands(domains)
+        commands.append(f"/ip dns static remove [find comment={DNS_COMMENT}]")
+        failed += [r for r in executor.execute_batch(client, commands, timeout=120) if not r.ok]
+        store.set_on_router(router, [])
+    else:
+        if not layer7_in_sync(client, []):
+            failed += [r for r in executor.execute_batch(client, layer7_commands([])) if not r.ok]
+        read_router_entries(client, router)
+        failed += push_delta(client, router, progress=progress)
+    return failed
+
+
+def block(client, router, domain, mode="layer7", progress=None):
+    """Add ``domain`` to the router's list and sync; return the failed results.
+
+    The domain stays on the list only if the router took every command,
+    so a failed sync leaves the list as it was.
+    """
+    store = get_store()
+    if mode == "layer7" and store.count(router) >= LAYER7_MAX_DOMAINS:
+        raise ValueError(f"more than {LAYER7_MAX_DOMAINS} domains; use DNS static entries instead")
+    new = domain not in store.domains(router, domain)
+    store.add(router, [domain])
+    failed = None
+    try:
+        failed = sync(client, router, mode, progress)
+    finally:
+        if new and failed != []:
+            store.remove(router, [domain])
+    return failed
+
+
+def unblock(client, router, domains, mode="layer7", progress=None):
+    """Take ``domains`` off the router's list and sync; return the failed results.
+
+    The domains go back on the list unless the router took every command.
+    """
+    store = get_store()
+    listed = [domain for domain in domains if domain in store.domains(router, domain)]
+    store.remove(router, listed)
+    failed = None
+    try:
+        failed = sync(client, router, mode, progress)
+    finally:
+        if listed and failed != []:
+            store.add(router, listed)
+    return failed
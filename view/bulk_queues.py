@@ -0,0 +1,149 @@
+import csv
+import io
+import ipaddress
+import json
+from dataclasses import dataclass, field
+
+import executor
+import terse
+
+BATCH_SIZE = 200      # commands per RouterOS script
+READ_LIMIT = 64 * 1024 * 1024   # output kept for the queue table; big ones run to tens of MB
+
+
+@dataclass
+class QueueRow:
+    """One desired limit from an import file, in Mbps like the Bandwidth page."""
+    ip: str
+    upload: float
+    download: float
+
+
+@dataclass
+class QueuePlan:
+    """Changes needed to bring the simple queue table in line with an import."""
+    add: list = field(default_factory=list)
+    update: list = field(default_factory=list)
+    remove: list = field(default_factory=list)
+    unchanged: int = 0
+
+    def commands(self):
+        return self.add + self.update + self.remove
+
+    def summary(self):
+        return {"add": len(self.add), "update": len(self.update),
+                "remove": len(self.remove), "unchanged": self.unchanged}
+
+
+def parse_rows(text, fmt=None):
+    """Read ``ip, up, down`` rows from CSV or JSON text; return (rows, errors).
+
+    CSV may have a header (``ip,up,down``) or not. Later rows for the same
+    IP replace earlier ones.
+    """
+    if fmt is None:
+        fmt = "json" if text.lstrip()[:1] in "[{" else "csv"
+    if fmt == "json":
+        raw = json.loads(text)
+        items = [(item.get("ip"), item.get("up"), item.get("down")) for item in raw]
+    else:
+        items = [tuple(line[:3]) for line in csv.reader(io.StringIO(text)) if line and line[0].strip()]
+        if items and items[0][0].strip().lower() in ("ip", "target", "address"):
+            items = items[1:]
+
+    rows, errors = {}, []
+    for number, item in enumerate(items, 1):
+        try:
+            ip, up, down = item
+            ip = str(ipaddress.ip_address(str(ip).strip()))
+            up, down = float(up), float(down)
+            if up <= 0 or down <= 0:
+                raise ValueError("speeds must be positive")
+            rows[ip] = QueueRow(ip, up, down)
+        except Exception as e:
+            errors.append(f"row {number}: {e}")
+    return list(rows.values()), errors
+
+
+def queue_add_command(target_ip, upload_mbps, download_mbps):
+    """Build the simple queue command for a limit given in Mbps (MikroTik uses Kbps)."""
+    upload_speed_kbps = int(upload_mbps * 1024)
+    download_speed_kbps = int(download_mbps * 1024)
+    return f"/queue simple add name={target_ip} target={target_ip}/32 max-limit={upload_speed_kbps}/{download_speed_kbps}"
+
+
+def _limit_key(max_limit):
+    upload, _, download = max_limit.partition("/")
+    return terse.parse_rate(upload or "0"), terse.parse_rate(download or "0")
+
+
+def fetch_queues(client):
+    """Read the simple queue table once (uncached) and index it by target IP.
+
+    Raises ``RuntimeError`` if the read failed or its output was cut
+    short: planning against half a table would add duplicate queues.
+    """
+    result = executor.execute(client, "/queue simple print terse", timeout=120, max_output=READ_LIMIT)
+    if not result.ok:
+        raise RuntimeError(f"could not read the queue table: {result.error or 'timed out'}")
+    if result.truncated:
+        raise RuntimeError(f"the queue table printed more than {READ_LIMIT:,} bytes; "
+                           "refusing to plan against a partial table")
+    return {record.target: record for record in terse.iter_terse(result.output, terse.QueueRecord)
+            if record.target}
+
+
+def plan(rows, current, remove_missing=False):
+    """Diff import ``rows`` against ``current`` queues (from ``fetch_queues``)."""
+    result = QueuePlan()
+    wanted = set()
+    for row in rows:
+        wanted.add(row.ip)
+        command = queue_add_command(row.ip, row.upload, row.download)
+        limit = command.rsplit("max-limit=", 1)[1]
+        existing = current.get(row.ip)
+        if existing is None:
+            result.add.append(command)
+        elif _limit_key(existing.max_limit) != _limit_key(limit):
+            result.update.append(f"/queue simple set [find name={executor.quote(existing.name)}] max-limit={limit}")
+        else:
+            result.unchanged += 1
+
+    if remove_missing:
+        for target, record in current.items():
+            if target not in wanted and not record.dynamic:
+                result.remove.append(f"/queue simple remove [find name={executor.quote(record.name)}]")
+    return result
+
+
+def apply_commands(client, commands, batch_size=BATCH_SIZE, progress=None):
+    """Run queue commands in batched scripts; return the failed ``BatchResult`` entries.
+
+    ``progress(done, total)`` is called after every batch.
+    """
+    failed = []
+    for start in range(0, len(commands), batch_size):
+        batch = commands[start:start + batch_size]
+        results = executor.execute_batch(client, batch, timeout=max(30, len(batch) // 10))
+        failed.extend(result for result in results if not result.ok)
+        if progress is not None:
+            progress(min(start + batch_size, len(commands)), len(commands))
+    return failed
+
+
+def apply(client, queue_plan, batch_size=BATCH_SIZE, progress=None):
+    """Apply a plan in batched scripts; return the failed ``BatchResult`` entries."""
+    return apply_commands(client, queue_plan.commands(), batch_size, progress)
+
+
+def apply_job(client, job, commands):
+    """Background job: ``apply_commands`` with progress per batch; fails if any change failed.
+
+    Cancelling stops it between batches.
+    """
+    failed = apply_commands(client, commands,
+                            progress=lambda done, total: job.progress(done, total, f"{done}/{total} changes"))
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(commands)} changes failed, first: "
+                           f"`{failed[0].command}` ({failed[0].error})")
+    return f"Applied {len(commands)} changes"
@@ -0,0 +1,108 @@
+import streamlit as st
+import datetime
+import time
+import config_snapshots
+import connection_pool
+import job_panel
+import jobs
+import storage
+
+MAX_DIFF_LINES = 500        # lines shown per section; the rest is summarized
+TIMELINE = 20               # snapshots summarized in the history table
+
+def label(snapshot):
+    return f"#{snapshot.id} · {time.strftime('%Y-%m-%d %H:%M', time.localtime(snapshot.created))} · {snapshot.lines:,} lines"
+
+def take_snapshot(router):
+    """Export the running configuration into the history."""
+    try:
+        with connection_pool.lease(router) as client:
+            snapshot, changed = config_snapshots.capture(client, router)
+        if changed:
+            st.success(f"✅ Snapshot saved ({snapshot.lines:,} lines)")
+        else:
+            st.info("No changes since the last snapshot.")
+    except Exception as e:
+        st.error(f"❌ Failed to take snapshot: {e}")
+
+def show_timeline(store, snapshots):
+    """One row per snapshot with the sections that changed since the one before."""
+    recent = snapshots[:TIMELINE + 1]
+    rows = []
+    for newer, older in zip(recent, recent[1:] + [None]):
+        sections = store.diff(older.id, newer.id) if older is not None else []
+        rows.append({
+            "Taken": time.strftime("%Y-%m-%d %H:%M", time.localtime(newer.created)),
+            "Lines": newer.lines,
+            "Changed sections": ", ".join(section.path for section in sections) if older else "first snapshot",
+        })
+    st.dataframe(rows[:TIMELINE], width="stretch")
+
+def show_diff(sections):
+    """Only the sections that differ, each with its own diff."""
+    if not sections:
+        st.success("✅ No differences")
+        return
+    st.write(f"**{len(sections)}** sections changed")
+    for section in sections:
+        title = f"{section.path} · +{len(section.added)} −{len(section.removed)} ~{len(section.changed)}"
+        with st.expander(title + (" · order changed" if section.reordered else "")):
+            lines = config_snapshots.diff_lines(section)
+            st.code("\n".join(lines[:MAX_DIFF_LINES]), language="diff")
+            if len(lines) > MAX_DIFF_LINES:
+                st.caption(f"… {len(lines) - MAX_DIFF_LINES:,} more lines")
+
+def schedule_snapshots(router):
+    """Daily snapshots for this router, run by the background scheduler."""
+    if job_panel.show_schedules(router, kinds=["snapshot"]):
+        return
+    with st.form("snapshot_schedule"):
+        at = st.time_input("Take a snapshot daily at", value=datetime.time(3, 0))
+        if st.form_submit_button("➕ Add Schedule"):
+            jobs.get_scheduler().add_schedule("snapshot", router, at=at.strftime("%H:%M"))
+            st.rerun()
+
+def run():
+    """Configuration History Page"""
+    st.subheader("🕰️ Configuration History")
+
+    router = st.session_state.get("router")
+    if router is None:
+        st.error("⚠️ No active MikroTik connection. Please log in first.")
+        return
+
+    st.write("Snapshots of `/export terse`, compared menu by menu.")
+    if st.button("📸 Take Snapshot"):
+        take_snapshot(router)
+    schedule_snapshots(router)
+
+    store = config_snapshots.get_store()
+    snapshots = store.list_snapshots(storage.router_id(router))
+    if not snapshots:
+        st.info("No snapshots for this router yet.")
+        return
+
+    st.write("### 📜 History")
+    show_timeline(store, snapshots)
+
+    st.write("### 🔍 Compare")
+    labels = {label(snapshot): snapshot for snapshot in snapshots}
+    names = list(labels)
+    col1, col2 = st.columns(2)
+    with col1:
+        newer = labels[st.selectbox("Snapshot", names, index=0)]
+    with col2:
+        older = labels[st.selectbox("Compared with", names, index=min(1, len(names) - 1))]
+    show_diff(store.diff(older.id, newer.id))
+
+    if st.button("📦 Prepare Export File"):
+        st.download_button(
+            label="⬇️ Download Export",
+            data=store.text(newer.id),
+            file_name=f"{storage.router_id(router).replace(':', '_')}-"
+                      f"{time.strftime('%Y%m%d-%H%M', time.localtime(newer.created))}.rsc",
+            mime="text/plain"
+        )
+
+if __name__ == "__main__":
+    run()
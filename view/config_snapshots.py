@@ -0,0 +1,376 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import executor
+import storage
+import terse
+
+EXPORT_COMMAND = "/export terse"
+EXPORT_MAX_OUTPUT = 64 * 1024 * 1024
+EXPORT_TIMEOUT = 120
+COMPRESSION_LEVEL = 6
+BLOCK_LINES = 128             # average lines per stored block; boundaries follow the content
+MAX_BLOCK_LINES = 1024
+CACHE_BLOCKS = 4096           # decompressed blocks kept for repeated diffs
+# Attributes that identify an ``add`` item, in order of preference
+KEY_ATTRS = ("name", "default-name", "mac-address", "address", "target", "comment")
+
+# "/ip firewall filter add chain=forward ..." -> menu path, command
+_LINE_RE = re.compile(r"(/[^=\[\]\"]*?)\s+((?:add|set|remove|enable|disable|unset|move)\b.*)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    router TEXT NOT NULL,
+    created REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    lines INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_router ON snapshots (router, created);
+CREATE TABLE IF NOT EXISTS blocks (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    lines INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_sections (
+    snapshot_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    blocks TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, path)
+);
+"""
+
+
+@dataclass
+class Snapshot:
+    """Index row describing one captured export."""
+    id: int
+    router: str
+    created: float
+    sha256: str
+    lines: int
+
+
+@dataclass
+class SectionDiff:
+    """What changed in one menu (``/ip firewall filter``, ...) between two snapshots."""
+    path: str
+    added: list = field(default_factory=list)       # export lines, without the menu path
+    removed: list = field(default_factory=list)
+    changed: list = field(default_factory=list)     # (item key, {attribute: (old, new)})
+    reordered: bool = False                         # same lines, in another order or repeated
+
+    @property
+    def count(self):
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+
+def split_sections(text):
+    """Group an export by menu path: ``{path: [command lines]}`` in export order.
+
+    Takes both ``/export terse`` (path on every line) and plain ``/export``
+    (path on a line of its own, long lines continued with ``\\``). Comment
+    lines are dropped: the header carries the export time, which would make
+    every snapshot differ.
+    """
+    sections = {}
+    current = None
+    text = re.sub(r"\\\r?\n\s*", "", text)
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line[0] == "#":
+            continue
+        match = _LINE_RE.match(line) if line[0] == "/" else None
+        if match is not None:
+            path, line = match.groups()
+        elif line[0] == "/":
+            current = line
+            continue
+        else:
+            path = current or "/"
+        sections.setdefault(path, []).append(line)
+    return sections
+
+
+def item_key(line):
+    """Identity of the item an export line configures, so edits pair up with what they replaced."""
+    verb, _, rest = line.partition(" ")
+    if rest.startswith("["):
+        return f"{verb} {rest[:rest.find(']') + 1]}"
+    if verb == "set":
+        first = rest.split(" ", 1)[0]
+        return f"set {first}" if first and "=" not in first else "set"     # e.g. ``/ip service set telnet``
+    attrs = terse.parse_pairs(rest)
+    for attr in KEY_ATTRS:
+        if attr in attrs:
+            return f"{attr}={attrs[attr]}"
+    return line
+
+
+def _attributes(line):
+    verb, _, rest = line.partition(" ")
+    if rest.startswith("["):
+        rest = rest[rest.find("]") + 1:]
+    return terse.parse_pairs(rest)
+
+
+def _keyed(lines):
+    keyed = {}
+    for line in lines:
+        key = item_key(line)
+        number = 1
+        while key in keyed:
+            number += 1
+            key = f"{item_key(line)} #{number}"
+        keyed[key] = line
+    return keyed
+
+
+def split_blocks(lines):
+    """Cut a section into blocks of lines at content-defined boundaries.
+
+    A line ends a block when its CRC is a multiple of ``BLOCK_LINES``, so
+    adding or removing an item only changes the block around it instead
+    of shifting every block after it.
+    """
+    blocks, block = [], []
+    for line in lines:
+        block.append(line)
+        if len(block) >= MAX_BLOCK_LINES or not zlib.crc32(line.encode()) % BLOCK_LINES:
+            blocks.append(block)
+            block = []
+    if block:
+        blocks.append(block)
+    return blocks
+
+
+def diff_section(path, old_lines, new_lines):
+    """Structural diff of one section.
+
+    Lines present on both sides drop out first, so only the lines that
+    differ are parsed. Removed and added lines for the same item key
+    become one ``changed`` entry listing the attributes that differ.
+    """
+    old_set, new_set = set(old_lines), set(new_lines)
+    removed = _keyed(line for line in old_lines if line not in new_set)
+    added = _keyed(line for line in new_lines if line not in old_set)
+    result = SectionDiff(path)
+    for key, line in added.items():
+        old = removed.pop(key, None)
+        if old is None:
+            result.added.append(line)
+            continue
+        before, after = _attributes(old), _attributes(line)
+        result.changed.append((key, {attr: (before.get(attr), after.get(attr))
+                                     for attr in before.keys() | after.keys()
+                                     if before.get(attr) != after.get(attr)}))
+    result.removed = list(removed.values())
+    result.reordered = not result.count and old_lines != new_lines
+    return result
+
+
+def diff_lines(section, limit=None):
+    """A section diff as ``-``/``+`` lines, changed items under an ``@@ key`` line."""
+    lines = [f"- {line}" for line in section.removed] + [f"+ {line}" for line in section.added]
+    for key, changes in section.changed:
+        lines.append(f"@@ {key}")
+        for attr, (old, new) in sorted(changes.items()):
+            if old is not None:
+                lines.append(f"- {attr}={old}")
+            if new is not None:
+                lines.append(f"+ {attr}={new}")
+    if section.reordered:
+        lines.append("@@ same items in a different order")
+    return lines if limit is None else lines[:limit]
+
+
+class SnapshotStore:
+    """``/export`` history per router, stored section by section.
+
+    Sections are cut into content-defined blocks of lines (``split_blocks``)
+    that are compressed and kept once under their hash, like the chunks
+    of ``backup_store``; a snapshot records each section's block list. A
+    new snapshot only adds the blocks that changed, and a diff compares
+    section hashes, then block hashes, and only reads and diffs the
+    blocks that differ, so its cost follows the size of the change rather
+    than the size of the export.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.path.join(storage.data_dir("snapshots"), "snapshots.sqlite")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._cache = OrderedDict()
+
+    def _fetch(self, query, args=()):
+        with self._lock:
+            return self._db.execute(query, args).fetchall()
+
+    def add(self, router, text, created=None):
+        """Store an export of ``router``; return ``(snapshot, True)``, or the latest and False if unchanged."""
+        sections = split_sections(text)
+        blocks = {}                                     # block hash -> lines
+        layout = {}                                     # path -> (section hash, [block hashes])
+        for path, lines in sections.items():
+            hashes = []
+            for block in split_blocks(lines):
+                digest = hashlib.sha256("\n".join(block).encode()).hexdigest()
+                blocks[digest] = block
+                hashes.append(digest)
+            layout[path] = (hashlib.sha256(" ".join(hashes).encode()).hexdigest(), hashes)
+        whole = hashlib.sha256("\n".join(f"{path} {digest}" for path, (digest, _) in layout.items())
+                               .encode()).hexdigest()
+        latest = self.latest(router)
+        if latest is not None and latest.sha256 == whole:
+            return latest, False
+
+        known = self._known(list(blocks))
+        compressed = {digest: zlib.compress("\n".join(block).encode(), COMPRESSION_LEVEL)
+                      for digest, block in blocks.items() if digest not in known}
+        with self._lock, self._db:
+            snapshot_id = self._db.execute(
+                "INSERT INTO snapshots (router, created, sha256, lines) VALUES (?, ?, ?, ?)",
+                (router, created or time.time(), whole, sum(map(len, sections.values())))).lastrowid
+            for seq, (path, (digest, hashes)) in enumerate(layout.items()):
+                self._db.execute(
+                    "INSERT INTO snapshot_sections (snapshot_id, seq, path, hash, blocks) VALUES (?, ?, ?, ?, ?)",
+                    (snapshot_id, seq, path, digest, " ".join(hashes)))
+                for block in hashes:
+                    if block not in compressed:
+                        if self._db.execute("UPDATE blocks SET refs = refs + 1 WHERE hash = ?",
+                                            (block,)).rowcount:
+                            continue
+                        # delete() dropped it after _known looked; store its data again
+                        compressed[block] = zlib.compress("\n".join(blocks[block]).encode(), COMPRESSION_LEVEL)
+                    self._db.execute(
+                        "INSERT INTO blocks (hash, data, lines, refs) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT (hash) DO UPDATE SET refs = refs + 1",
+                        (block, compressed[block], len(blocks[block])))
+        # The next diff is most likely against this snapshot; keep what changed ready
+        for digest in compressed:
+            self._remember(digest, blocks[digest])
+        return self.get(snapshot_id), True
+
+    def _known(self, hashes):
+        known = set()
+        for start in range(0, len(hashes), 500):
+            part = hashes[start:start + 500]
+            known.update(row[0] for row in self._fetch(
+                f"SELECT hash FROM blocks WHERE hash IN ({', '.join('?' * len(part))})", part))
+        return known
+
+    def get(self, snapshot_id):
+        rows = self._fetch("SELECT id, router, created, sha256, lines FROM snapshots WHERE id = ?", (snapshot_id,))
+        return Snapshot(*rows[0]) if rows else None
+
+    def list_snapshots(self, router):
+        """Snapshots of ``router``, newest first."""
+        return [Snapshot(*row) for row in self._fetch(
+            "SELECT id, router, created, sha256, lines FROM snapshots WHERE router = ? ORDER BY created DESC",
+            (router,))]
+
+    def latest(self, router):
+        rows = self._fetch("SELECT id, router, created, sha256, lines FROM snapshots WHERE router = ? "
+                           "ORDER BY created DESC LIMIT 1", (router,))
+        return Snapshot(*rows[0]) if rows else None
+
+    def sections(self, snapshot_id):
+        """``{path: (section hash, [block hashes])}`` of a snapshot, in export order."""
+        return {path: (digest, blocks.split()) for path, digest, blocks in self._fetch(
+            "SELECT path, hash, blocks FROM snapshot_sections WHERE snapshot_id = ? ORDER BY seq", (snapshot_id,))}
+
+    def _remember(self, digest, lines):
+        with self._lock:
+            self._cache[digest] = lines
+            if len(self._cache) > CACHE_BLOCKS:
+                self._cache.popitem(last=False)
+
+    def lines(self, hashes):
+        """Command lines of the given blocks, in order."""
+        found = {}
+        with self._lock:
+            for digest in hashes:
+                if digest in self._cache:
+                    self._cache.move_to_end(digest)
+                    found[digest] = self._cache[digest]
+        missing = [digest for digest in dict.fromkeys(hashes) if digest not in found]
+        for start in range(0, len(missing), 500):
+            part = missing[start:start + 500]
+            for digest, data in self._fetch(
+                    f"SELECT hash, data FROM blocks WHERE hash IN ({', '.join('?' * len(part))})", part):
+                found[digest] = zlib.decompress(data).decode().split("\n")
+                self._remember(digest, found[digest])
+        return [line for digest in hashes for line in found.get(digest, ())]
+
+    def text(self, snapshot_id):
+        """The snapshot as ``/export terse`` text."""
+        return "\n".join(f"{path} {line}" for path, (_, blocks) in self.sections(snapshot_id).items()
+                         for line in self.lines(blocks))
+
+    def diff(self, old_id, new_id):
+        """``SectionDiff`` for every menu that differs between two snapshots, in export order."""
+        old, new = self.sections(old_id), self.sections(new_id)
+        result = []
+        for path in list(new) + [path for path in old if path not in new]:
+            old_digest, old_blocks = old.get(path, (None, []))
+            new_digest, new_blocks = new.get(path, (None, []))
+            if old_digest == new_digest:
+                continue
+            kept = set(old_blocks) & set(new_blocks)
+            section = diff_section(path, self.lines([block for block in old_blocks if block not in kept]),
+                                   self.lines([block for block in new_blocks if block not in kept]))
+            if section.count or section.reordered:
+                result.append(section)
+        return result
+
+    def delete(self, snapshot_id):
+        """Remove a snapshot and any blocks no other snapshot uses."""
+        with self._lock, self._db:
+            for (blocks,) in self._db.execute("SELECT blocks FROM snapshot_sections WHERE snapshot_id = ?",
+                                              (snapshot_id,)).fetchall():
+                for block in blocks.split():
+                    self._db.execute("UPDATE blocks SET refs = refs - 1 WHERE hash = ?", (block,))
+            self._db.execute("DELETE FROM snapshot_sections WHERE snapshot_id = ?", (snapshot_id,))
+            self._db.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+            self._db.execute("DELETE FROM blocks WHERE refs <= 0")
+
+
+def capture(client, router):
+    """Export the router's configuration and store it; return ``(snapshot, changed)``."""
+    result = executor.execute(client, EXPORT_COMMAND, timeout=EXPORT_TIMEOUT, max_output=EXPORT_MAX_OUTPUT)
+    if not result.ok:
+        raise RuntimeError(result.error or "export failed")
+    if result.truncated:
+        raise RuntimeError(f"export is larger than {EXPORT_MAX_OUTPUT:,} bytes")
+    return get_store().add(storage.router_id(router), result.output)
+
+
+def snapshot_job(client, job):
+    """Background job: ``capture`` for scheduled snapshots."""
+    job.progress(0, 1, "Exporting configuration")
+    snapshot, changed = capture(client, job.key)
+    return f"{snapshot.lines:,} lines" if changed else "no changes since the last snapshot"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide snapshot history shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
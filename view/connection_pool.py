@@ -0,0 +1,329 @@
+import hashlib
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+
+import instrumentation
+
+KEEPALIVE_INTERVAL = 30      # seconds between SSH keepalive packets
+HEALTH_CHECK_AFTER = 15      # probe a transport that has been idle this long before leasing it
+IDLE_TIMEOUT = 600           # close transports nobody has leased for this long
+FORGET_AFTER = 12 * 3600     # drop stored credentials after this long without a lease
+REAP_INTERVAL = 60
+CONNECT_TIMEOUT = 10
+
+# How the app talks to a router: SSH channels, or the binary RouterOS API (plain or TLS)
+TRANSPORTS = ("ssh", "api", "api-ssl")
+
+
+class SessionExpired(ConnectionError):
+    """The pool no longer holds a login for the key being leased."""
+
+
+def _digest(password):
+    return hashlib.sha256(password.encode()).digest()
+
+
+class _Entry:
+    """One pooled transport plus what is needed to re-open it."""
+
+    def __init__(self, key, password, transport="ssh"):
+        self.key = key
+        self.password = password
+        self.transport = transport
+        self.digest = _digest(password)
+        self.client = None
+        self.leases = 0
+        self.pinned = False       # credentials kept past FORGET_AFTER, for scheduled jobs
+        self.holds = 0            # short tasks (fleet runs) using it; see ``register(hold=True)``
+        self.temporary = True     # only registered by such tasks, so closed after the last one
+        self.last_used = time.monotonic()
+        self.lock = threading.RLock()
+
+
+class ConnectionPool:
+    """Process-wide pool of SSH transports keyed by (host, port, username).
+
+    Every Streamlit session that logs in to the same router with the same
+    credentials shares one transport. Pages borrow it with ``lease(key)``;
+    dead transports are re-opened transparently and idle ones are reaped.
+    A router registered with the ``api`` or ``api-ssl`` transport is leased
+    as a ``routeros_api.ApiClient`` instead, which the executor accepts in
+    place of an SSH client.
+    """
+
+    def __init__(self, keepalive_interval=KEEPALIVE_INTERVAL, idle_timeout=IDLE_TIMEOUT,
+                 forget_after=FORGET_AFTER, reap_interval=REAP_INTERVAL):
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.forget_after = forget_after
+        self.reap_interval = reap_interval
+        self._entries = {}
+        self._retired = []
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def register(self, host, port, username, password, transport="ssh", hold=False):
+        """Authenticate against the router and return the pool key for it.
+
+        An existing transport is reused only when the password and transport
+        match the ones it was opened with; otherwise a fresh login is performed.
+        With ``hold`` the login is for a short task only: each hold is
+        undone with ``release(key)``, which closes the login after the last
+        one unless somebody registered the key without ``hold`` meanwhile.
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"unknown transport {transport!r}")
+        key = (host, int(port), username)
+        with self._lock:
+            entry = self._entries.get(key)
+            reuse = (entry is not None and entry.transport == transport
+                     and hmac.compare_digest(entry.digest, _digest(password)))
+            if reuse:
+                self._claim(entry, hold)
+        if reuse:
+            try:
+                with entry.lock:
+                    self._ensure_connected(entry)
+                    entry.last_used = time.monotonic()
+            except Exception:
+                if hold:
+                    self.release(key)
+                raise
+            self._start_reaper()
+            return key
+
+        fresh = _Entry(key, password, transport)
+        self._open(fresh)
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                # Other tasks holding the key release it against the new login
+                fresh.holds, fresh.temporary = old.holds, old.temporary
+                self._retired.append(old)
+            self._claim(fresh, hold)
+            self._entries[key] = fresh
+        self._close_retired()
+        self._start_reaper()
+        return key
+
+    def release(self, key):
+        """Undo one ``register(..., hold=True)``; closes a login nobody else registered once unheld."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.holds:
+                return
+            entry.holds -= 1
+            if entry.holds or not entry.temporary:
+                return
+            del self._entries[key]
+            self._retired.append(entry)
+        self._close_retired()
+
+    @staticmethod
+    def _claim(entry, hold):
+        """Count a registration of ``entry``. Caller holds ``self._lock``."""
+        if hold:
+            entry.holds += 1
+        else:
+            entry.temporary = False
+
+    @contextmanager
+    def lease(self, key):
+        """Borrow the live client for ``key`` for the duration of a with-block."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            raise SessionExpired("Router session expired. Please log in again.")
+
+        with entry.lock:
+            self._ensure_connected(entry)
+            entry.leases += 1
+            client = entry.client
+        try:
+            yield client
+        finally:
+            with entry.lock:
+                entry.leases -= 1
+                entry.last_used = time.monotonic()
+            self._close_retired()
+
+    def pin(self, key):
+        """Keep the credentials for ``key`` however long it goes unused; False if it is not registered."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return False
+        entry.pinned = True
+        return True
+
+    def registered(self, key):
+        """True if ``key`` has a login in the pool, connected or not."""
+        with self._lock:
+            return key in self._entries
+
+    def is_connected(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and self._transport_active(entry.client)
+
+    def close(self, key):
+        """Forget ``key`` and close its transport once nobody holds a lease."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._retired.append(entry)
+        self._close_retired()
+
+    def close_all(self):
+        with self._lock:
+            self._retired.extend(self._entries.values())
+            self._entries.clear()
+        self._close_retired()
+
+    def stats(self):
+        """Snapshot of the pool for status displays."""
+        with self._lock:
+            entries = list(self._entries.values())
+        now = time.monotonic()
+        return [
+            {
+                "router": f"{e.key[2]}@{e.key[0]}:{e.key[1]}",
+                "transport": e.transport,
+                "connected": self._transport_active(e.client),
+                "leases": e.leases,
+                "idle_seconds": round(now - e.last_used, 1),
+            }
+            for e in entries
+        ]
+
+    # -- internals ---------------------------------------------------------
+
+    @staticmethod
+    def _transport_active(client):
+        if client is None:
+            return False
+        if getattr(client, "is_api", False):
+            return client.is_active()
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _open(self, entry):
+        if entry.transport != "ssh":
+            self._open_api(entry)
+            return
+        import paramiko  # deferred to the first connect; it is the app's most expensive import
+
+        host, port, username = entry.key
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        started = time.perf_counter()
+        try:
+            client.connect(host, port=port, username=username, password=entry.password,
+                           timeout=CONNECT_TIMEOUT, banner_timeout=CONNECT_TIMEOUT,
+                           auth_timeout=CONNECT_TIMEOUT, look_for_keys=False, allow_agent=False)
+        except Exception:
+            instrumentation.connected(f"{host}:{port}", time.perf_counter() - started, ok=False)
+            raise
+        instrumentation.connected(instrumentation.router_of(client), time.perf_counter() - started, ok=True)
+        client.get_transport().set_keepalive(self.keepalive_interval)
+        entry.client = client
+
+    def _open_api(self, entry):
+        import routeros_api
+
+        host, port, username = entry.key
+        started = time.perf_counter()
+        try:
+            client = routeros_api.connect(host, port, username, entry.password,
+                                          use_tls=entry.transport == "api-ssl", timeout=CONNECT_TIMEOUT)
+        except Exception:
+            instrumentation.connected(f"{host}:{port}", time.perf_counter() - started, ok=False)
+            raise
+        instrumentation.connected(instrumentation.router_of(client), time.perf_counter() - started, ok=True)
+        entry.client = client
+
+    def _healthy(self, entry):
+        if not self._transport_active(entry.client):
+            return False
+        if entry.leases or time.monotonic() - entry.last_used < HEALTH_CHECK_AFTER:
+            return True
+        if entry.transport != "ssh":
+            return True         # a dead API socket is noticed by its reader thread
+        try:
+            entry.client.get_transport().send_ignore()
+            return True
+        except Exception:
+            return False
+
+    def _ensure_connected(self, entry):
+        """Reconnect ``entry`` if its transport died. Caller holds ``entry.lock``."""
+        if self._healthy(entry):
+            return
+        if entry.client is not None:
+            try:
+                entry.client.close()
+            except Exception:
+                pass
+            entry.client = None
+        self._open(entry)
+
+    def _close_retired(self):
+        with self._lock:
+            idle = [e for e in self._retired if e.leases == 0]
+            self._retired = [e for e in self._retired if e.leases > 0]
+        for entry in idle:
+            with entry.lock:
+                if entry.client is not None:
+                    entry.client.close()
+                    entry.client = None
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="ssh-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            self.reap()
+
+    def reap(self):
+        """Close idle transports and forget long-unused credentials."""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, entry in entries:
+            with entry.lock:
+                if entry.leases:
+                    continue
+                idle = now - entry.last_used
+                if entry.client is not None and idle > self.idle_timeout:
+                    entry.client.close()
+                    entry.client = None
+                if idle > self.forget_after and not entry.pinned and not entry.holds:
+                    with self._lock:
+                        if self._entries.get(key) is entry:
+                            del self._entries[key]
+        self._close_retired()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool shared by every Streamlit session."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def lease(key):
+    """Shortcut for ``get_pool().lease(key)``."""
+    return get_pool().lease(key)
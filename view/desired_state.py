@@ -0,0 +1,251 @@
+import ipaddress
+import json
+from dataclasses import dataclass, field
+
+import blocklist
+import bulk_queues
+import executor
+import terse
+
+SECTIONS = ("addresses", "dns", "queues", "blocks", "wireless")
+READ_LIMIT = 64 * 1024 * 1024   # output kept for the read script; big queue tables run to tens of MB
+
+# Read commands per section; all of them go to the router in one batched script
+READS = {
+    "addresses": ["/ip address print terse"],
+    "dns": [":put [/ip dns get servers]", ":put [/ip dns get allow-remote-requests]"],
+    "queues": ["/queue simple print terse"],
+    "blocks": [
+        f"/ip firewall layer7-protocol print terse where name={blocklist.LAYER7_NAME}",
+        f"/ip firewall filter print terse where layer7-protocol={blocklist.LAYER7_NAME}",
+    ],
+    "wireless": ["/interface wireless print terse", "/interface wireless security-profiles print terse"],
+}
+
+
+@dataclass
+class DesiredState:
+    """What the router should look like. Sections left as None are not managed.
+
+    addresses: {interface: [address/prefix, ...]}, the complete set per listed interface
+    dns: {"servers": [...], "allow_remote_requests": bool}
+    queues: [QueueRow, ...], plus ``prune_queues`` to remove queues not listed
+    blocks: [domain, ...], the consolidated layer7 blocklist
+    wireless: {interface: {"ssid": ..., "password": ...}}
+    """
+    addresses: dict = None
+    dns: dict = None
+    queues: list = None
+    prune_queues: bool = False
+    blocks: list = None
+    wireless: dict = None
+
+    def sections(self):
+        return [name for name in SECTIONS if getattr(self, name) is not None]
+
+
+@dataclass
+class Change:
+    section: str
+    description: str
+    command: str
+
+
+@dataclass
+class Plan:
+    """Minimal change set from current to desired state."""
+    changes: list = field(default_factory=list)
+    blocks: list = None       # domains to record locally once the rule set is applied
+
+    def commands(self):
+        return [change.command for change in self.changes]
+
+    def summary(self):
+        counts = {}
+        for change in self.changes:
+            counts[change.section] = counts.get(change.section, 0) + 1
+        return counts
+
+
+def _parse_text(text, fmt):
+    if fmt is None:
+        fmt = "json" if text.lstrip()[:1] in "[{" else "yaml"
+    if fmt == "json":
+        return json.loads(text)
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError("YAML configs need PyYAML (pip install pyyaml); use JSON instead") from None
+    return yaml.safe_load(text) or {}
+
+
+def load_state(text, fmt=None):
+    """Build a ``DesiredState`` from YAML or JSON text, validating every value."""
+    raw = _parse_text(text, fmt)
+    unknown = set(raw) - set(SECTIONS) - {"prune_queues"}
+    if unknown:
+        raise ValueError(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    state = DesiredState(prune_queues=bool(raw.get("prune_queues", False)))
+    if raw.get("addresses") is not None:
+        state.addresses = {
+            str(interface): sorted({str(ipaddress.ip_interface(a)) for a in addresses or []})
+            for interface, addresses in raw["addresses"].items()
+        }
+    if raw.get("dns") is not None:
+        servers = raw["dns"].get("servers", [])
+        if isinstance(servers, str):
+            servers = servers.split(",")
+        state.dns = {
+            "servers": [str(ipaddress.ip_address(s.strip())) for s in servers if s.strip()],
+            "allow_remote_requests": bool(raw["dns"].get("allow_remote_requests", True)),
+        }
+    if raw.get("queues") is not None:
+        rows, errors = bulk_queues.parse_rows(json.dumps(raw["queues"]), "json")
+        if errors:
+            raise ValueError("queues: " + "; ".join(errors))
+        state.queues = rows
+    if raw.get("blocks") is not None:
+        domains = [(d, blocklist.normalize(str(d))) for d in raw["blocks"]]
+        invalid = [str(original) for original, domain in domains if domain is None]
+        if invalid:
+            raise ValueError(f"blocks: invalid domains {', '.join(invalid)}")
+        state.blocks = sorted({domain for _, domain in domains})
+        if len(state.blocks) > blocklist.LAYER7_MAX_DOMAINS:
+            raise ValueError(f"blocks: more than {blocklist.LAYER7_MAX_DOMAINS} domains; import them as a DNS blocklist")
+    if raw.get("wireless") is not None:
+        state.wireless = {str(name): {k: str(v) for k, v in (settings or {}).items() if k in ("ssid", "password")}
+                          for name, settings in raw["wireless"].items()}
+    return state
+
+
+def read_current(client, state):
+    """Read every managed section in a single batched script; return {section: [outputs]}.
+
+    Raises ``RuntimeError`` if any read failed or its output was cut
+    short: planning against half a table would add and remove live items.
+    """
+    commands = [command for section in state.sections() for command in READS[section]]
+    results = executor.execute_batch(client, commands, timeout=120, max_output=READ_LIMIT)
+    failed = [result for result in results if not result.ok]
+    if failed:
+        raise RuntimeError(f"could not read `{failed[0].command}`: {failed[0].error or 'not run'}")
+    truncated = [result for result in results if result.truncated]
+    if truncated:
+        raise RuntimeError(f"`{truncated[0].command}` printed more than {READ_LIMIT:,} bytes; "
+                           "refusing to plan against a partial table")
+    outputs, position = {}, 0
+    for section in state.sections():
+        count = len(READS[section])
+        outputs[section] = [result.output for result in results[position:position + count]]
+        position += count
+    return outputs
+
+
+def _diff_addresses(wanted, output):
+    changes = []
+    current = {}
+    for record in terse.iter_terse(output, terse.AddressRecord):
+        if not record.dynamic:
+            current.setdefault(record.interface, set()).add(record.address)
+    for interface, addresses in wanted.items():
+        have = current.get(interface, set())
+        for address in sorted(have - set(addresses)):
+            changes.append(Change("addresses", f"remove {address} from {interface}",
+                                  f"/ip address remove [find address={executor.quote(address)} "
+                                  f"interface={executor.quote(interface)}]"))
+        for address in addresses:
+            if address not in have:
+                changes.append(Change("addresses", f"add {address} to {interface}",
+                                      f"/ip address add address={address} interface={executor.quote(interface)}"))
+    return changes
+
+
+def _diff_dns(wanted, servers_output, remote_output):
+    current = [s.strip() for s in servers_output.replace(";", ",").split(",") if s.strip()]
+    remote = remote_output.strip() in ("true", "yes")
+    if current == wanted["servers"] and remote == wanted["allow_remote_requests"]:
+        return []
+    servers = ",".join(wanted["servers"])
+    allow = "yes" if wanted["allow_remote_requests"] else "no"
+    return [Change("dns", f"servers {servers}, remote requests {allow}",
+                   f"/ip dns set servers={executor.quote(servers)} allow-remote-requests={allow}")]
+
+
+def _diff_queues(rows, prune, output):
+    current = {record.target: record for record in terse.iter_terse(output, terse.QueueRecord) if record.target}
+    queue_plan = bulk_queues.plan(rows, current, remove_missing=prune)
+    return ([Change("queues", "add queue", command) for command in queue_plan.add]
+            + [Change("queues", "change limit", command) for command in queue_plan.update]
+            + [Change("queues", "remove queue", command) for command in queue_plan.remove])
+
+
+def _diff_blocks(domains, protocols_output, filters_output):
+    protocols = terse.parse_terse(protocols_output)
+    filters = terse.parse_terse(filters_output)
+    if blocklist.layer7_matches(protocols, filters, domains):
+        return []
+    return [Change("blocks", f"block {len(domains)} domains", command)
+            for command in blocklist.layer7_commands(domains)]
+
+
+def _diff_wireless(wanted, interfaces_output, profiles_output):
+    changes = []
+    interfaces = {r.get("name"): r for r in terse.iter_terse(interfaces_output)}
+    profiles = {r.get("name"): r for r in terse.iter_terse(profiles_output)}
+    for name, settings in wanted.items():
+        interface = interfaces.get(name)
+        if interface is None:
+            raise ValueError(f"wireless interface {name} not found on the router")
+        ssid = settings.get("ssid")
+        if ssid is not None and interface.get("ssid") != ssid:
+            changes.append(Change("wireless", f"{name} SSID {ssid}",
+                                  f"/interface wireless set {executor.quote(name)} ssid={executor.quote(ssid)}"))
+        password = settings.get("password")
+        profile_name = interface.get("security-profile", "default")
+        profile = profiles.get(profile_name)
+        if password is not None and (profile is None or profile.get("wpa2-pre-shared-key") != password):
+            changes.append(Change("wireless", f"{name} password",
+                                  f"/interface wireless security-profiles set [find name={executor.quote(profile_name)}] "
+                                  f"mode=dynamic-keys authentication-types=wpa2-psk "
+                                  f"wpa2-pre-shared-key={executor.quote(password)}"))
+    return changes
+
+
+def diff(state, current):
+    """Compute the minimal ``Plan`` from ``read_current`` output. Makes no router calls."""
+    result = Plan(blocks=state.blocks)
+    if state.addresses is not None:
+        result.changes += _diff_addresses(state.addresses, *current["addresses"])
+    if state.dns is not None:
+        result.changes += _diff_dns(state.dns, *current["dns"])
+    if state.queues is not None:
+        result.changes += _diff_queues(state.queues, state.prune_queues, *current["queues"])
+    if state.blocks is not None:
+        result.changes += _diff_blocks(state.blocks, *current["blocks"])
+    if state.wireless is not None:
+        result.changes += _diff_wireless(state.wireless, *current["wireless"])
+    return result
+
+
+def plan(client, state):
+    """Read the router once and return the changes needed to reach ``state``."""
+    return diff(state, read_current(client, state))
+
+
+def apply(client, state_plan, router_id=None, batch_size=bulk_queues.BATCH_SIZE):
+    """Apply a plan in batched scripts; return the failed ``BatchResult`` entries.
+
+    An empty plan sends nothing. With ``router_id`` the local blocklist is
+    updated to the configured domains so the Firewall page agrees, but
+    only once every command went through.
+    """
+    commands = state_plan.commands()
+    failed = []
+    for start in range(0, len(commands), batch_size):
+        batch = commands[start:start + batch_size]
+        results = executor.execute_batch(client, batch, timeout=max(30, len(batch) // 10))
+        failed.extend(result for result in results if not result.ok)
+    if router_id is not None and state_plan.blocks is not None and not failed:
+        blocklist.get_store().replace(router_id, state_plan.blocks)
+    return failed
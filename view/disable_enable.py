@@ -1,28 +1,24 @@
 import streamlit as st
-from login import ssh_connect
+import connection_pool
+import executor
+import terse
 
 def get_interfaces(ssh_client):
     """Mengambil daftar interface dan statusnya dari Mikrotik."""
 
     try:
         command = "/interface print terse"
-        stdin, stdout, stderr = ssh_client.exec_command(command)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
+        result = executor.execute(ssh_client, command)
+        output, error = result.output, result.error
 
         if error:
             st.error(f"Error mengambil interface: {error}")
             return []
         
-        interfaces = []
-        for line in output.split("\n"):
-            if line.strip():
-                parts = line.split()
-                name = parts[0]
-                status = "enabled" if "X" not in line else "disabled"
-                interfaces.append((name, status))
-        
-        return interfaces
+        return [
+            (record.name, "disabled" if record.disabled else "enabled")
+            for record in terse.iter_terse(output, terse.InterfaceRecord)
+        ]
     
     except Exception as e:
         st.error(f"Terjadi kesalahan: {e}")
@@ -32,8 +28,7 @@ def change_interfaces_status(ssh_client, interface, action):
     """Mengaktifkan atau menonaktifkan interface."""
     try:
         command = f"/interface set {interface} disabled={'yes' if action == 'Disable' else 'no'}"
-        stdin, stdout, stderr = ssh_client.exec_command(command)
-        error = stderr.read().decode()
+        error = executor.execute(ssh_client, command).error
 
         if error:
             st.error(f"Error mengubah status interface: {error}")
@@ -47,8 +42,12 @@ def run():
     st.subheader("Disable/Enable Interfaces")
     st.write("Manage nterfaces")
 
-    ssh_client = ssh_connect()
-    if ssh_client:
+    router = st.session_state.get("router")
+    if not router:
+        st.warning("Silakan login terlebih dahulu.")
+        return
+
+    with connection_pool.lease(router) as ssh_client:
         interfaces = get_interfaces(ssh_client)
 
         if interfaces:
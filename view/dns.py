@@ -1,36 +1,48 @@
 import streamlit as st
-import time
+import connection_pool
+import executor
+import waiters
 
-def execute_command(client, command):
-    stdin, stdout, stderr = client.exec_command(command)
-    return stdout.channel.recv_exit_status(), stdout.read().decode().strip(), stderr.read().decode().strip()
-
-def loading(timer, message):
+def loading(message):
     with st.spinner("wait"):  
-        time.sleep(timer)
         st.write(f"Running Command: `{message}`")
 
-def rerun_after(timer):
-    time.sleep(timer)
-    st.rerun()
+def current_servers(client):
+    """Read back the configured DNS servers as a set."""
+    output = executor.execute(client, ":put [/ip dns get servers]").output
+    return {server for server in output.replace(";", ",").split(",") if server.strip()}
+
+def wait_for_servers(client, servers):
+    """Poll the router until it reports ``servers`` as its DNS servers."""
+    expected = {server.strip() for server in servers.split(",") if server.strip()}
+    waiters.wait_until(lambda: current_servers(client) == expected, deadline=10, description="DNS settings")
+
+def dns_command(servers, allow_remote_request):
+    return f"/ip dns set servers={servers} allow-remote-requests={allow_remote_request}"
 
 def apply_configuration(client, custom_dns_input, allow_remote_request):
-    command = f"/ip dns set servers={custom_dns_input} allow-remote-requests={allow_remote_request}"
+    command = dns_command(custom_dns_input, allow_remote_request)
     
-    loading(1, "Applying DNS settings...")
-    _, output, error = execute_command(client, command)
+    loading("Applying DNS settings...")
+    result = executor.execute(client, command)
+    output, error = result.output, result.error
 
     if error:
         st.error(f"Error: {error}")
     else:
-        st.success(f"DNS applied: {custom_dns_input}")
-        rerun_after(4.5)
         if output:
             st.text(f"Response: {output}")
+        try:
+            with st.spinner("Waiting for the router to apply the settings..."):
+                wait_for_servers(client, custom_dns_input)
+            st.toast(f"DNS applied: {custom_dns_input}")
+        except waiters.WaitTimeout as e:
+            st.warning(f"DNS command sent, but the router has not confirmed it yet: {e}")
 
 def run():
     """Main function to integrate with main.py"""
-    if 'ssh_client' not in st.session_state or not st.session_state['ssh_client']:
+    router = st.session_state.get('router')
+    if not router:
         st.warning("Please connect to the Router first")
         return
 
@@ -38,11 +50,6 @@ def run():
     tab1, tab2 = st.tabs(["Server Provider", "Custom Name Server"])
     
     try:
-        client = st.session_state.get('ssh_client', None)
-        if client is None or client.get_transport() is None or not client.get_transport().is_active():
-            st.error("Unable to connect to the router. Please reconnect.")
-            return
-
         dns_options = {
             "Google DNS": "8.8.8.8,8.8.4.4",
             "Cloudflare": "1.1.1.1,1.0.0.1",
@@ -67,7 +74,8 @@ def run():
         
         if st.button("Apply DNS Settings"):
             remote_request_value = 'yes' if allow_remote_request else 'no'
-            apply_configuration(client, custom_dns_input if custom_dns_input else selected_dns, remote_request_value)
+            with connection_pool.lease(router) as client:
+                apply_configuration(client, custom_dns_input if custom_dns_input else selected_dns, remote_request_value)
             
             st.session_state['custom_dns_input'] = ""
             st.rerun()
@@ -0,0 +1,222 @@
+import re
+import select
+import time
+import uuid
+from dataclasses import dataclass
+
+import instrumentation
+import query_cache
+import terse
+
+DEFAULT_TIMEOUT = 15           # seconds a single command may take
+MAX_OUTPUT = 4 * 1024 * 1024   # bytes kept per stream; the rest is drained and dropped
+POLL_INTERVAL = 0.05
+READ_SIZE = 32768
+
+MARKER = "@@NETEZ"
+_MARKER_RE = re.compile(rf"^{MARKER} (\w+) (\d+) (BEGIN|FAIL|END)$")
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a single command run through ``execute``."""
+    command: str
+    exit_status: int = -1
+    output: str = ""
+    error: str = ""
+    timed_out: bool = False
+    truncated: bool = False
+
+    @property
+    def ok(self):
+        return self.exit_status == 0 and not self.error and not self.timed_out
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one command inside a batched script."""
+    command: str
+    status: str = "skipped"      # "ok", "failed" or "skipped"
+    output: str = ""
+    error: str = ""
+    truncated: bool = False      # output cut at ``max_output``; what is there is incomplete
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+
+def quote(value):
+    """Quote a value for the RouterOS CLI, escaping the characters it treats specially."""
+    value = str(value)
+    for char in ("\\", '"', "$", "?"):
+        value = value.replace(char, "\\" + char)
+    return f'"{value}"'
+
+
+def _read_into(read, buffer, max_output):
+    """Move whatever ``read`` has ready into ``buffer``; return True if data was dropped."""
+    data = read(READ_SIZE)
+    room = max_output - len(buffer)
+    if room > 0:
+        buffer += data[:room]
+    return len(data) > room
+
+
+def execute(client, command, timeout=DEFAULT_TIMEOUT, max_output=MAX_OUTPUT):
+    """Run ``command`` on its own channel and return a ``CommandResult``.
+
+    stdout and stderr are drained together so neither can fill its window
+    and stall the router, the whole call is bounded by ``timeout`` and each
+    stream keeps at most ``max_output`` bytes. A RouterOS API client gets
+    the command translated to API sentences instead.
+    """
+    if getattr(client, "is_api", False):
+        import api_cli
+        return api_cli.execute(client, command, timeout, max_output)
+
+    result = CommandResult(command)
+    out, err = bytearray(), bytearray()
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+
+    channel = client.get_transport().open_session(timeout=timeout)
+    instrumentation.channel_opened(client, time.perf_counter() - started)
+    try:
+        channel.setblocking(False)
+        channel.exec_command(command)
+        while True:
+            busy = False
+            if channel.recv_ready():
+                result.truncated |= _read_into(channel.recv, out, max_output)
+                busy = True
+            if channel.recv_stderr_ready():
+                result.truncated |= _read_into(channel.recv_stderr, err, max_output)
+                busy = True
+            if not busy and channel.exit_status_ready():
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                result.timed_out = True
+                break
+            if not busy:
+                select.select([channel], [], [], min(remaining, POLL_INTERVAL))
+        if not result.timed_out:
+            result.exit_status = channel.recv_exit_status()
+    finally:
+        channel.close()
+        instrumentation.command_done(client, command, time.perf_counter() - started, len(command),
+                                     len(out) + len(err), instrumentation.outcome(result, err))
+
+    # Even a failed write may have changed something, so always invalidate
+    query_cache.invalidate(client, command)
+
+    result.output = out.decode(errors="replace").strip()
+    result.error = err.decode(errors="replace").strip()
+    if result.timed_out and not result.error:
+        result.error = f"command timed out after {timeout}s"
+    return result
+
+
+def query(client, command, record=terse.TerseRecord, ttl=query_cache.DEFAULT_TTL):
+    """Run a read-only ``print terse`` command and return its parsed records.
+
+    Results are served from the router's query cache while fresh; any write
+    through ``execute`` or ``execute_batch`` to the same menu drops them.
+    Failed reads are not cached. Over the RouterOS API the records are
+    built from the structured reply, with no text to parse.
+    """
+    cache = query_cache.cache_for(client)
+    key = (command, record)
+    records = cache.get(key)
+    if records is None:
+        if getattr(client, "is_api", False):
+            import api_cli
+            records, ok = api_cli.query(client, command, record)
+        else:
+            result = execute(client, command)
+            records, ok = terse.parse_terse(result.output, record), result.ok
+        if ok:
+            cache.put(key, query_cache.split_command(command)[0], records, ttl)
+    return records
+
+
+def build_batch_script(commands, token, stop_on_error=False):
+    """Wrap ``commands`` in one RouterOS script that marks where each one starts and ends."""
+    parts = [":local netezok true"] if stop_on_error else []
+    for index, command in enumerate(commands):
+        begin = f':put "{MARKER} {token} {index} BEGIN"'
+        end = f':put "{MARKER} {token} {index} END"'
+        if stop_on_error:
+            guarded = f':do {{ {command} }} on-error={{ :set netezok false; :put "{MARKER} {token} {index} FAIL" }}'
+            parts.append(f":if ($netezok) do={{ {begin}; {guarded}; {end} }}")
+        else:
+            guarded = f':do {{ {command} }} on-error={{ :put "{MARKER} {token} {index} FAIL" }}'
+            parts.extend([begin, guarded, end])
+    return "; ".join(parts)
+
+
+def parse_batch_output(commands, token, output, error="", truncated=False):
+    """Split the script output back into one ``BatchResult`` per command.
+
+    With ``truncated`` the script printed more than was kept: the last
+    command that started, and any after it, are flagged as ``truncated``.
+    """
+    results = [BatchResult(command) for command in commands]
+    current = None
+    lines = {}
+    for line in output.splitlines():
+        match = _MARKER_RE.match(line.strip())
+        if match and match.group(1) == token:
+            index, event = int(match.group(2)), match.group(3)
+            if event == "BEGIN":
+                current = index
+                results[index].status = "ok"
+                lines[index] = []
+            elif event == "FAIL":
+                results[index].status = "failed"
+                results[index].error = "command failed"
+            else:
+                current = None
+        elif current is not None:
+            lines[current].append(line)
+
+    for index, collected in lines.items():
+        results[index].output = "\n".join(collected).strip()
+
+    if error:
+        # A script-level error (e.g. a syntax error) belongs to the last command that
+        # started, or to every command when the script was rejected before running.
+        started = [r for r in results if r.status != "skipped"]
+        for result in (started[-1:] if started else results):
+            result.status = "failed"
+            result.error = error
+    if truncated:
+        last = max((index for index, r in enumerate(results) if r.status != "skipped"), default=0)
+        for result in results[last:]:
+            result.truncated = True
+    return results
+
+
+def execute_batch(client, commands, stop_on_error=False, timeout=DEFAULT_TIMEOUT, max_output=MAX_OUTPUT):
+    """Run ``commands`` as a single RouterOS script over one SSH channel.
+
+    Returns a ``BatchResult`` per command, in order. With ``stop_on_error``
+    the commands after the first failure are not executed and come back as
+    ``"skipped"``. The script's output is kept up to ``max_output`` bytes;
+    results cut short by that are marked ``truncated``. Over the RouterOS
+    API the commands are pipelined as tagged sentences on the open
+    connection instead.
+    """
+    commands = list(commands)
+    if not commands:
+        return []
+    if getattr(client, "is_api", False):
+        import api_cli
+        return api_cli.execute_batch(client, commands, stop_on_error, timeout)
+    token = uuid.uuid4().hex[:12]
+    script = build_batch_script(commands, token, stop_on_error)
+    result = execute(client, script, timeout=timeout, max_output=max_output)
+    for command in commands:
+        query_cache.invalidate(client, command)
+    return parse_batch_output(commands, token, result.output, result.error, result.truncated)
@@ -1,5 +1,30 @@
+import io
 import streamlit as st
-import re
+import blocklist
+import connection_pool
+import storage
+
+MODES = {"Layer 7 (one consolidated rule)": "layer7", "DNS static entries": "dns"}
+LIST_PREVIEW = 200   # blocked domains shown at once
+
+
+def apply_blocklist(router, update):
+    """Run ``update(client, progress)`` (a blocklist sync) on the router and report the outcome."""
+    try:
+        with connection_pool.lease(router) as ssh_client:
+            progress = st.progress(0.0, text="Syncing...")
+            failed = update(
+                ssh_client,
+                lambda done, total: progress.progress(done / total, text=f"{done:,}/{total:,} entries"),
+            )
+            progress.empty()
+        if failed:
+            st.error(f"⚠️ Error executing command `{failed[0].command}`: {failed[0].error or 'not applied'}")
+            return False
+        return True
+    except Exception as e:
+        st.error(f"⚠️ Error executing command: {str(e)}")
+        return False
 
 def run():
     """Firewall Filtering Page - Block websites using MikroTik firewall rules"""
@@ -7,10 +32,16 @@ def run():
     st.write("Block access to specific websites.")
 
     # Ensure SSH connection exists
-    if "ssh_client" not in st.session_state or st.session_state["ssh_client"] is None:
+    router = st.session_state.get("router")
+    if router is None:
         st.error("⚠️ Not connected to MikroTik. Please log in first.")
         return
 
+    router_id = storage.router_id(router)
+    store = blocklist.get_store()
+    mode = MODES[st.radio("Blocking method", list(MODES), horizontal=True,
+                          help="DNS entries only work for clients that use the router as their DNS server.")]
+
     # User input: Websites to block
     common_sites = ["facebook.com", "youtube.com", "tiktok.com", "twitter.com", "instagram.com", "netflix.com", "reddit.com"]
     blocked_website = st.selectbox("Choose a common website to block or type your own", options=[""] + common_sites)
@@ -29,76 +60,74 @@ def run():
                 st.warning("⚠️ Please enter at least one website.")
                 return
 
-            if final_website and not re.match(r'^[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', final_website):
+            domain = blocklist.normalize(final_website)
+            if domain is None:
                 st.warning("⚠️ Invalid domain format. Please enter a valid domain like 'example.com'.")
                 return
 
-            ssh_client = st.session_state["ssh_client"]
-            try:
-                # Generate MikroTik commands for Layer 7 filtering
-                layer7_command = f'/ip firewall layer7-protocol add name=BlockWebsites regexp="{final_website}"'
-                filter_command = '/ip firewall filter add chain=forward layer7-protocol=BlockWebsites action=drop'
+            if mode == "layer7" and store.count(router_id) >= blocklist.LAYER7_MAX_DOMAINS:
+                st.warning("⚠️ The list is too long for Layer 7. Switch to DNS static entries.")
+                return
 
-                # Execute commands via SSH
-                ssh_client.exec_command(layer7_command)
-                ssh_client.exec_command(filter_command)
+            if apply_blocklist(router, lambda client, progress: blocklist.block(
+                    client, router_id, domain, mode, progress)):
+                st.success(f"✅ Website blocked successfully: {domain}")
 
-                st.success(f"✅ Website blocked successfully: {final_website}")
+    st.markdown("---")
+    import_blocklist(router, router_id, mode)
 
-            except Exception as e:
-                st.error(f"⚠️ Error executing command: {str(e)}")
-    
     st.markdown("---")
-    st.subheader("🗑️ Unblock Website")
-    # Display currently blocked websites
-    # st.markdown("### 🔒 Currently Blocked Websites")
-    # try:
-    #     ssh_client = st.session_state["ssh_client"]
-    #     stdin, stdout, stderr = ssh_client.exec_command('/ip firewall layer7-protocol print without-paging')
-    #     output = stdout.read().decode('utf-8')
-    #     blocked_entries = []
-    #     for line in output.splitlines():
-    #         if "BlockWebsites" in line:
-    #             parts = line.split("regexp=\"")
-    #             if len(parts) > 1:
-    #                 domain = parts[1].rstrip("\"")
-    #                 blocked_entries.append(domain)
-    #     if blocked_entries:
-    #         st.write("Websites currently blocked:")
-    #         for site in blocked_entries:
-    #             col1, col2 = st.columns([4, 1])
-    #             with col1:
-    #                 st.markdown(f"- `{site}`")
-    #             with col2:
-    #                 if st.button(f"Unblock {site}", key=f"unblock_{site}"):
-    #                     try:
-    #                         ssh_client = st.session_state["ssh_client"]
-    #                         remove_layer7 = f'/ip firewall layer7-protocol remove [find name=BlockWebsites and regexp="{site}"]'
-    #                         remove_filter = f'/ip firewall filter remove [find chain=forward layer7-protocol=BlockWebsites]'
-    #                         ssh_client.exec_command(remove_filter)
-    #                         ssh_client.exec_command(remove_layer7)
-    #                         st.success(f"✅ Unblocked website: {site}")
-    #                     except Exception as e:
-    #                         st.error(f"⚠️ Error removing block: {str(e)}")
-    #     else:
-    #         st.info("No websites are currently blocked.")
-    # except Exception as e:
-    #     st.error(f"⚠️ Failed to retrieve blocked websites: {str(e)}")
-
-    unblock_website = st.text_input("Enter website to unblock", placeholder="example.com")
-    if st.button("Unblock"):
-        if not unblock_website.strip():
-            st.warning("⚠️ Please enter a website to unblock.")
-        elif not re.match(r'^[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', unblock_website.strip()):
-            st.warning("⚠️ Invalid domain format.")
-        else:
-            try:
-                ssh_client = st.session_state["ssh_client"]
-                # Remove matching layer7 and firewall rules (assuming same name pattern)
-                remove_layer7 = f'/ip firewall layer7-protocol remove [find name=BlockWebsites and regexp="{unblock_website.strip()}"]'
-                remove_filter = f'/ip firewall filter remove [find chain=forward layer7-protocol=BlockWebsites]'
-                ssh_client.exec_command(remove_filter)
-                ssh_client.exec_command(remove_layer7)
-                st.success(f"✅ Unblocked website: {unblock_website.strip()}")
-            except Exception as e:
-                st.error(f"⚠️ Error removing block: {str(e)}")
\ No newline at end of file
+    st.subheader("🔒 Currently Blocked Websites")
+    total = store.count(router_id)
+    if not total:
+        st.info("No websites are currently blocked.")
+        return
+
+    st.write(f"**{total:,}** websites blocked")
+    search = st.text_input("Search blocked websites", placeholder="part of a domain").strip().lower()
+    blocked = store.domains(router_id, search, LIST_PREVIEW)
+    if len(blocked) == LIST_PREVIEW:
+        st.caption(f"Showing the first {LIST_PREVIEW} matches.")
+    to_unblock = st.multiselect("Select websites to unblock", blocked)
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        if st.button("Unblock Selected") and to_unblock:
+            if apply_blocklist(router, lambda client, progress: blocklist.unblock(
+                    client, router_id, to_unblock, mode, progress)):
+                st.success(f"✅ Unblocked: {', '.join(to_unblock)}")
+    with col2:
+        if st.button("Re-sync Router"):
+            if apply_blocklist(router, lambda client, progress: blocklist.sync(client, router_id, mode, progress)):
+                st.success("✅ Router rules match the blocklist.")
+    if total <= blocklist.LAYER7_MAX_DOMAINS:
+        with st.expander("Compiled Layer 7 regex"):
+            st.code(blocklist.compile_regex(store.domains(router_id)))
+
+def import_blocklist(router, router_id, mode):
+    """Replace the blocklist with a public list (hosts, adblock or plain domains) and push the delta."""
+    st.subheader("📥 Import Blocklist")
+    uploaded = st.file_uploader("Blocklist file", type=["txt", "hosts", "list", "csv"])
+    url = st.text_input("Or a blocklist URL", placeholder="https://example.com/hosts.txt").strip()
+    if not st.button("Import and Sync"):
+        return
+    if mode != "dns":
+        st.warning("⚠️ Large lists are only supported with DNS static entries.")
+        return
+    if uploaded is None and not url:
+        st.warning("⚠️ Please upload a file or enter a URL.")
+        return
+
+    try:
+        with st.spinner("Reading blocklist..."):
+            if uploaded is not None:
+                counts = blocklist.get_store().replace(
+                    router_id, blocklist.parse_list(io.TextIOWrapper(uploaded, encoding="utf-8", errors="replace")))
+            else:
+                counts = blocklist.get_store().replace(router_id, blocklist.parse_list(blocklist.fetch_list(url)))
+        st.write(f"**{counts['total']:,}** domains · **{counts['added']:,}** new · **{counts['removed']:,}** dropped")
+    except Exception as e:
+        st.error(f"❌ Failed to read blocklist: {e}")
+        return
+
+    if apply_blocklist(router, lambda client, progress: blocklist.sync(client, router_id, mode, progress)):
+        st.success("✅ Router updated with the changes.")
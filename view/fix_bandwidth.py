@@ -1,5 +1,11 @@
 import streamlit as st
 import socket
+import bulk_queues
+import connection_pool
+import executor
+import job_panel
+import jobs
+import terse
 
 def get_local_ip():
     """Retrieve the local machine's IP address."""
@@ -12,27 +18,22 @@ def get_local_ip():
 
 def get_assigned_bandwidths():
     """Fetch IPs with bandwidth limits from MikroTik."""
-    if "ssh_client" not in st.session_state or st.session_state["ssh_client"] is None:
-        return []
+    router = st.session_state.get("router")
+    if router is None:
+        return [], {}
     
     try:
-        ssh_client = st.session_state["ssh_client"]
-        stdin, stdout, stderr = ssh_client.exec_command("/queue simple print terse")
-        output = stdout.read().decode()
+        with connection_pool.lease(router) as ssh_client:
+            records = executor.query(ssh_client, "/queue simple print terse", terse.QueueRecord)
         
         assigned_ips = []
         ip_name_map = {}
         
-        for line in output.split("\n"):
-            if "target=" in line and "max-limit=" in line:
-                parts = line.split()
-                ip = next((p.split("=")[1] for p in parts if p.startswith("target=")), None)
-                name = next((p.split("=")[1] for p in parts if p.startswith("name=")), None)
-                limit = next((p.split("=")[1] for p in parts if p.startswith("max-limit=")), None)
-                
-                if ip and name and limit:
-                    assigned_ips.append(f"{ip} (Limit: {limit})")
-                    ip_name_map[ip] = name
+        for record in records:
+            ip, name, limit = record.target, record.name, record.max_limit
+            if ip and name and limit:
+                assigned_ips.append(f"{ip} (Limit: {limit})")
+                ip_name_map[ip] = name
         
         return assigned_ips, ip_name_map
     
@@ -42,7 +43,8 @@ def get_assigned_bandwidths():
 
 def delete_bandwidth_limit(target_ip, ip_name_map):
     """Delete bandwidth limit for a given IP address in MikroTik."""
-    if "ssh_client" not in st.session_state or st.session_state["ssh_client"] is None:
+    router = st.session_state.get("router")
+    if router is None:
         st.error("⚠️ Not connected to MikroTik. Please log in first.")
         return
 
@@ -54,10 +56,8 @@ def delete_bandwidth_limit(target_ip, ip_name_map):
     command = f"/queue simple remove [find name={queue_name}]"
 
     try:
-        ssh_client = st.session_state["ssh_client"]
-        stdin, stdout, stderr = ssh_client.exec_command(command)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
+        with connection_pool.lease(router) as ssh_client:
+            error = executor.execute(ssh_client, command).error
 
         if error:
             st.error(f"❌ Failed to delete limit: {error}")
@@ -67,6 +67,41 @@ def delete_bandwidth_limit(target_ip, ip_name_map):
     except Exception as e:
         st.error(f"⚠️ Error executing command: {str(e)}")
 
+def bulk_import(router):
+    """Bulk import section: diff a CSV/JSON file against the queue table and apply it."""
+    with st.expander("📥 Bulk Import (CSV/JSON: ip, up, down in Mbps)"):
+        uploaded = st.file_uploader("Bandwidth limits file", type=["csv", "json"], key="bulk_queue_file")
+        remove_missing = st.checkbox("Remove queues that are not in the file", False)
+        if uploaded is None:
+            job_panel.show_jobs(router, kinds=["queue_import"])
+            return
+
+        # Parse the file and read the queue table once per upload, not on every rerun
+        cached = st.session_state.get("bulk_queue_import")
+        if cached is None or cached[0] != (uploaded.file_id, router):
+            rows, errors = bulk_queues.parse_rows(uploaded.getvalue().decode("utf-8"),
+                                                  "json" if uploaded.name.endswith(".json") else "csv")
+            try:
+                with connection_pool.lease(router) as ssh_client:
+                    cached = ((uploaded.file_id, router), rows, errors, bulk_queues.fetch_queues(ssh_client))
+            except Exception as e:
+                st.error(f"⚠️ Error reading the queue table: {e}")
+                return
+            st.session_state["bulk_queue_import"] = cached
+        _, rows, errors, current = cached
+        for error in errors[:10]:
+            st.warning(f"⚠️ Skipped {error}")
+
+        plan = bulk_queues.plan(rows, current, remove_missing)
+        summary = plan.summary()
+        st.write(" · ".join(f"**{key}**: {value}" for key, value in summary.items()))
+
+        if st.button("Apply Import", disabled=not plan.commands()):
+            # Large imports take minutes; run them in the background and poll
+            jobs.submit("queue_import", router, commands=plan.commands())
+            del st.session_state["bulk_queue_import"]   # the queue table is about to change
+        job_panel.show_jobs(router, kinds=["queue_import"])
+
 def run():
     """Bandwidth Fix Page - Set or Remove bandwidth limits on MikroTik"""
     st.subheader("🚀 Bandwidth Management")
@@ -80,7 +115,8 @@ def run():
     assigned_ips, ip_name_map = get_assigned_bandwidths()
 
     # Check SSH connection
-    if "ssh_client" not in st.session_state or st.session_state["ssh_client"] is None:
+    router = st.session_state.get("router")
+    if router is None:
         st.error("⚠️ Not connected to MikroTik. Please log in first.")
         return
 
@@ -112,18 +148,12 @@ def run():
                 st.warning("⚠️ Please provide valid inputs.")
                 return
             
-            # Convert Mbps to Kbps (MikroTik uses Kbps)
-            upload_speed_kbps = int(upload_speed * 1024)
-            download_speed_kbps = int(download_speed * 1024)
-
             # MikroTik queue command
-            command = f"/queue simple add name={target_ip} target={target_ip}/32 max-limit={upload_speed_kbps}/{download_speed_kbps}"
+            command = bulk_queues.queue_add_command(target_ip, upload_speed, download_speed)
 
             try:
-                ssh_client = st.session_state["ssh_client"]
-                stdin, stdout, stderr = ssh_client.exec_command(command)
-                output = stdout.read().decode()
-                error = stderr.read().decode()
+                with connection_pool.lease(router) as ssh_client:
+                    error = executor.execute(ssh_client, command).error
 
                 if error:
                     st.error(f"❌ Failed to apply limit: {error}")
@@ -134,6 +164,8 @@ def run():
             except Exception as e:
                 st.error(f"⚠️ Error executing command: {str(e)}")
 
+    bulk_import(router)
+
     # Delete Bandwidth Limit Section
     # st.subheader("🗑 Remove Bandwidth Limit")
     # if assigned_ips:
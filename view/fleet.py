@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import connection_pool
+import executor
+
+MAX_PARALLEL = 32          # routers worked on at the same time
+ROUTER_TIMEOUT = 60        # seconds allowed per router, connect included
+DEFAULT_PORTS = {"ssh": 22, "api": 8728, "api-ssl": 8729}
+
+
+@dataclass
+class Router:
+    """One inventory entry."""
+    name: str
+    host: str
+    port: int = 22
+    username: str = "admin"
+    password: str = field(default="", repr=False)
+    tags: tuple = ()
+    transport: str = "ssh"      # or "api"/"api-ssl" for the binary RouterOS API
+
+
+@dataclass
+class RouterResult:
+    """Aggregated outcome of a fleet action on one router."""
+    router: str
+    status: str = "pending"     # "ok", "failed", "timeout" or "error"
+    elapsed: float = 0.0
+    error: str = ""
+    results: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+
+def _router_from_row(row, password_env=False):
+    password = row.get("password") or ""
+    if not password and password_env and row.get("password_env"):
+        password = os.environ.get(row["password_env"], "")
+    tags = row.get("tags") or ()
+    if isinstance(tags, str):
+        tags = tuple(tag.strip() for tag in tags.split(";") if tag.strip())
+    host = str(row["host"]).strip()
+    transport = str(row.get("transport") or "ssh").strip()
+    return Router(
+        name=str(row.get("name") or host).strip(),
+        host=host,
+        port=int(row.get("port") or DEFAULT_PORTS.get(transport, 22)),
+        username=str(row.get("username") or "admin").strip(),
+        password=password,
+        tags=tuple(tags),
+        transport=transport,
+    )
+
+
+def load_inventory(text, fmt=None, password_env=False):
+    """Parse a fleet inventory from CSV or JSON text.
+
+    Each entry needs ``host`` and may set ``name``, ``port``, ``username``,
+    ``password``, ``tags`` (a list, or ``;``-separated in CSV) and
+    ``transport`` (``ssh``, ``api`` or ``api-ssl``). ``password_env``,
+    naming an environment variable that holds the password, is only read
+    when ``password_env`` is true: never for uploaded inventories, or
+    anyone who can upload one could send a server secret to a host of
+    their choosing.
+    """
+    if fmt is None:
+        fmt = "json" if text.lstrip()[:1] in "[{" else "csv"
+    if fmt == "json":
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("routers", [])
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    return [_router_from_row(row, password_env) for row in rows if row.get("host")]
+
+
+def load_inventory_file(path):
+    """Read a server-side inventory file; these may use ``password_env``."""
+    with open(path, encoding="utf-8") as file:
+        return load_inventory(file.read(), "json" if path.endswith(".json") else "csv", password_env=True)
+
+
+def register(router, hold=False):
+    """Log in to an inventory router through the pool; return its pool key."""
+    return connection_pool.get_pool().register(router.host, router.port, router.username, router.password,
+                                               router.transport, hold=hold)
+
+
+@contextmanager
+def session(router):
+    """Register an inventory router for one fleet action and yield its pool key.
+
+    The login is held only for the action (``register(hold=True)``), so
+    fleet runs do not leave hundreds of credentials in the shared pool; a
+    router someone logs in to before or during the run keeps its session.
+    """
+    key = register(router, hold=True)
+    try:
+        yield key
+    finally:
+        connection_pool.get_pool().release(key)
+
+
+def _apply(router, commands, timeout):
+    result = RouterResult(router.name)
+    start = time.monotonic()
+    try:
+        with session(router) as key, connection_pool.lease(key) as client:
+            result.results = executor.execute_batch(client, commands, stop_on_error=True, timeout=timeout)
+        failed = [r for r in result.results if not r.ok]
+        if failed:
+            result.status = "failed"
+            result.error = f"{failed[0].command}: {failed[0].error or 'not applied'}"
+        else:
+            result.status = "ok"
+    except Exception as e:
+        result.status = "error"
+        result.error = str(e)
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def run_each(routers, work, max_parallel=MAX_PARALLEL, timeout=ROUTER_TIMEOUT, progress=None):
+    """Run ``work(router)`` for every router concurrently; return its ``RouterResult``s in order.
+
+    At most ``max_parallel`` routers are worked on at once. A router that
+    has not finished within ``timeout`` seconds of being started is
+    reported as ``"timeout"`` (``None`` waits as long as it takes).
+    ``progress(done, total)`` is called from the caller's thread as results
+    arrive.
+    """
+    routers = list(routers)
+    results = [RouterResult(router.name) for router in routers]
+    started = {}
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(routers) or 1)),
+                              thread_name_prefix="fleet")
+
+    def task(position, router):
+        started[position] = time.monotonic()
+        return work(router)
+
+    try:
+        pending = {pool.submit(task, position, router): position for position, router in enumerate(routers)}
+        done_count = 0
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when="FIRST_COMPLETED")
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                done_count += 1
+            now = time.monotonic()
+            for future, position in list(pending.items()):
+                begun = started.get(position)
+                if (timeout is not None and begun is not None
+                        and now - begun > timeout + connection_pool.CONNECT_TIMEOUT):
+                    # The worker thread cannot be killed; stop waiting for it
+                    pending.pop(future)
+                    results[position] = RouterResult(routers[position].name, "timeout", now - begun,
+                                                     f"no answer within {timeout}s")
+                    done_count += 1
+            if progress is not None:
+                progress(done_count, len(routers))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def run_fleet(routers, commands, max_parallel=MAX_PARALLEL, timeout=ROUTER_TIMEOUT, progress=None):
+    """Apply ``commands`` to every router concurrently and return one result per router.
+
+    ``commands`` is either a list applied everywhere or a callable taking a
+    ``Router`` and returning its list. Concurrency, timeouts and progress
+    work as in ``run_each``.
+    """
+    build = commands if callable(commands) else (lambda router: commands)
+    return run_each(routers, lambda router: _apply(router, build(router), timeout), max_parallel, timeout, progress)
+
+
+def summarize(results):
+    """Count results per status, e.g. ``{"ok": 480, "failed": 12, ...}``."""
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return counts
@@ -0,0 +1,197 @@
+import argparse
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import backup_configuration
+import backup_store
+import connection_pool
+import fleet
+import instrumentation
+import storage
+
+MAX_PARALLEL = fleet.MAX_PARALLEL   # routers saving/downloading at the same time
+MAX_TRANSFERS = 8                   # SFTP downloads at the same time
+ATTEMPTS = 3                        # tries per router; later tries resume the download
+MAX_AGE = 20 * 3600                 # skip routers archived more recently than this
+NAME_PATTERN = "fleet-%Y%m%d"       # strftime pattern; a rerun on the same day resumes the same files
+READ_BLOCK = 65536
+
+
+@dataclass
+class BackupResult(fleet.RouterResult):
+    """Outcome of collecting one router's backup; ``status`` may also be ``"skipped"``."""
+    file: str = ""
+    size: int = 0
+    resumed_from: int = 0       # bytes already on disk from an earlier, interrupted transfer
+
+
+class RateLimit:
+    """Token bucket shared by every transfer: at most ``rate`` bytes per second overall."""
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst or 0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount):
+        """Account for ``amount`` bytes, sleeping for as long as the budget is overdrawn."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate) - amount
+            self._stamp = now
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+def _partial_dir():
+    return storage.data_dir("backups", "partial")
+
+
+def _partial_path(router_id, file, size):
+    """Where a download is kept until complete; the remote size is part of the name."""
+    return os.path.join(_partial_dir(), f"{router_id.replace(':', '_')}--{file}--{size}.part")
+
+
+def _find_partial(router_id, file):
+    """``(path, remote size)`` of an interrupted download of ``file``, or ``(None, None)``."""
+    for path in glob.glob(os.path.join(_partial_dir(), f"{glob.escape(router_id.replace(':', '_'))}--"
+                                                       f"{glob.escape(file)}--*.part")):
+        return path, int(path.rsplit("--", 1)[1][:-len(".part")])
+    return None, None
+
+
+def _remote_size(client, file):
+    try:
+        with instrumentation.open_sftp(client) as sftp:
+            return sftp.stat(f"/{file}").st_size
+    except FileNotFoundError:
+        return None
+
+
+def _download(client, file, path, size, limit):
+    """Append the rest of remote ``file`` to ``path``; return the offset it resumed from."""
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    if offset > size:
+        os.remove(path)
+        offset = 0
+    with open(path, "ab") as out:
+        for chunk in backup_configuration.stream_backup(client, file, offset=offset):
+            out.write(chunk)
+            limit.take(len(chunk))
+    if os.path.getsize(path) != size:
+        raise IOError(f"{file}: got {os.path.getsize(path):,} of {size:,} bytes")
+    return offset
+
+
+def _read_blocks(path):
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(READ_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+def collect_one(router, name, limit, transfers, max_age=MAX_AGE, attempts=ATTEMPTS):
+    """Save, download and archive one router's backup.
+
+    A download that was cut off (here or in an earlier run) is resumed
+    from its partial file instead of saving a new backup, as long as the
+    router still has the file at the size it had.
+    """
+    result = BackupResult(router.name, file=f"{name}.backup")
+    start = time.monotonic()
+    store = backup_store.get_store()
+    router_id = storage.router_id((router.host, router.port, router.username))
+    try:
+        latest = store.latest(router_id)
+        if max_age and latest is not None and time.time() - latest.created < max_age:
+            result.status, result.file, result.size = "skipped", latest.name, latest.size
+            result.error = f"archived {(time.time() - latest.created) / 3600:.1f} h ago"
+            return result
+        if router.transport != "ssh":
+            raise ConnectionError("File transfer needs SSH; this router is in the inventory with the "
+                                  f"{router.transport} transport.")
+
+        with fleet.session(router) as key:
+            for attempt in range(attempts):
+                try:
+                    with connection_pool.lease(key) as client:
+                        path, size = _find_partial(router_id, result.file)
+                        if path is not None and _remote_size(client, result.file) != size:
+                            os.remove(path)          # the router's file changed; start over
+                            path = None
+                        if path is None:
+                            size = backup_configuration.save_backup(client, name)
+                            path = _partial_path(router_id, result.file, size)
+                        with transfers:
+                            resumed = _download(client, result.file, path, size, limit)
+                    result.resumed_from = result.resumed_from or resumed
+                    break
+                except Exception:
+                    if attempt == attempts - 1:
+                        raise
+
+        result.size = store.ingest(router_id, result.file, _read_blocks(path)).size
+        os.remove(path)
+        result.status = "ok"
+    except Exception as e:
+        result.status = "error"
+        result.error = str(e) or type(e).__name__
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+def collect_fleet(routers, pattern=NAME_PATTERN, max_parallel=MAX_PARALLEL, max_transfers=MAX_TRANSFERS,
+                  bandwidth=None, max_age=MAX_AGE, progress=None):
+    """Collect a backup from every router into the local archive; one ``BackupResult`` each.
+
+    Up to ``max_parallel`` routers save their backups at once, at most
+    ``max_transfers`` of them download at a time, and all downloads
+    together stay under ``bandwidth`` bytes per second. Routers archived
+    within ``max_age`` seconds are skipped. Running it again after an
+    interruption resumes the downloads that were cut off.
+    """
+    name = time.strftime(pattern)
+    limit = RateLimit(bandwidth)
+    transfers = threading.BoundedSemaphore(max_transfers)
+    return fleet.run_each(routers, lambda router: collect_one(router, name, limit, transfers, max_age),
+                          max_parallel, timeout=None, progress=progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect a backup from every router of an inventory")
+    parser.add_argument("inventory", help="CSV or JSON inventory, as on the Fleet Operations page")
+    parser.add_argument("--name", default=NAME_PATTERN, help="backup name, strftime codes allowed")
+    parser.add_argument("--parallel", type=int, default=MAX_PARALLEL)
+    parser.add_argument("--transfers", type=int, default=MAX_TRANSFERS)
+    parser.add_argument("--bandwidth", type=float, default=None, help="MB/s for all downloads together")
+    parser.add_argument("--max-age", type=float, default=MAX_AGE / 3600, help="skip routers archived this "
+                                                                              "many hours ago or less")
+    args = parser.parse_args()
+
+    routers = fleet.load_inventory_file(args.inventory)
+    started = time.monotonic()
+    results = collect_fleet(routers, args.name, args.parallel, args.transfers,
+                            args.bandwidth * 1024 * 1024 if args.bandwidth else None, args.max_age * 3600,
+                            progress=lambda done, total: print(f"\r{done}/{total} routers", end="", flush=True))
+    print()
+    for result in results:
+        if not result.ok:
+            print(f"  {result.router}: {result.status} {result.error}")
+    total = sum(result.size for result in results if result.ok)
+    print(" · ".join(f"{status}: {count}" for status, count in sorted(fleet.summarize(results).items())),
+          f"· {total:,} bytes in {time.monotonic() - started:.1f}s")
+    connection_pool.get_pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import time
+import streamlit as st
+import blocklist
+import bulk_queues
+import connection_pool
+import dns
+import firewall_filtering
+import fleet
+import fleet_backup
+import storage
+
+def load_uploaded_inventory(uploaded):
+    """Parse an uploaded CSV/JSON inventory and keep it in the session."""
+    try:
+        text = uploaded.getvalue().decode("utf-8")
+        routers = fleet.load_inventory(text, "json" if uploaded.name.endswith(".json") else "csv")
+        st.session_state["fleet_inventory"] = routers
+        st.success(f"✅ Loaded {len(routers)} routers from `{uploaded.name}`")
+    except Exception as e:
+        st.error(f"❌ Failed to read inventory: {e}")
+
+def select_routers(routers):
+    tags = sorted({tag for router in routers for tag in router.tags})
+    selected_tags = st.multiselect("Only routers tagged:", tags) if tags else []
+    if selected_tags:
+        routers = [r for r in routers if set(selected_tags) & set(r.tags)]
+    st.write(f"**{len(routers)}** routers selected")
+    return routers
+
+def build_commands():
+    """Let the user pick an action and return it (or None if incomplete).
+
+    The action is a list of commands for every router, or for blocking a
+    website a ``work(router)`` callable for ``fleet.run_each``.
+    """
+    action = st.radio("Action", ["DNS Configuration", "Bandwidth Limit", "Block Website"], horizontal=True)
+
+    if action == "DNS Configuration":
+        servers = st.text_input("DNS servers (comma-separated):", placeholder="1.1.1.1,8.8.8.8").strip()
+        allow_remote = st.checkbox("Allow remote request", True)
+        if servers:
+            return [dns.dns_command(servers, "yes" if allow_remote else "no")]
+
+    elif action == "Bandwidth Limit":
+        target_ip = st.text_input("Target IP Address").strip()
+        upload_speed = st.number_input("Upload Speed (Mbps)", min_value=0.0)
+        download_speed = st.number_input("Download Speed (Mbps)", min_value=0.0)
+        if target_ip and upload_speed > 0 and download_speed > 0:
+            return [bulk_queues.queue_add_command(target_ip, upload_speed, download_speed)]
+
+    else:
+        domain = blocklist.normalize(st.text_input("Website to block", placeholder="example.com"))
+        mode = firewall_filtering.MODES[st.radio("Blocking method", list(firewall_filtering.MODES),
+                                                 horizontal=True)]
+        if domain:
+            return lambda router: block_website(router, domain, mode)
+
+    return None
+
+def block_website(router, domain, mode):
+    """Block ``domain`` on one router the way the Firewall Filtering page does.
+
+    The domain is only kept in that router's blocklist once its sync succeeded.
+    """
+    result = fleet.RouterResult(router.name)
+    start = time.monotonic()
+    try:
+        with fleet.session(router) as key, connection_pool.lease(key) as client:
+            failed = blocklist.block(client, storage.router_id(key), domain, mode)
+        if failed:
+            result.status = "failed"
+            result.error = f"{failed[0].command}: {failed[0].error or 'not applied'}"
+        else:
+            result.status = "ok"
+    except Exception as e:
+        result.status = "error"
+        result.error = str(e)
+    result.elapsed = time.monotonic() - start
+    return result
+
+def show_results(results):
+    counts = fleet.summarize(results)
+    st.write(" · ".join(f"**{status}**: {count}" for status, count in sorted(counts.items())))
+    st.dataframe(
+        [
+            {"Router": r.router, "Status": r.status, "Seconds": round(r.elapsed, 2), "Error": r.error}
+            for r in results
+        ],
+        width="stretch",
+    )
+
+def collect_backups(routers, max_parallel):
+    """Fleet backup section: save and archive a backup of every selected router."""
+    with st.expander("🗄️ Collect Backups"):
+        name = st.text_input("Backup name (strftime codes allowed)", value=fleet_backup.NAME_PATTERN)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            max_transfers = st.number_input("Downloads at once", 1, 64, fleet_backup.MAX_TRANSFERS)
+        with col2:
+            bandwidth = st.number_input("Bandwidth limit (MB/s, 0 = none)", 0.0, value=0.0)
+        with col3:
+            max_age = st.number_input("Skip if archived within (hours)", 0.0,
+                                      value=fleet_backup.MAX_AGE / 3600)
+        if st.button("🗄️ Collect Backups"):
+            progress = st.progress(0.0, text="Starting...")
+            results = fleet_backup.collect_fleet(
+                routers, name, max_parallel=max_parallel,
+                max_transfers=int(max_transfers), bandwidth=bandwidth * 1024 * 1024 or None,
+                max_age=max_age * 3600,
+                progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} routers"),
+            )
+            st.session_state["fleet_results"] = results
+            total = sum(result.size for result in results if result.ok)
+            st.success(f"✅ Archived {total:,} bytes; rerun to resume any that failed")
+
+def run():
+    st.header("🌐 Fleet Operations")
+    st.write("Push the same change to many routers at once.")
+
+    uploaded = st.file_uploader("Router inventory (CSV or JSON)", type=["csv", "json"])
+    if uploaded is not None and st.session_state.get("fleet_inventory_name") != uploaded.name:
+        load_uploaded_inventory(uploaded)
+        st.session_state["fleet_inventory_name"] = uploaded.name
+
+    routers = st.session_state.get("fleet_inventory", [])
+    if not routers:
+        st.info("Upload an inventory with columns: name, host, port, username, password, tags")
+        return
+
+    routers = select_routers(routers)
+    commands = build_commands()
+    max_parallel = st.slider("Routers in parallel", 1, 128, fleet.MAX_PARALLEL)
+
+    if st.button("Apply to Fleet"):
+        if not commands:
+            st.warning("⚠️ Please complete the action settings.")
+            return
+        progress = st.progress(0.0, text="Starting...")
+        results = (fleet.run_each if callable(commands) else fleet.run_fleet)(
+            routers, commands, max_parallel=max_parallel,
+            progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} routers"),
+        )
+        st.session_state["fleet_results"] = results
+
+    collect_backups(routers, max_parallel)
+
+    if st.session_state.get("fleet_results"):
+        show_results(st.session_state["fleet_results"])
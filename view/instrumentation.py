@@ -0,0 +1,365 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import query_cache
+
+# Histogram bucket upper bounds, in seconds / round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+
+# name -> (type, help) for the Prometheus export, in output order
+METRICS = {
+    "netez_command_seconds": ("histogram", "Router command latency from channel open to exit status."),
+    "netez_commands_total": ("counter", "Router commands run, by outcome."),
+    "netez_channel_open_seconds": ("histogram", "Time to open an SSH channel (one round trip)."),
+    "netez_channel_opens_total": ("counter", "SSH channels opened: exec, stream and SFTP."),
+    "netez_bytes_sent_total": ("counter", "Command and request bytes sent to the router."),
+    "netez_bytes_received_total": ("counter", "Output and file bytes received from the router."),
+    "netez_api_round_trip_seconds": ("histogram", "Time for pipelined RouterOS API requests to be answered."),
+    "netez_api_requests_total": ("counter", "RouterOS API sentences sent, lookups included."),
+    "netez_connect_seconds": ("histogram", "SSH or API connect and login time."),
+    "netez_connects_total": ("counter", "SSH and API connects, by outcome."),
+    "netez_render_round_trips": ("histogram", "Channel opens and API round trips while rendering a page."),
+    "netez_render_seconds": ("histogram", "Wall time of a page render."),
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)     # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        position = 0
+        while position < len(self.bounds) and value > self.bounds[position]:
+            position += 1
+        self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                low = self.bounds[position - 1] if position else 0.0
+                high = self.bounds[position] if position < len(self.bounds) else low
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def summary(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "p50": round(self.quantile(0.5), 6),
+                "p95": round(self.quantile(0.95), 6),
+                "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts))}
+
+
+@dataclass
+class RenderStats:
+    """Router I/O done while rendering one page."""
+    page: str
+    round_trips: int = 0
+    commands: int = 0
+    io_seconds: float = 0.0
+    bytes_received: int = 0
+    seconds: float = 0.0
+
+
+_render = contextvars.ContextVar("netez_render", default=None)
+
+
+class Registry:
+    """Process-wide counters and histograms for router I/O, labelled by router."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}        # (name, labels) -> value
+        self._histograms = {}      # (name, labels) -> Histogram
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, bounds=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def histograms(self, name):
+        """``[(labels dict, Histogram), ...]`` for one metric."""
+        with self._lock:
+            return [(dict(labels), h) for (n, labels), h in self._histograms.items() if n == name]
+
+    def to_json(self):
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, h.summary()) for key, h in self._histograms.items()]
+        data = {name: [] for name in METRICS}
+        for (name, labels), value in counters:
+            data[name].append({"labels": dict(labels), "value": value})
+        for (name, labels), summary in histograms:
+            data[name].append({"labels": dict(labels), **summary})
+        return {"generated": time.time(), "metrics": {name: rows for name, rows in data.items() if rows}}
+
+    def to_prometheus(self):
+        """Text exposition format, version 0.0.4."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (h.bounds, list(h.counts), h.sum, h.count))
+                                for key, h in self._histograms.items())
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            rows = [row for row in (counters if kind == "counter" else histograms) if row[0][0] == name]
+            if not rows:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (_, labels), value in rows:
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                bounds, counts, total, count = value
+                cumulative = 0
+                for bound, bucket in zip([*map(str, bounds), "+Inf"], counts):
+                    cumulative += bucket
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the process-wide registry shared by every Streamlit session."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = Registry()
+        return _registry
+
+
+def router_of(client):
+    """``address:port`` of the router behind ``client``; the label used for its metrics."""
+    if getattr(client, "is_api", False):
+        return client.address
+    try:
+        host, port = client.get_transport().getpeername()[:2]
+        return f"{host}:{port}"
+    except Exception:
+        return "unknown"
+
+
+def command_labels(command):
+    """Menu and verb of a command; batched and other scripts are grouped as ``script``."""
+    command = command.strip()
+    if not command.startswith("/"):
+        return {"menu": "script", "verb": ""}
+    path, verb = query_cache.split_command(command)
+    return {"menu": "/" + " ".join(path), "verb": verb}
+
+
+def outcome(result, stderr):
+    """Status label for a ``CommandResult`` whose stderr is still raw bytes."""
+    if result.timed_out:
+        return "timeout"
+    return "ok" if result.exit_status == 0 and not stderr else "error"
+
+
+# -- recording ---------------------------------------------------------------
+
+def channel_opened(client, seconds):
+    """Record one channel open, which costs one round trip to the router."""
+    router = router_of(client)
+    registry = get_registry()
+    registry.inc("netez_channel_opens_total", {"router": router})
+    registry.observe("netez_channel_open_seconds", {"router": router}, seconds)
+    stats = _render.get()
+    if stats is not None:
+        stats.round_trips += 1
+
+
+def api_round_trip(client, requests, seconds):
+    """Record ``requests`` API sentences answered together, which costs one round trip."""
+    router = router_of(client)
+    registry = get_registry()
+    registry.inc("netez_api_requests_total", {"router": router}, requests)
+    registry.observe("netez_api_round_trip_seconds", {"router": router}, seconds)
+    stats = _render.get()
+    if stats is not None:
+        stats.round_trips += 1
+
+
+def command_done(client, command, seconds, sent, received, status):
+    """Record a finished command; ``status`` is "ok", "error" or "timeout"."""
+    router = router_of(client)
+    labels = {"router": router, **command_labels(command)}
+    registry = get_registry()
+    registry.observe("netez_command_seconds", labels, seconds)
+    registry.inc("netez_commands_total", {**labels, "status": status})
+    registry.inc("netez_bytes_sent_total", {"router": router}, sent)
+    registry.inc("netez_bytes_received_total", {"router": router}, received)
+    stats = _render.get()
+    if stats is not None:
+        stats.commands += 1
+        stats.io_seconds += seconds
+        stats.bytes_received += received
+
+
+def transferred(client, received, sent=0):
+    """Record bytes moved outside a command, e.g. an SFTP download."""
+    router = router_of(client)
+    registry = get_registry()
+    registry.inc("netez_bytes_received_total", {"router": router}, received)
+    if sent:
+        registry.inc("netez_bytes_sent_total", {"router": router}, sent)
+    stats = _render.get()
+    if stats is not None:
+        stats.bytes_received += received
+
+
+def connected(router, seconds, ok):
+    get_registry().observe("netez_connect_seconds", {"router": router}, seconds)
+    get_registry().inc("netez_connects_total", {"router": router, "status": "ok" if ok else "error"})
+
+
+def open_sftp(client):
+    """``client.open_sftp()``, counted as a channel open."""
+    start = time.perf_counter()
+    sftp = client.open_sftp()
+    channel_opened(client, time.perf_counter() - start)
+    return sftp
+
+
+# -- page renders ------------------------------------------------------------
+
+def current_render():
+    return _render.get()
+
+
+def attach(stats):
+    """Make ``stats`` the render that I/O in the current context counts towards.
+
+    For code that moves work to another thread or event loop, which does
+    not inherit the page's context by itself.
+    """
+    _render.set(stats)
+
+
+@contextmanager
+def render(page):
+    """Count the router I/O of one page render and record it per page."""
+    stats = RenderStats(page)
+    token = _render.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        _render.reset(token)
+        stats.seconds = time.perf_counter() - start
+        registry = get_registry()
+        registry.observe("netez_render_round_trips", {"page": page}, stats.round_trips, ROUND_TRIP_BUCKETS)
+        registry.observe("netez_render_seconds", {"page": page}, stats.seconds)
+
+
+def summary(stats):
+    """One-line sidebar text for a ``RenderStats``."""
+    size = stats.bytes_received
+    size = f"{size / 1024:.1f} kB" if size >= 1024 else f"{size} B"
+    return (f"⏱️ {stats.round_trips} round trips · {stats.commands} commands · "
+            f"{stats.io_seconds * 1000:.0f} ms router I/O · {size}")
+
+
+def router_summary():
+    """Per-router totals for the sidebar: commands, latency quantiles, channels and bytes."""
+    registry = get_registry()
+    merged = {}
+    for labels, histogram in registry.histograms("netez_command_seconds"):
+        total = merged.setdefault(labels["router"], Histogram(histogram.bounds))
+        total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        total.sum += histogram.sum
+        total.count += histogram.count
+    counters = registry.to_json()["metrics"]
+
+    def counter(name, router):
+        return sum(row["value"] for row in counters.get(name, []) if row["labels"].get("router") == router)
+
+    return [
+        {"router": router, "commands": h.count, "p50_ms": h.quantile(0.5) * 1000, "p95_ms": h.quantile(0.95) * 1000,
+         "channels": counter("netez_channel_opens_total", router),
+         "received": counter("netez_bytes_received_total", router)}
+        for router, h in sorted(merged.items())
+    ]
+
+
+# -- export --------------------------------------------------------------------
+
+def prometheus():
+    return get_registry().to_prometheus()
+
+
+def to_json():
+    return json.dumps(get_registry().to_json(), indent=2)
+
+
+_server = None
+
+
+def serve(port, host="0.0.0.0"):
+    """Serve ``/metrics`` (Prometheus) and ``/metrics.json`` from a daemon thread, once per process."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, kind = prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, kind = to_json().encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _registry_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), Handler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -1,93 +1,170 @@
+import ipaddress
 import streamlit as st
-import time
+import async_engine
+import connection_pool
+import desired_state
+import executor
+import terse
+import waiters
 
-def execute_command(client, command):
-    stdin, stdout, stderr = client.exec_command(command)
-    return stdout.channel.recv_exit_status(), stdout.read().decode().strip(), stderr.read().decode().strip()
+def has_address(client, address, interface=None):
+    """Read the address table straight from the router (bypassing the cache)."""
+    output = executor.execute(client, "/ip address print terse").output
+    return any(
+        record.address == address and (interface is None or record.interface == interface)
+        for record in terse.iter_terse(output, terse.AddressRecord)
+    )
 
-def get_interface(client):
-    _, output, _ = execute_command(client, "/interface print terse")
-    
-    interfaces = []
-    for line in output.split("\n"):
-        parts = line.split()
-        if len(parts) >= 3:
-            interfaces.append(parts[2].replace("name=", ""))
-            
-    return interfaces
-
-def rerun_after(timer):
-    time.sleep(timer)
+def rerun_when(check, description):
+    """Rerun the page as soon as ``check()`` passes instead of after a fixed delay."""
+    try:
+        waiters.wait_until(check, deadline=15, description=description)
+    except waiters.WaitTimeout as e:
+        st.warning(str(e))
+        return
     st.rerun()
 
 def subnet_mask_to_cidr(subnet_mask):
     return sum(bin(int(x)).count('1') for x in subnet_mask.split('.'))
 
-def delete_ip(index, address):
-    """Deletes the IP address from MikroTik using the stored SSH client."""
-    client = st.session_state.get("ssh_client")
-    if not client:
+PAGE_SIZES = [25, 50, 100, 250]
+SORT_COLUMNS = ["Address", "Network", "Interface", "Status"]
+STATUSES = ["All", "Active", "Disabled", "Dynamic", "Invalid"]
+
+def address_key(value):
+    """Sort key that orders addresses numerically (10.0.0.9 before 10.0.0.10)."""
+    try:
+        interface = ipaddress.ip_interface(value)
+        return (interface.version, int(interface.ip), interface.network.prefixlen, "")
+    except ValueError:
+        return (9, 0, 0, value)
+
+SORT_KEYS = {
+    "Address": lambda record: address_key(record.address),
+    "Network": lambda record: (address_key(record.network), address_key(record.address)),
+    "Interface": lambda record: (record.interface, address_key(record.address)),
+    "Status": lambda record: (record.status, address_key(record.address)),
+}
+
+def filter_addresses(records, text="", interface="All", status="All"):
+    """Records whose address, network or interface contains ``text``, on ``interface`` with ``status``."""
+    text = text.strip().lower()
+    return [
+        record for record in records
+        if (interface == "All" or record.interface == interface)
+        and (status == "All" or record.status == status)
+        and (not text or text in record.address.lower() or text in record.network.lower()
+             or text in record.interface.lower())
+    ]
+
+def sort_addresses(records, column="Address", descending=False):
+    return sorted(records, key=SORT_KEYS[column], reverse=descending)
+
+def page_of(records, page, page_size):
+    """The records on 1-based ``page`` and the number of pages."""
+    pages = max(1, -(-len(records) // page_size))
+    page = min(max(1, page), pages)
+    return records[(page - 1) * page_size:page * page_size], pages
+
+def remove_command(record):
+    """Remove by address and interface; print numbers shift as soon as anything is removed."""
+    return (f"/ip address remove [find address={executor.quote(record.address)} "
+            f"interface={executor.quote(record.interface)}]")
+
+def read_addresses(client):
+    """The set of addresses on the router, read straight from it (bypassing the cache)."""
+    output = executor.execute(client, "/ip address print terse").output
+    return {record.address for record in terse.iter_terse(output, terse.AddressRecord)}
+
+def delete_ips(records):
+    """Delete the selected addresses from MikroTik in one round trip."""
+    router = st.session_state.get("router")
+    if not router:
         st.error("❌ No SSH connection detected. Please log in first.")
         return
 
-    _, _, error = execute_command(client, f"/ip address remove numbers={index}")
-    if error:
-        st.error(f"Failed to delete {address}: {error}")
-    else:
-        st.success(f"Deleted IP {address}")
-        rerun_after(3)
-        
-def get_ip(output):    
-    col_headers = st.columns([3,2,1.5,1,1])
-    with col_headers[0]: st.markdown("**Address**")
-    with col_headers[1]: st.markdown("**Network**")
-    with col_headers[2]: st.markdown("**Interface**")
-    with col_headers[3]: st.markdown("**Status**")
-    with col_headers[4]: st.markdown("**Action**")
-    
-    for line in output.split("\n"):
-        if not line.strip():
-            continue
-        parts = line.split()
-        if len(parts) >= 4:
-            index = parts[0].split('=')[-1]  
-            address = parts[1].split('=')[-1]
-            network = parts[2].split('=')[-1]
-            interface = parts[3].split('=')[-1]
-            
-            status_code = parts[0][0]
-            status_text = {
-                "D": "Dynamic",
-                "X": "Disabled",
-                "I": "Invalid"
-            }.get(status_code, "Active")
-            
-            cols = st.columns([3,2,1.5,1,1])
-            with cols[0]: st.write(address)
-            with cols[1]: st.write(network)
-            with cols[2]: st.write(interface)
-            with cols[3]: st.write(status_text)
-            with cols[4]:
-                if st.button(f"Delete", key=f"del_{index}", use_container_width=True):
-                    delete_ip(index, address)  # ✅ Pass only `index` and `address`
-
-def show_ip(client):
+    dynamic = [record for record in records if record.dynamic]
+    if dynamic:
+        st.warning(f"Skipped {len(dynamic)} dynamic addresses; they are managed by the router.")
+    records = [record for record in records if not record.dynamic]
+    if not records:
+        return
+
+    with connection_pool.lease(router) as client:
+        results = executor.execute_batch(client, [remove_command(record) for record in records])
+        failed = [(record, result) for record, result in zip(records, results) if not result.ok]
+        for record, result in failed[:5]:
+            st.error(f"Failed to delete {record.address}: {result.error or 'not applied'}")
+        deleted = {record.address for record in records} - {record.address for record, _ in failed}
+        if deleted:
+            st.toast(f"Deleted {len(deleted)} IP addresses")
+            rerun_when(lambda: not deleted & read_addresses(client), f"Removal of {len(deleted)} addresses")
+
+def show_page(visible, key):
+    """One table element for the visible page; returns the selected records."""
+    rows = [{"Address": record.address, "Network": record.network, "Interface": record.interface,
+             "Status": record.status} for record in visible]
+    event = st.dataframe(rows, key=key, on_select="rerun", selection_mode="multi-row",
+                         hide_index=True, width="stretch")
+    return [visible[row] for row in event.selection.rows if row < len(visible)]
+
+def get_ip(records):
+    """Filtered, sorted and paged address table.
+
+    Filtering, sorting and paging happen here, so only the visible page
+    is sent to the browser as a single table, whatever the table size.
+    """
+    col1, col2, col3 = st.columns([3, 2, 2])
+    with col1:
+        text = st.text_input("Filter", placeholder="Address, network or interface", key="ip_filter")
+    with col2:
+        interface = st.selectbox("Interface", ["All"] + sorted({record.interface for record in records}),
+                                 key="ip_interface")
+    with col3:
+        status = st.selectbox("Status", STATUSES, key="ip_status")
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        column = st.selectbox("Sort by", SORT_COLUMNS, key="ip_sort")
+    with col2:
+        descending = st.toggle("Descending", key="ip_descending")
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key="ip_page_size")
+
+    matches = sort_addresses(filter_addresses(records, text, interface, status), column, descending)
+    pages = page_of(matches, 1, page_size)[1]
+    with col4:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"ip_page_{pages}")
+    visible, _ = page_of(matches, page, page_size)
+    st.caption(f"{len(matches):,} of {len(records):,} addresses · page {page} of {pages}")
+
+    # A new view gets a new table, so a selection never points at rows of another page
+    selected = show_page(visible, f"ip_table_{hash((text, interface, status, column, descending, page_size, page))}")
+    if st.button(f"🗑️ Delete {len(selected)} selected", disabled=not selected):
+        delete_ips(selected)
+
+def show_ip(records):
     st.subheader("IP Addresses")
-    _, output, _ = execute_command(client, "/ip address print terse")
-    get_ip(output)
+    get_ip(records)
+
+def load_tables(client):
+    """Read the address and interface tables concurrently."""
+    return async_engine.gather(
+        async_engine.query_async(client, "/ip address print terse", terse.AddressRecord),
+        async_engine.query_async(client, "/interface print terse", terse.InterfaceRecord),
+    )
     
 def enable_disable_interface_btn(client, selected_interface):
     col1, _, col2 = st.columns([1,2,1])
     with col1:
         if st.button("Turn On Connection", use_container_width=True):
-            _, _, error = execute_command(client, f"/interface enable {selected_interface}")
+            error = executor.execute(client, f"/interface enable {selected_interface}").error
             if error:
                 st.error(f"Unable to enable {selected_interface}: {error}")
             else:
                 st.success(f"Enabled {selected_interface}")
     with col2:
         if st.button("Turn Off Connection", use_container_width=True):
-            _, _, error = execute_command(client, f"/interface disable {selected_interface}")
+            error = executor.execute(client, f"/interface disable {selected_interface}").error
             if error:
                 st.error(f"Unable to disable {selected_interface}: {error}")
             else:
@@ -96,18 +173,27 @@ def enable_disable_interface_btn(client, selected_interface):
 def apply_conf(client, selected_interface, ip_address, subnet_mask, remove_old):
     try:
         cidr = subnet_mask_to_cidr(subnet_mask)
-        ip_with_subnet = f"{ip_address}/{cidr}"
+        ip_with_subnet = str(ipaddress.ip_interface(f"{ip_address}/{cidr}"))
         
-        if remove_old:
-            execute_command(client, f"/ip address remove [find interface={selected_interface}]")
+        # Only send what differs from the router; an address that is already there is left alone
+        state = desired_state.DesiredState(addresses={selected_interface: [ip_with_subnet]})
+        plan = desired_state.plan(client, state)
+        if not remove_old:
+            plan.changes = [c for c in plan.changes if not c.command.startswith("/ip address remove")]
+        if not plan.changes:
+            st.info(f"{ip_with_subnet} is already configured on {selected_interface}.")
+            return
+        if remove_old and len(plan.changes) > 1:
             st.warning(f"Removing old IPs on {selected_interface}...")
-        
-        _, _, error = execute_command(client, f"/ip address add address={ip_with_subnet} interface={selected_interface}")
-        if error:
-            st.error(f"Error: {error}")
+
+        # Remove and add in one round trip; keep the old address if removal fails
+        results = executor.execute_batch(client, plan.commands(), stop_on_error=True)
+        failed = [r for r in results if not r.ok]
+        if failed:
+            st.error(f"Error: {failed[0].error or 'not applied'}")
         else:
-            st.success(f"New IP {ip_with_subnet} applied to {selected_interface}")
-            rerun_after(3)
+            st.toast(f"New IP {ip_with_subnet} applied to {selected_interface}")
+            rerun_when(lambda: has_address(client, ip_with_subnet, selected_interface), f"Address {ip_with_subnet}")
         
     except Exception as e:
         st.error(f"Failed to Set IP: {e}")
@@ -115,30 +201,33 @@ def apply_conf(client, selected_interface, ip_address, subnet_mask, remove_old):
 def run():
     st.header("Network Settings")
     
-    # Retrieve SSH client from session state
-    client = st.session_state.get("ssh_client")
+    # Retrieve the pooled router key from session state
+    router = st.session_state.get("router")
     
-    if not client:
+    if not router:
         st.warning("❌ No connection detected. Please log in first.")
         return
 
     tab1, tab2 = st.tabs(["Current Addresses", "Set New Address"])
 
-    with tab1:
-        show_ip(client)
+    with connection_pool.lease(router) as client:
+        addresses, interface_records = load_tables(client)
 
-    with tab2:
-        interfaces = get_interface(client)
-        if not interfaces:
-            st.warning("Interfaces not found")
-            return
+        with tab1:
+            show_ip(addresses)
+
+        with tab2:
+            interfaces = [record.name for record in interface_records if record.name]
+            if not interfaces:
+                st.warning("Interfaces not found")
+                return
+                
+            selected_interface = st.selectbox("Choose Connection Port:", interfaces, index=None)
+            enable_disable_interface_btn(client, selected_interface)
             
-        selected_interface = st.selectbox("Choose Connection Port:", interfaces, index=None)
-        enable_disable_interface_btn(client, selected_interface)
-        
-        ip_address = st.text_input("IP Address:", placeholder="Enter the IP address", help="Example: 192.168.88.1")
-        subnet_mask = st.text_input("Subnetmask:", placeholder="Enter a subnet mask", help="Example: 255.255.255.0")
-        remove_old = st.checkbox("Replace existing address", True)
-        
-        if st.button("Save Settings"):
-            apply_conf(client, selected_interface, ip_address, subnet_mask, remove_old)
\ No newline at end of file
+            ip_address = st.text_input("IP Address:", placeholder="Enter the IP address", help="Example: 192.168.88.1")
+            subnet_mask = st.text_input("Subnetmask:", placeholder="Enter a subnet mask", help="Example: 255.255.255.0")
+            remove_old = st.checkbox("Replace existing address", True)
+            
+            if st.button("Save Settings"):
+                apply_conf(client, selected_interface, ip_address, subnet_mask, remove_old)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import time
+
+import streamlit as st
+
+import connection_pool
+import jobs
+import storage
+
+REFRESH_SECONDS = 1
+STATUS_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "cancelled": "🚫", "interrupted": "⚠️"}
+
+
+def _show_job(job):
+    started = time.strftime("%H:%M:%S", time.localtime(job.created))
+    title = f"{STATUS_ICONS.get(job.status, '')} {job.label} #{job.id} · {started}"
+    if job.active:
+        eta = jobs.format_eta(job.eta)
+        status = "waiting for login" if jobs.get_scheduler().waiting_for_login(job) else job.status
+        text = f"{title} · {job.message or status}" + (f" · about {eta} left" if eta else "")
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.progress(job.fraction, text=text)
+        with col2:
+            if st.button("Cancel", key=f"cancel_job_{job.id}"):
+                jobs.get_scheduler().cancel(job.id)
+    elif job.status == "done":
+        st.success(f"{title} · {job.result}")
+    elif job.status == "failed":
+        st.error(f"{title} · {job.error}")
+    else:
+        st.warning(f"{title} · {job.status}")
+
+
+def show_jobs(router, kinds=None, limit=5):
+    """Recent jobs of this router, polled every second while any of them is still running.
+
+    Only this block reruns while jobs are in progress; once they have all
+    finished the page reruns once so it shows their results (new backup
+    files, changed queues, ...).
+    """
+    router_id = storage.router_id(router)
+    recent = jobs.get_scheduler().jobs(router_id, kinds, limit)
+    watched = {job.id for job in recent if job.active}
+    fragment = getattr(st, "fragment", None)
+    if not watched or fragment is None:
+        for job in recent:
+            _show_job(job)
+        return
+
+    def render():
+        current = jobs.get_scheduler().jobs(router_id, kinds, limit)
+        for job in current:
+            _show_job(job)
+        if not any(job.active for job in current if job.id in watched):
+            st.rerun()
+
+    fragment(run_every=REFRESH_SECONDS)(render)()
+
+
+def _describe(schedule):
+    when = f"daily at {schedule.at}" if schedule.at else f"every {jobs.format_eta(schedule.every)}"
+    params = ", ".join(f"{key}={value}" for key, value in schedule.params.items() if key != "commands")
+    return f"{jobs.KINDS[schedule.kind][2]} {when}" + (f" ({params})" if params else "")
+
+
+def show_schedules(router, kinds=None):
+    """Schedules of this router with a remove button each; returns them."""
+    scheduler = jobs.get_scheduler()
+    schedules = [schedule for schedule in scheduler.schedules(storage.router_id(router))
+                 if kinds is None or schedule.kind in kinds]
+    for schedule in schedules:
+        following = time.strftime("%Y-%m-%d %H:%M", time.localtime(schedule.next_run))
+        if not connection_pool.get_pool().registered(schedule.key):
+            following += ", waiting for login"
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            st.write(f"🕒 {_describe(schedule)} · next run {following}")
+        with col2:
+            if st.button("🗑️ Remove", key=f"remove_schedule_{schedule.id}"):
+                scheduler.remove_schedule(schedule.id)
+                st.rerun()
+    return schedules
+
+
+def run():
+    """Background Jobs Page"""
+    st.subheader("🧰 Background Jobs")
+
+    router = st.session_state.get("router")
+    if router is None:
+        st.error("⚠️ No active MikroTik connection. Please log in first.")
+        return
+
+    st.caption("Backups, bulk imports and WiFi changes run in the background; "
+               "you can leave this page while they do.")
+    st.write("### 📋 Recent Jobs")
+    if not jobs.get_scheduler().jobs(storage.router_id(router), limit=1):
+        st.info("No jobs for this router yet.")
+    show_jobs(router, limit=20)
+
+    st.write("### 🕒 Schedules")
+    if not show_schedules(router):
+        st.info("No schedules for this router. Add a nightly backup on the Backup Configuration page.")
+
+
+if __name__ == "__main__":
+    run()
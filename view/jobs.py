@@ -0,0 +1,481 @@
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import connection_pool
+import storage
+
+MAX_WORKERS = 4               # jobs running at once, across all routers
+SCHEDULE_INTERVAL = 30        # seconds between checks for due schedules
+PROGRESS_WRITE_INTERVAL = 1.0  # progress is persisted at most this often per job
+KEEP_FINISHED = 7 * 86400     # finished jobs older than this are pruned at start-up
+
+# Job kinds: name -> (module, function, label). Modules are imported when a job
+# of that kind first runs, like pages. The function is called as
+# ``function(client, job, **params)`` and returns a result line.
+KINDS = {
+    "backup": ("backup_configuration", "backup_job", "Backup"),
+    "queue_import": ("bulk_queues", "apply_job", "Queue import"),
+    "wifi": ("ssid_password", "wifi_job", "WiFi change"),
+    "snapshot": ("config_snapshots", "snapshot_job", "Config snapshot"),
+}
+
+ACTIVE = ("queued", "running")
+# Parameters kept in memory only, never written to the job table
+SECRET_PARAMS = {"password"}
+HIDDEN = "********"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    router TEXT NOT NULL,
+    key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT NOT NULL DEFAULT '',
+    error TEXT NOT NULL DEFAULT '',
+    schedule_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_router ON jobs (router, id);
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    router TEXT NOT NULL,
+    key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    at TEXT,
+    every REAL,
+    next_run REAL NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    last_job INTEGER
+);
+"""
+
+_JOB_COLUMNS = ("id, kind, router, key, params, status, created, started, finished, done, total, "
+                "message, result, error, schedule_id")
+_LIST_COLUMNS = _JOB_COLUMNS.replace("params", "'{}'")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's ``progress`` call once the job has been cancelled."""
+
+
+@dataclass
+class Job:
+    """One background job and its progress."""
+    id: int
+    kind: str
+    router: str                     # ``storage.router_id`` of the pool key
+    key: tuple                      # pool key the job leases
+    params: dict = field(default_factory=dict)
+    status: str = "queued"          # queued, running, done, failed, cancelled or interrupted
+    created: float = 0.0
+    started: float = None
+    finished: float = None
+    done: int = 0
+    total: int = 0
+    message: str = ""
+    result: str = ""
+    error: str = ""
+    schedule_id: int = None
+
+    @property
+    def label(self):
+        return KINDS.get(self.kind, (None, None, self.kind))[2]
+
+    @property
+    def active(self):
+        return self.status in ACTIVE
+
+    @property
+    def fraction(self):
+        if self.status == "done":
+            return 1.0
+        return min(1.0, self.done / self.total) if self.total else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left, extrapolated from the progress so far; ``None`` until there is some."""
+        if self.status != "running" or not self.done or not self.total:
+            return None
+        elapsed = time.time() - self.started
+        return max(0.0, elapsed / self.done * (self.total - self.done))
+
+
+@dataclass
+class Schedule:
+    """A job submitted again and again: daily at ``at`` ("HH:MM", local time) or ``every`` seconds."""
+    id: int
+    kind: str
+    router: str
+    key: tuple
+    params: dict
+    at: str = None
+    every: float = None
+    next_run: float = 0.0
+    enabled: bool = True
+    last_job: int = None
+
+
+def next_run(at=None, every=None, now=None):
+    """When a schedule fires next after ``now``."""
+    now = time.time() if now is None else now
+    if every:
+        return now + every
+    hour, minute = (int(part) for part in at.split(":"))
+    today = time.localtime(now)
+    run = time.mktime((today.tm_year, today.tm_mon, today.tm_mday, hour, minute, 0, 0, 0, -1))
+    if run <= now:
+        tomorrow = time.localtime(now + 86400)
+        run = time.mktime((tomorrow.tm_year, tomorrow.tm_mon, tomorrow.tm_mday, hour, minute, 0, 0, 0, -1))
+    return run
+
+
+class JobContext:
+    """What a job function gets as ``job``: its identity plus progress reporting."""
+
+    def __init__(self, scheduler, job):
+        self._scheduler = scheduler
+        self._job = job
+        self._written = 0.0
+
+    id = property(lambda self: self._job.id)
+    router = property(lambda self: self._job.router)
+    key = property(lambda self: self._job.key)
+
+    @property
+    def cancelled(self):
+        return self._scheduler.cancel_requested(self._job.id)
+
+    def progress(self, done, total=None, message=None):
+        """Report ``done`` out of ``total`` steps; raises ``JobCancelled`` if the job was cancelled."""
+        job = self._job
+        job.done = done
+        if total is not None:
+            job.total = total
+        if message is not None:
+            job.message = message
+        now = time.monotonic()
+        if now - self._written >= PROGRESS_WRITE_INTERVAL or (job.total and done >= job.total):
+            self._written = now
+            self._scheduler._save_progress(job)
+        if self.cancelled:
+            raise JobCancelled()
+
+
+class JobScheduler:
+    """Runs router jobs in the background, out of reach of Streamlit reruns.
+
+    A bounded pool runs at most ``max_workers`` jobs at once, and never two
+    for the same router: each router's jobs wait in their own queue and run
+    in submission order. Jobs and their progress are kept in SQLite, so the
+    pages can poll them across reruns and sessions; a job that was running
+    when the process stopped comes back as ``interrupted``, and queued ones
+    run again. Schedules submit a job at a time of day or at an interval.
+
+    Logins only live in the connection pool, so after a restart a router's
+    queued jobs and due schedules wait until someone logs in to it again
+    instead of failing.
+    """
+
+    def __init__(self, path=None, max_workers=MAX_WORKERS):
+        path = path or os.path.join(storage.data_dir("jobs"), "jobs.sqlite")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="netez-job")
+        self._waiting = {}          # router -> deque of job ids
+        self._keys = {}             # job id -> pool key, for the jobs in ``_waiting``
+        self._busy = set()          # routers with a job handed to the pool
+        self._running = {}          # job id -> Job, for live progress
+        self._cancel = set()
+        self._secrets = {}          # job id -> SECRET_PARAMS values
+        self._timer = None
+        self._stop = threading.Event()
+
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET status = 'interrupted', finished = ? WHERE status = 'running'",
+                             (now,))
+            self._db.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+                             (now - KEEP_FINISHED,))
+            queued = self._db.execute(
+                "SELECT id, router, key FROM jobs WHERE status = 'queued' ORDER BY id").fetchall()
+        for job_id, router, key in queued:
+            self._waiting.setdefault(router, deque()).append(job_id)
+            self._keys[job_id] = tuple(json.loads(key))
+        self._dispatch()
+
+    # -- jobs ----------------------------------------------------------------
+
+    def submit(self, kind, key, schedule_id=None, **params):
+        """Queue a job for the router behind pool ``key``; return its id."""
+        if kind not in KINDS:
+            raise ValueError(f"unknown job kind {kind!r}")
+        router = storage.router_id(key)
+        stored = {name: HIDDEN if name in SECRET_PARAMS and value else value for name, value in params.items()}
+        with self._lock, self._db:
+            job_id = self._db.execute(
+                "INSERT INTO jobs (kind, router, key, params, status, created, schedule_id) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (kind, router, json.dumps(list(key)), json.dumps(stored), time.time(), schedule_id)).lastrowid
+            self._secrets[job_id] = {name: params[name] for name in params if stored[name] == HIDDEN}
+            self._waiting.setdefault(router, deque()).append(job_id)
+            self._keys[job_id] = tuple(key)
+        self._dispatch()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            if job_id in self._running:
+                return self._live(job_id)
+            row = self._db.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def jobs(self, router=None, kinds=None, limit=20):
+        """Most recent jobs first, optionally for one router and some kinds.
+
+        Listed jobs come without their ``params`` (a queue import carries
+        every command); ``get`` returns them.
+        """
+        query, args = f"SELECT {_LIST_COLUMNS} FROM jobs", []
+        conditions = []
+        if router is not None:
+            conditions.append("router = ?")
+            args.append(router)
+        if kinds:
+            conditions.append(f"kind IN ({', '.join('?' * len(kinds))})")
+            args.extend(kinds)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+            return [self._live(row[0], params=False) if row[0] in self._running else _job(row) for row in rows]
+
+    def _live(self, job_id, params=True):
+        """Copy of a running job with its latest, not yet persisted progress."""
+        job = Job(**vars(self._running[job_id]))
+        if not params:
+            job.params = {}
+        return job
+
+    def cancel(self, job_id):
+        """Drop a queued job, or ask a running one to stop at its next progress report."""
+        with self._lock:
+            for waiting in self._waiting.values():
+                if job_id in waiting:
+                    waiting.remove(job_id)
+                    self._keys.pop(job_id, None)
+                    self._secrets.pop(job_id, None)
+                    self._finish(job_id, "cancelled")
+                    return True
+            if job_id in self._running:
+                self._cancel.add(job_id)
+                return True
+        return False
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            return job_id in self._cancel
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job has finished (for scripts and tests); return it."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or not job.active:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"job {job_id} still {job.status}")
+            time.sleep(0.05)
+
+    def waiting_for_login(self, job):
+        """True if ``job`` is queued but its router has no login in the pool (after a restart)."""
+        return job.status == "queued" and not connection_pool.get_pool().registered(job.key)
+
+    def _dispatch(self):
+        pool = connection_pool.get_pool()
+        with self._lock:
+            for router, waiting in self._waiting.items():
+                if waiting and router not in self._busy and pool.registered(self._keys[waiting[0]]):
+                    self._busy.add(router)
+                    job_id = waiting.popleft()
+                    del self._keys[job_id]
+                    self._executor.submit(self._run, router, job_id)
+
+    def _run(self, router, job_id):
+        try:
+            job = self.get(job_id)
+            if job is None or job.status != "queued":
+                return
+            job.status, job.started = "running", time.time()
+            with self._lock, self._db:
+                self._running[job_id] = job
+                self._db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+                                 (job.started, job_id))
+            try:
+                with self._lock:
+                    params = {**job.params, **self._secrets.pop(job_id, {})}
+                if HIDDEN in params.values():
+                    raise RuntimeError("the app restarted before this job ran; submit it again")
+                module, function, _ = KINDS[job.kind]
+                function = getattr(importlib.import_module(module), function)
+                with connection_pool.lease(job.key) as client:
+                    job.result = function(client, JobContext(self, job), **params) or ""
+                self._finish(job_id, "done")
+            except JobCancelled:
+                self._finish(job_id, "cancelled")
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                self._finish(job_id, "failed")
+        finally:
+            with self._lock:
+                self._busy.discard(router)
+            self._dispatch()
+
+    def _save_progress(self, job):
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET done = ?, total = ?, message = ? WHERE id = ?",
+                             (job.done, job.total, job.message, job.id))
+
+    def _finish(self, job_id, status):
+        with self._lock, self._db:
+            job = self._running.pop(job_id, None)
+            self._cancel.discard(job_id)
+            if job is None:
+                self._db.execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ?",
+                                 (status, time.time(), job_id))
+                return
+            if status == "done" and job.total:
+                job.done = job.total
+            self._db.execute(
+                "UPDATE jobs SET status = ?, finished = ?, done = ?, total = ?, message = ?, result = ?, error = ? "
+                "WHERE id = ?",
+                (status, time.time(), job.done, job.total, job.message, job.result, job.error, job_id))
+
+    # -- schedules -----------------------------------------------------------
+
+    def add_schedule(self, kind, key, params=None, at=None, every=None):
+        """Submit ``kind`` for ``key`` daily ``at`` "HH:MM" or ``every`` seconds; return the schedule id."""
+        if kind not in KINDS:
+            raise ValueError(f"unknown job kind {kind!r}")
+        if bool(at) == bool(every):
+            raise ValueError("give exactly one of at and every")
+        with self._lock, self._db:
+            schedule_id = self._db.execute(
+                "INSERT INTO schedules (kind, router, key, params, at, every, next_run) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, storage.router_id(key), json.dumps(list(key)), json.dumps(params or {}), at, every,
+                 next_run(at, every))).lastrowid
+        connection_pool.get_pool().pin(key)
+        self.start()
+        return schedule_id
+
+    def schedules(self, router=None):
+        query = "SELECT id, kind, router, key, params, at, every, next_run, enabled, last_job FROM schedules"
+        with self._lock:
+            rows = (self._db.execute(query + " WHERE router = ? ORDER BY id", (router,)) if router is not None
+                    else self._db.execute(query + " ORDER BY id")).fetchall()
+        return [Schedule(row[0], row[1], row[2], tuple(json.loads(row[3])), json.loads(row[4]), row[5], row[6],
+                         row[7], bool(row[8]), row[9]) for row in rows]
+
+    def remove_schedule(self, schedule_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+
+    def run_due(self, now=None):
+        """Submit a job for every enabled schedule that is due; return the new job ids.
+
+        A schedule whose previous job is still queued or running is moved
+        on without piling up another one. One whose router nobody has
+        logged in to since the app started stays due until someone does.
+        """
+        now = time.time() if now is None else now
+        submitted = []
+        pool = connection_pool.get_pool()
+        for schedule in self.schedules():
+            if not schedule.enabled:
+                continue
+            if not pool.pin(schedule.key):     # keep its login while the process lives
+                continue
+            if schedule.next_run > now:
+                continue
+            previous = self.get(schedule.last_job) if schedule.last_job else None
+            job_id = schedule.last_job
+            if previous is None or not previous.active:
+                job_id = self.submit(schedule.kind, schedule.key, schedule_id=schedule.id, **schedule.params)
+                submitted.append(job_id)
+            with self._lock, self._db:
+                self._db.execute("UPDATE schedules SET next_run = ?, last_job = ? WHERE id = ?",
+                                 (next_run(schedule.at, schedule.every, now), job_id, schedule.id))
+        return submitted
+
+    def start(self):
+        """Start the thread that fires schedules, once."""
+        with self._lock:
+            if self._timer is None or not self._timer.is_alive():
+                self._timer = threading.Thread(target=self._timer_loop, name="netez-schedules", daemon=True)
+                self._timer.start()
+        return self
+
+    def _timer_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._dispatch()            # start jobs whose router has been logged in to again
+                self.run_due()
+            except Exception:
+                pass                # a bad schedule must not stop the others; it is retried next tick
+            self._stop.wait(SCHEDULE_INTERVAL)
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _job(row):
+    (job_id, kind, router, key, params, status, created, started, finished, done, total,
+     message, result, error, schedule_id) = row
+    return Job(job_id, kind, router, tuple(json.loads(key)), json.loads(params), status, created, started,
+               finished, done, total, message, result, error, schedule_id)
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} h"
+    if seconds >= 60:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds:.0f} s"
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler shared by every Streamlit session."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler().start()
+        return _scheduler
+
+
+def submit(kind, key, **params):
+    """Shortcut for ``get_scheduler().submit(kind, key, **params)``."""
+    return get_scheduler().submit(kind, key, **params)
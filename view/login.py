@@ -1,13 +1,21 @@
 import streamlit as st
-import paramiko
+import connection_pool
 
-def ssh_connect(ip_address, port, username, password):
-    """Establish SSH connection to MikroTik."""
+# Login choices: label -> (pool transport, default port)
+TRANSPORTS = {
+    "SSH": ("ssh", "22"),
+    "RouterOS API": ("api", "8728"),
+    "RouterOS API (TLS)": ("api-ssl", "8729"),
+}
+
+def ssh_connect(ip_address, port, username, password, transport="ssh"):
+    """Register the router in the shared connection pool and return its key.
+
+    ``transport`` is "ssh", or "api"/"api-ssl" to talk to the router over
+    the binary RouterOS API instead (backups still need SSH).
+    """
     try:
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        client.connect(ip_address, port=int(port), username=username, password=password)
-        return client
+        return connection_pool.get_pool().register(ip_address, port, username, password, transport)
     except Exception as e:
         return str(e)
 
@@ -16,8 +24,8 @@ def run():
     st.subheader("🔒 Login to MikroTik")
 
     # Ensure session state variables exist
-    if "ssh_client" not in st.session_state:
-        st.session_state["ssh_client"] = None
+    if "router" not in st.session_state:
+        st.session_state["router"] = None
     if "connection_status" not in st.session_state:
         st.session_state["connection_status"] = "🔴 Not connected"
 
@@ -26,19 +34,21 @@ def run():
 
     # User input fields
     ip_address = st.text_input("IP Address")
-    port = st.text_input("Port", value="22")
+    transport_label = st.radio("Connect with", list(TRANSPORTS), horizontal=True)
+    transport, default_port = TRANSPORTS[transport_label]
+    port = st.text_input("Port", value=default_port, key=f"port_{transport}")
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
 
     if st.button("Submit", key="login_button"):
         if ip_address and port and username and password:
             st.write(f"Connecting to `{ip_address}` on port `{port}`...")
-            connection = ssh_connect(ip_address, port, username, password)
+            connection = ssh_connect(ip_address, port, username, password, transport)
 
-            if isinstance(connection, paramiko.SSHClient):
+            if isinstance(connection, tuple):
                 st.success("✅ Connected successfully!")
-                st.session_state["ssh_client"] = connection  # Store connection in session
-                st.session_state["connection_status"] = f"🟢 Connected to {ip_address} on port {port}"
+                st.session_state["router"] = connection  # Store pool key, not the client itself
+                st.session_state["connection_status"] = f"🟢 Connected to {ip_address} on port {port} ({transport_label})"
                 st.session_state["mikrotik_ip"] = ip_address
                 st.session_state["mikrotik_port"] = port
                 st.session_state["currentPage"] = "Welcome"  # Redirect to Welcome page
@@ -3,12 +3,11 @@ import streamlit as st
 def run():
     st.header("Logout")
 
-    # Check if an SSH connection exists
-    if "ssh_client" in st.session_state and st.session_state["ssh_client"]:
+    # Check if this session is attached to a pooled router connection
+    if st.session_state.get("router"):
         try:
-            # Close the SSH connection
-            st.session_state["ssh_client"].close()
-            st.session_state["ssh_client"] = None  # Reset SSH client
+            # The transport is shared with other sessions; the pool reaps it once idle
+            st.session_state["router"] = None
             st.session_state["connection_status"] = "⚪ Not Connected"
             st.success("Disconnected from MikroTik successfully.")
         except Exception as e:
@@ -18,4 +17,4 @@ def run():
 
     # Redirect to login page
     st.session_state["currentPage"] = "Login"
-    st.rerun()
\ No newline at end of file
+    st.rerun()
@@ -1,5 +1,8 @@
+import os
 import streamlit as st
-import importlib
+import connection_pool
+import instrumentation
+import pages
 
 # Initialize session state
 if "currentPage" not in st.session_state:
@@ -10,64 +13,72 @@ if "connection_status" not in st.session_state:
 
 # Function to switch pages
 def change_page(page_name):
+    if page_name == "Logout":
+        st.session_state["connection_status"] = "⚪ Not Connected"
     st.session_state["currentPage"] = page_name
 
-# Sidebar Navigation
-st.sidebar.title("📌 Menu")
-
-st.sidebar.markdown(f"**{st.session_state['connection_status']}**")
+# The pool forgets logins left unused for hours; send the session back to the login page
+def session_expired():
+    st.session_state["router"] = None
+    st.session_state["connection_status"] = "🔴 Session expired"
+    st.session_state["session_expired"] = True
+    st.session_state["currentPage"] = "Login"
+    st.rerun()
 
-with st.sidebar.expander("🔒 Login", expanded=True):
-    if st.button("Connect"):
-        change_page("Login")
+router = st.session_state.get("router")
+if router and not connection_pool.get_pool().registered(router):
+    session_expired()
 
-with st.sidebar.expander("⚙️ Basic Configuration"):
-    if st.button("IP Configuration"):
-        change_page("IP Configuration")
-    if st.button("SSID & Password"):
-        change_page("SSID & Password")
-    if st.button("Firewall Filtering"):
-        change_page("Firewall Filtering")
-    if st.button("Bandwidth Fix"):
-        change_page("Bandwidth Fix")
-    if st.button("DNS Configuration"):
-        change_page("DNS Configuration")
-    # if st.button("Disable/Enable Interfaces"):
-    #     change_page("Disable/Enable Interfaces")
-    
-with st.sidebar.expander("🗂️ Backup Configuration"):
-    if st.button("Backup Configuration"):
-        change_page("Backup Configuration")
+# Sidebar Navigation, built from the page registry without importing any page
+st.sidebar.title("📌 Menu")
 
-with st.sidebar.expander("🚪 Logout"):
-    if st.button("Disconnect"):
-        st.session_state["connection_status"] = "⚪ Not Connected"
-        change_page("Logout")
+st.sidebar.markdown(f"**{st.session_state['connection_status']}**")
+io_summary = st.sidebar.empty()     # filled in once the page has rendered
 
-# Page Routing
-PAGES = {
-    "Login": "login",
-    "SSID & Password": "ssid_password",
-    "Firewall Filtering": "firewall_filtering",
-    "Bandwidth Fix": "fix_bandwidth",
-    # "Disable/Enable Interfaces": "disable_enable",
-    "Backup Configuration": "backup_configuration",
-    "Logout": "logout",
-    "Welcome": "welcome",
-    "IP Configuration": "ip_configuration",
-    "DNS Configuration":"dns"
-}
+for group, expanded, group_pages in pages.by_group():
+    with st.sidebar.expander(group, expanded=expanded):
+        for page in group_pages:
+            st.button(page.button, key=f"nav_{page.name}", on_click=change_page, args=(page.name,))
 
-# Load the selected page dynamically
+# Load the selected page; only its module is imported
 page_name = st.session_state["currentPage"]
+page = pages.PAGES.get(page_name)
 
-if page_name in PAGES:
+if page is not None:
     st.header(f"NetEZ - {page_name}")
-    try:
-        module = importlib.import_module(PAGES[page_name])
-        module.run()
-    except ModuleNotFoundError:
-        st.error(f"⚠️ Halaman **{page_name}** tidak ditemukan!")
+    if st.session_state.pop("session_expired", False):
+        st.warning("⌛ Your router session expired. Please log in again.")
+    if page.requires_login and not st.session_state.get("router"):
+        st.warning("❌ No connection detected. Please log in first.")
+    else:
+        with instrumentation.render(page_name) as render_stats:
+            try:
+                pages.load(page).run()
+            except connection_pool.SessionExpired:
+                session_expired()
+            except ModuleNotFoundError as e:
+                if e.name != page.module:
+                    raise
+                st.error(f"⚠️ Halaman **{page_name}** tidak ditemukan!")
+        io_summary.caption(instrumentation.summary(render_stats))
 else:
     st.header("You are at the **Main Page**")
-    st.write("Klik tombol di sidebar untuk berpindah ke halaman lain.")
\ No newline at end of file
+    st.write("Klik tombol di sidebar untuk berpindah ke halaman lain.")
+
+# Router I/O since the app started, with exports for dashboards
+with st.sidebar.expander("📊 Router I/O"):
+    for row in instrumentation.router_summary():
+        st.caption(f"`{row['router']}`: {row['commands']} commands, p50 {row['p50_ms']:.0f} ms, "
+                   f"p95 {row['p95_ms']:.0f} ms, {row['channels']} channels, {row['received'] / 1024:.0f} kB")
+    st.download_button("⬇️ Prometheus", instrumentation.prometheus(), "netez.prom", "text/plain")
+    st.download_button("⬇️ JSON", instrumentation.to_json(), "netez-metrics.json", "application/json")
+
+# Set NETEZ_METRICS_PORT to serve /metrics and /metrics.json for scrapers
+if os.environ.get("NETEZ_METRICS_PORT"):
+    instrumentation.serve(os.environ["NETEZ_METRICS_PORT"])
+
+# Set NETEZ_PROFILE=1 to see what each page cost to import
+if os.environ.get("NETEZ_PROFILE"):
+    with st.sidebar.expander("⏱️ Import times"):
+        for module, seconds in sorted(pages.import_times.items(), key=lambda item: -item[1]):
+            st.write(f"`{module}`: {seconds * 1000:.0f} ms")
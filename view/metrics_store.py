@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+import storage
+
+GROW_SERIES = 128         # rows are allocated (and files grown) in steps of this many series
+FLUSH_INTERVAL = 10.0     # seconds between memmap flushes
+EMPTY = np.iinfo(np.int32).min   # bucket id of a slot that was never written
+
+
+@dataclass(frozen=True)
+class Tier:
+    """One resolution of the store: ``step`` seconds per slot, ``capacity`` slots per series."""
+    name: str
+    step: int
+    capacity: int
+    rollup: bool           # keeps mean/max/count instead of the raw value
+
+
+# 1 s for an hour, 1 min for a week, 1 h for 90 days: about 160 KiB per series
+TIERS = (
+    Tier("1s", 1, 3600, False),
+    Tier("1m", 60, 7 * 24 * 60, True),
+    Tier("1h", 3600, 90 * 24, True),
+)
+MEAN, MAX, COUNT = 0, 1, 2
+
+
+class _TierArrays:
+    """Memory-mapped values plus the bucket id each slot currently holds, for one tier."""
+
+    def __init__(self, root, tier, rows):
+        self.tier = tier
+        self.fields = 3 if tier.rollup else 1
+        self.values_path = os.path.join(root, f"{tier.name}.values.f32")
+        self.buckets_path = os.path.join(root, f"{tier.name}.buckets.i32")
+        self.open(rows)
+
+    def open(self, rows):
+        self._extend(rows)      # finishes a grow that was interrupted before the last run ended
+        self.values, created = self._map(self.values_path, np.float32, (rows, self.tier.capacity, self.fields))
+        if created:
+            self.values[:] = np.nan
+        self.buckets, created = self._map(self.buckets_path, np.int32, (self.tier.capacity,))
+        if created:
+            self.buckets[:] = EMPTY
+
+    @staticmethod
+    def _map(path, dtype, shape):
+        """Map ``path``, creating it if missing or of the wrong size; return (array, created)."""
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        reuse = os.path.exists(path) and os.path.getsize(path) == size
+        return np.memmap(path, dtype=dtype, mode="r+" if reuse else "w+", shape=shape), not reuse
+
+    def grow(self, rows):
+        """Re-map the values with more rows, keeping existing data."""
+        self.flush()
+        del self.values
+        self._extend(rows)
+        self.values, _ = self._map(self.values_path, np.float32, (rows, self.tier.capacity, self.fields))
+
+    def _extend(self, rows):
+        """Append NaN rows to the values file in place until it holds ``rows`` rows.
+
+        Rows are the outermost axis, so existing data never moves and a
+        crash part way leaves it intact; a partly written row is cut off
+        and written again.
+        """
+        if not os.path.exists(self.values_path):
+            return
+        row = np.full(self.tier.capacity * self.fields, np.nan, dtype=np.float32).tobytes()
+        size = os.path.getsize(self.values_path)
+        whole = size - size % len(row)
+        if whole >= rows * len(row):
+            return
+        with open(self.values_path, "r+b") as file:
+            file.truncate(whole)
+            file.seek(whole)
+            for _ in range(rows - whole // len(row)):
+                file.write(row)
+
+    def claim(self, bucket):
+        """Return the slot for ``bucket``, clearing it if it still holds an older bucket.
+
+        Slots follow the sample's own timestamp, so frames the monitor
+        threads deliver out of order still land in their bucket. Only a
+        sample at least a whole ring older than the slot's bucket is
+        dropped (its slot has been reused); that returns None.
+        """
+        slot = bucket % self.tier.capacity
+        held = self.buckets[slot]
+        if held > bucket:
+            return None
+        if held != bucket:
+            self.values[:, slot] = np.nan
+            self.buckets[slot] = bucket
+        return slot
+
+    def flush(self):
+        self.values.flush()
+        self.buckets.flush()
+
+
+class MetricsStore:
+    """Ring-buffered time series with 1 s / 1 min / 1 h rollups, persisted as memmaps.
+
+    Each tier is a ``(series, slots)`` float32 array. A sample at time
+    ``t`` lands in slot ``bucket % capacity`` where ``bucket = (t - base) //
+    step``; one bucket id per slot tells current slots from ones the ring
+    has not reached yet, and NaN marks series with no sample in a slot.
+    Whole frames are written with one vectorised update per tier.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta_path = os.path.join(root, "series.json")
+        meta = {"base": int(time.time()), "names": [], "rows": GROW_SERIES}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as file:
+                meta = json.load(file)
+        self.base = meta["base"]
+        self.names = meta["names"]
+        self.rows = meta["rows"]
+        self.index = {name: row for row, name in enumerate(self.names)}
+        self.tiers = {tier.name: _TierArrays(root, tier, self.rows) for tier in TIERS}
+        self._last_flush = time.monotonic()
+
+    def _save_meta(self):
+        temp = self._meta_path + ".tmp"
+        with open(temp, "w") as file:
+            json.dump({"base": self.base, "names": self.names, "rows": self.rows}, file)
+        os.replace(temp, self._meta_path)
+
+    def _rows_for(self, names):
+        added = False
+        for name in names:
+            if name not in self.index:
+                self.index[name] = len(self.names)
+                self.names.append(name)
+                added = True
+        if len(self.names) > self.rows:
+            self.rows = -(-len(self.names) // GROW_SERIES) * GROW_SERIES
+            # Record the new size first: on start-up a shorter file is extended, never wiped
+            self._save_meta()
+            for arrays in self.tiers.values():
+                arrays.grow(self.rows)
+        if added:
+            self._save_meta()
+        return np.fromiter((self.index[name] for name in names), dtype=np.intp, count=len(names))
+
+    def record(self, timestamp, samples):
+        """Store one frame: ``samples`` maps series name to value, all taken at ``timestamp``."""
+        if not samples:
+            return
+        with self._lock:
+            rows = self._rows_for(list(samples))
+            values = np.fromiter(samples.values(), dtype=np.float32, count=len(samples))
+            for arrays in self.tiers.values():
+                slot = arrays.claim(int((timestamp - self.base) // arrays.tier.step))
+                if slot is None:
+                    continue
+                if not arrays.tier.rollup:
+                    arrays.values[rows, slot, 0] = values
+                    continue
+                current = arrays.values[rows, slot]
+                fresh = np.isnan(current[:, COUNT])
+                count = np.where(fresh, 0, current[:, COUNT]) + 1
+                mean = np.where(fresh, values, current[:, MEAN] + (values - current[:, MEAN]) / count)
+                peak = np.where(fresh, values, np.maximum(current[:, MAX], values))
+                arrays.values[rows, slot] = np.stack([mean, peak, count], axis=1)
+            if time.monotonic() - self._last_flush > FLUSH_INTERVAL:
+                self.flush()
+
+    def query(self, name, tier="1s", seconds=300, now=None):
+        """Samples of ``name`` from the last ``seconds`` at ``tier`` resolution.
+
+        Returns ``(timestamps, values)`` arrays in time order; for rollup
+        tiers ``values`` has ``mean`` and ``max`` columns. Missing slots are
+        left out.
+        """
+        arrays = self.tiers[tier]
+        step, capacity = arrays.tier.step, arrays.tier.capacity
+        columns = 2 if arrays.tier.rollup else 1
+        with self._lock:
+            row = self.index.get(name)
+            if row is None:
+                return np.empty(0), np.empty((0, columns), dtype=np.float32)
+            last = int(((now or time.time()) - self.base) // step)
+            wanted = np.arange(last - min(seconds // step, capacity) + 1, last + 1)
+            slots = wanted % capacity
+            values = np.array(arrays.values[row, slots, :columns])
+            valid = (arrays.buckets[slots] == wanted) & ~np.isnan(values[:, 0])
+        return self.base + wanted[valid] * step, values[valid]
+
+    def latest(self, names, seconds=5):
+        """Most recent 1 s value of each series within ``seconds`` (missing series are skipped)."""
+        result = {}
+        for name in names:
+            _, values = self.query(name, "1s", seconds)
+            if len(values):
+                result[name] = float(values[-1, 0])
+        return result
+
+    def series(self, prefix=""):
+        with self._lock:
+            return [name for name in self.names if name.startswith(prefix)]
+
+    def size_bytes(self):
+        return sum(arrays.values.nbytes + arrays.buckets.nbytes for arrays in self.tiers.values())
+
+    def flush(self):
+        for arrays in self.tiers.values():
+            arrays.flush()
+        self._last_flush = time.monotonic()
+
+
+def tier_for(seconds):
+    """Finest tier that covers ``seconds`` of history."""
+    for tier in TIERS:
+        if seconds <= tier.step * tier.capacity:
+            return tier.name
+    return TIERS[-1].name
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(router_id):
+    """Process-wide metrics store for one router, opened from disk on first use."""
+    with _stores_lock:
+        store = _stores.get(router_id)
+        if store is None:
+            store = _stores[router_id] = MetricsStore(storage.data_dir("metrics", router_id.replace(":", "_")))
+        return store
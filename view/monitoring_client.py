@@ -1,11 +1,138 @@
+import time
+import pandas as pd
 import streamlit as st
+import accounting
+import metrics_store
+import storage
+import traffic_monitor
 
-st.title("Monitoring Client")
+REFRESH_SECONDS = 1.0
+RANGES = {"5 minutes": 300, "1 hour": 3600, "1 day": 86400, "1 week": 7 * 86400, "90 days": 90 * 86400}
 
-client_id = st.selectbox("Pilih Client yang ingin dimonitor", ["Client 1", "Client 2", "Client 3", "Client 4"])
+def format_bps(bits):
+    for unit, size in (("Gbps", 1e9), ("Mbps", 1e6), ("kbps", 1e3)):
+        if bits >= size:
+            return f"{bits / size:.1f} {unit}"
+    return f"{bits:.0f} bps"
 
-st.write(f"Monitoring status untuk {client_id}:")
-st.write("Data monitoring ditampilkan di sini.")
+def history_chart(store, prefix, fields, seconds):
+    """Line chart of ``prefix/<field>`` series in Mbps, at the finest tier covering ``seconds``."""
+    tier = metrics_store.tier_for(seconds)
+    columns = {}
+    for field, label in fields:
+        timestamps, values = store.query(f"{prefix}/{field}", tier, seconds)
+        columns[label] = pd.Series(values[:, 0] / 1e6, index=pd.to_datetime(timestamps, unit="s"))
+    frame = pd.DataFrame(columns)
+    if frame.empty:
+        st.caption("No history yet.")
+        return
+    st.line_chart(frame)
 
-if st.button("Refresh Data"):
-    st.success(f"Data client {client_id} berhasil diperbarui.")
+def show_interfaces(snapshot, store, seconds):
+    latest = snapshot["interfaces"]
+    if not latest:
+        st.info("Waiting for the first traffic sample...")
+        return
+    st.dataframe(
+        [
+            {"Interface": name, "RX": format_bps(s["rx"]), "TX": format_bps(s["tx"]),
+             "RX pkt/s": s["rx_pps"], "TX pkt/s": s["tx_pps"]}
+            for name, s in sorted(latest.items())
+        ],
+        width="stretch",
+    )
+    busiest = sorted(latest, key=lambda name: latest[name]["rx"] + latest[name]["tx"], reverse=True)
+    selected = st.multiselect("Chart interfaces", sorted(latest), default=busiest[:3], key="monitor_interfaces")
+    for name in selected:
+        st.caption(name)
+        history_chart(store, f"interface/{name}", [("rx", "RX (Mbps)"), ("tx", "TX (Mbps)")], seconds)
+
+def show_queues(snapshot, store, seconds):
+    latest = snapshot["queues"]
+    if not latest:
+        st.info("No simple queues reported yet.")
+        return
+    rows = sorted(latest.items(), key=lambda item: item[1]["up"] + item[1]["down"], reverse=True)
+    st.dataframe(
+        [
+            {"Queue": name, "Target": s["target"], "Upload": format_bps(s["up"]),
+             "Download": format_bps(s["down"]), "Total Bytes": s["bytes_up"] + s["bytes_down"]}
+            for name, s in rows
+        ],
+        width="stretch",
+    )
+    selected = st.selectbox("Chart client", [name for name, _ in rows], key="monitor_queue")
+    if selected:
+        history_chart(store, f"queue/{selected}", [("up", "Upload (Mbps)"), ("down", "Download (Mbps)")], seconds)
+
+def format_bytes(count):
+    for unit, size in (("GB", 1e9), ("MB", 1e6), ("kB", 1e3)):
+        if count >= size:
+            return f"{count / size:.1f} {unit}"
+    return f"{count:.0f} B"
+
+def usage_table(usages):
+    if not usages:
+        st.caption("No traffic yet.")
+        return
+    st.dataframe(
+        [
+            {"Queue": u.name, "Target": u.target, "Upload": format_bps(u.rate_up),
+             "Download": format_bps(u.rate_down), "Sent": format_bytes(u.total_up),
+             "Received": format_bytes(u.total_down)}
+            for u in usages
+        ],
+        width="stretch",
+    )
+
+def show_top_talkers(accountant):
+    count = st.slider("Top clients", 5, 50, accounting.TOP_N, key="monitor_top_n")
+    basis = st.radio("Rank by", ["Current rate", "Total since monitoring started"], horizontal=True,
+                     key="monitor_top_basis")
+    top = accountant.top if basis == "Current rate" else accountant.top_totals
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**⬇️ Download**")
+        usage_table(top(count, "down"))
+    with col2:
+        st.markdown("**⬆️ Upload**")
+        usage_table(top(count, "up"))
+
+def render(router, seconds):
+    monitor = traffic_monitor.get_monitor(router)
+    accountant = accounting.get_accountant(router, monitor)
+    store = metrics_store.get_store(storage.router_id(router))
+    snapshot = monitor.snapshot()
+    if monitor.error:
+        st.warning(f"⚠️ Stream interrupted, reconnecting: {monitor.error}")
+    tab1, tab2, tab3 = st.tabs(["Interfaces", "Clients (Queues)", "Top Talkers"])
+    with tab1:
+        show_interfaces(snapshot, store, seconds)
+    with tab2:
+        show_queues(snapshot, store, seconds)
+    with tab3:
+        show_top_talkers(accountant)
+
+def run():
+    st.header("📈 Traffic Monitoring")
+
+    router = st.session_state.get("router")
+    if not router:
+        st.warning("❌ No connection detected. Please log in first.")
+        return
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        live = st.toggle("Live (1 s)", value=True)
+    with col2:
+        seconds = RANGES[st.selectbox("History", list(RANGES))]
+    fragment = getattr(st, "fragment", None)
+    if live and fragment is not None:
+        # Only this part reruns every second; the rest of the page stays put
+        fragment(run_every=REFRESH_SECONDS)(render)(router, seconds)
+        return
+
+    render(router, seconds)
+    if live:
+        time.sleep(REFRESH_SECONDS)
+        st.rerun()
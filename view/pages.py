@@ -0,0 +1,68 @@
+import importlib
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Page:
+    """A page of the app, described without importing its module."""
+    name: str                   # key stored in ``st.session_state["currentPage"]``
+    module: str
+    group: str = None           # sidebar expander; None keeps the page out of the sidebar
+    label: str = None           # sidebar button text, defaults to ``name``
+    requires_login: bool = False
+
+    @property
+    def button(self):
+        return self.label or self.name
+
+
+# Sidebar expanders in display order, with whether each starts open
+GROUPS = [
+    ("🔒 Login", True),
+    ("⚙️ Basic Configuration", False),
+    ("📈 Monitoring", False),
+    ("🌐 Fleet", False),
+    ("🗂️ Backup Configuration", False),
+    ("🚪 Logout", False),
+]
+
+REGISTRY = [
+    Page("Login", "login", "🔒 Login", label="Connect"),
+    Page("IP Configuration", "ip_configuration", "⚙️ Basic Configuration", requires_login=True),
+    Page("SSID & Password", "ssid_password", "⚙️ Basic Configuration", requires_login=True),
+    Page("Firewall Filtering", "firewall_filtering", "⚙️ Basic Configuration", requires_login=True),
+    Page("Bandwidth Fix", "fix_bandwidth", "⚙️ Basic Configuration", requires_login=True),
+    Page("DNS Configuration", "dns", "⚙️ Basic Configuration", requires_login=True),
+    Page("Apply Configuration", "apply_config", "⚙️ Basic Configuration", requires_login=True),
+    # Page("Disable/Enable Interfaces", "disable_enable", "⚙️ Basic Configuration", requires_login=True),
+    Page("Traffic Monitoring", "monitoring_client", "📈 Monitoring", requires_login=True),
+    Page("Background Jobs", "job_panel", "📈 Monitoring", requires_login=True),
+    Page("Fleet Operations", "fleet_operations", "🌐 Fleet"),
+    Page("Backup Configuration", "backup_configuration", "🗂️ Backup Configuration", requires_login=True),
+    Page("Configuration History", "config_history", "🗂️ Backup Configuration", requires_login=True),
+    Page("Logout", "logout", "🚪 Logout", label="Disconnect"),
+    Page("Welcome", "welcome"),
+]
+
+PAGES = {page.name: page for page in REGISTRY}
+
+# Seconds each page module took to import the first time, for the profiler
+import_times = {}
+
+
+def by_group():
+    """Sidebar layout: ``[(group, expanded, [pages...]), ...]`` in ``GROUPS`` order."""
+    return [(group, expanded, [page for page in REGISTRY if page.group == group]) for group, expanded in GROUPS]
+
+
+def load(page):
+    """Import a page's module on first use and return it.
+
+    Only the page being shown is imported, so the heavy dependencies of
+    other pages (numpy, pandas, paramiko, ...) stay unloaded.
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(page.module)
+    import_times.setdefault(page.module, time.perf_counter() - start)
+    return module
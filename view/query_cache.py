@@ -0,0 +1,112 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+DEFAULT_TTL = 30          # seconds a read stays fresh unless a write invalidates it
+MAX_ENTRIES = 128         # cached queries kept per router before LRU eviction
+
+# Verbs that only read state. Any other command, including ones with a verb
+# not listed here, is treated as a write to its menu.
+READ_VERBS = {"print", "get", "export", "find", "monitor", "monitor-traffic"}
+WRITE_VERBS = {
+    "add", "remove", "set", "unset", "enable", "disable", "move", "comment", "edit",
+    "reset", "reset-counters", "reset-counters-all", "save", "load", "import", "run",
+}
+
+# Menus whose output also changes when another menu is written to
+DEPENDENCIES = {
+    ("interface",): [("ip", "address")],
+}
+
+
+def split_command(command):
+    """Return ``(menu_path, verb)`` for a CLI command like ``/ip address print terse``."""
+    path = []
+    for word in command.strip().lstrip("/").split():
+        word = word.strip("/")
+        if word in READ_VERBS or word in WRITE_VERBS:
+            return tuple(path), word
+        if "=" in word or word.startswith(("[", '"', ":")):
+            break
+        path.append(word)
+    return tuple(path), ""
+
+
+def is_write(command):
+    command = command.strip()
+    if not command.startswith("/"):
+        return False
+    path, verb = split_command(command)
+    return bool(path or verb) and verb not in READ_VERBS
+
+
+def _related(cached_path, written_path):
+    shorter = min(len(cached_path), len(written_path))
+    return cached_path[:shorter] == written_path[:shorter]
+
+
+class QueryCache:
+    """LRU cache of read-only query results for one router, with per-entry TTLs."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, menu_path, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, menu_path, value, ttl=DEFAULT_TTL):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, menu_path, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, written_path):
+        """Drop every entry whose menu is ``written_path``, above it or below it."""
+        paths = [written_path] + DEPENDENCIES.get(written_path[:1], [])
+        with self._lock:
+            stale = [key for key, (_, cached, _) in self._entries.items()
+                     if any(_related(cached, path) for path in paths)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# One cache per live client; a reconnect creates a new client and so a fresh cache
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def cache_for(client):
+    with _caches_lock:
+        cache = _caches.get(client)
+        if cache is None:
+            cache = _caches[client] = QueryCache()
+        return cache
+
+
+def invalidate(client, command):
+    """Invalidate cached reads affected by ``command`` if it is a write."""
+    if is_write(command):
+        cache_for(client).invalidate(split_command(command)[0])
+
+
+def clear(client):
+    cache_for(client).clear()
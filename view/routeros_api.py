@@ -0,0 +1,316 @@
+import hashlib
+import itertools
+import socket
+import ssl
+import threading
+
+API_PORT = 8728
+API_SSL_PORT = 8729
+CONNECT_TIMEOUT = 10
+REPLY_TIMEOUT = 15         # seconds ``talk`` waits for a ``!done``
+READ_SIZE = 65536
+
+
+class ApiError(Exception):
+    """The router answered a request with ``!trap``."""
+
+    def __init__(self, message, category=None):
+        super().__init__(message)
+        self.category = category
+
+
+class ApiConnectionError(ConnectionError):
+    """The API connection failed, was closed or the router sent ``!fatal``."""
+
+
+# -- wire format ---------------------------------------------------------------
+
+def encode_length(length):
+    """Length prefix of one API word: 1 to 5 bytes, the high bits of the first saying how many."""
+    if length < 0x80:
+        return bytes((length,))
+    if length < 0x4000:
+        return (length | 0x8000).to_bytes(2, "big")
+    if length < 0x200000:
+        return (length | 0xC00000).to_bytes(3, "big")
+    if length < 0x10000000:
+        return (length | 0xE0000000).to_bytes(4, "big")
+    return b"\xF0" + length.to_bytes(4, "big")
+
+
+def _decode_length(buffer, position):
+    """Return ``(length, prefix size)``, or ``(None, 0)`` if the prefix is not complete yet."""
+    if position >= len(buffer):
+        return None, 0
+    first = buffer[position]
+    if first < 0x80:
+        return first, 1
+    if first < 0xC0:
+        size, mask = 2, 0x3FFF
+    elif first < 0xE0:
+        size, mask = 3, 0x1FFFFF
+    elif first < 0xF0:
+        size, mask = 4, 0x0FFFFFFF
+    else:
+        size, mask = 5, 0xFFFFFFFF
+    if position + size > len(buffer):
+        return None, 0
+    if size == 5:
+        return int.from_bytes(buffer[position + 1:position + 5], "big"), 5
+    return int.from_bytes(buffer[position:position + size], "big") & mask, size
+
+
+def encode_sentence(words):
+    """Encode a sentence: every word length-prefixed, then the empty word that ends it."""
+    data = bytearray()
+    for word in words:
+        raw = word.encode()
+        data += encode_length(len(raw))
+        data += raw
+    data += b"\x00"
+    return bytes(data)
+
+
+class SentenceReader:
+    """Incremental decoder: feed it received bytes, get back every completed sentence."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._words = []
+
+    def feed(self, data):
+        buffer = self._buffer
+        buffer += data
+        sentences = []
+        position = 0
+        while True:
+            length, size = _decode_length(buffer, position)
+            if length is None or position + size + length > len(buffer):
+                break
+            start = position + size
+            position = start + length
+            if length:
+                self._words.append(buffer[start:position].decode(errors="replace"))
+            else:
+                sentences.append(self._words)
+                self._words = []
+        del buffer[:position]
+        return sentences
+
+
+def parse_reply(words):
+    """Split a reply sentence into ``(reply word, tag, {attribute: value})``."""
+    attrs = {}
+    tag = None
+    for word in words[1:]:
+        if word[:1] == "=":
+            key, _, value = word[1:].partition("=")
+            attrs[key] = value
+        elif word.startswith(".tag="):
+            tag = word[5:]
+    return (words[0] if words else ""), tag, attrs
+
+
+# -- client --------------------------------------------------------------------
+
+class Request:
+    """A sent sentence and the replies collected for it so far."""
+
+    def __init__(self, tag, words, on_row=None):
+        self.tag = tag
+        self.words = words
+        self.rows = []
+        self.ret = None            # ``=ret=`` of the ``!done`` reply, e.g. the id of an added item
+        self.error = None
+        self.received = 0          # reply bytes, for instrumentation
+        self.on_row = on_row
+        self.done = threading.Event()
+
+    def result(self, timeout=REPLY_TIMEOUT):
+        """Wait for ``!done`` and return the ``!re`` rows; raise for ``!trap`` or a dead connection."""
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"no reply to {self.words[0]} after {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.rows
+
+
+class ApiClient:
+    """One persistent connection to the RouterOS API (``api``/``api-ssl`` service).
+
+    Every request carries a ``.tag`` so any number of them can be in flight
+    on the socket at once: ``pipeline`` sends a whole list in one write and
+    a reader thread routes each reply to its request. Replies are already
+    structured (one attribute dict per ``!re``), so nothing is scraped from
+    CLI text. Used wherever the pool hands out a client; ``is_api`` lets
+    the executor pick the API path instead of SSH channels.
+    """
+
+    is_api = True
+
+    def __init__(self, host, port=API_PORT, use_tls=False, timeout=CONNECT_TIMEOUT):
+        self.host = host
+        self.port = int(port)
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.address = f"{host}:{port}"
+        self._sock = None
+        self._tags = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()          # guards _pending and socket writes
+        self._closed = threading.Event()
+        self._reader = None
+
+    def connect(self, username, password):
+        """Open the socket, start the reader and log in."""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if self.use_tls:
+            # Routers ship self-signed certificates, like the SSH host keys the pool auto-accepts
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=self.host)
+        sock.settimeout(None)
+        self._sock = sock
+        host, port = sock.getpeername()[:2]
+        self.address = f"{host}:{port}"
+        self._reader = threading.Thread(target=self._read_loop, name=f"routeros-api-{self.address}", daemon=True)
+        self._reader.start()
+        try:
+            self._login(username, password)
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def _login(self, username, password):
+        request = self.submit(["/login", f"=name={username}", f"=password={password}"])
+        request.result(self.timeout)
+        if request.ret:
+            # RouterOS before 6.43 answers with an MD5 challenge instead of logging in
+            challenge = bytes.fromhex(request.ret)
+            digest = hashlib.md5(b"\x00" + password.encode() + challenge).hexdigest()
+            self.talk(["/login", f"=name={username}", f"=response=00{digest}"], self.timeout)
+
+    def is_active(self):
+        return self._sock is not None and not self._closed.is_set()
+
+    def close(self):
+        self._closed.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+        self._fail_all(ApiConnectionError("API connection closed"))
+
+    def open_sftp(self):
+        raise ApiConnectionError("File transfer needs SSH; log in to this router over SSH to use backups.")
+
+    # -- requests ----------------------------------------------------------
+
+    def pipeline(self, sentences, on_row=None):
+        """Send every sentence in one write and return their ``Request``s, in order."""
+        if not self.is_active():
+            raise ApiConnectionError("API connection closed")
+        requests = []
+        data = bytearray()
+        with self._lock:
+            for words in sentences:
+                request = Request(str(next(self._tags)), words, on_row)
+                self._pending[request.tag] = request
+                requests.append(request)
+                data += encode_sentence([*words, f".tag={request.tag}"])
+            try:
+                self._sock.sendall(data)
+            except OSError as e:
+                for request in requests:
+                    self._pending.pop(request.tag, None)
+                raise ApiConnectionError(str(e)) from e
+        return requests
+
+    def submit(self, words, on_row=None):
+        """Send one sentence without waiting; ``on_row`` receives ``!re`` rows as they arrive."""
+        return self.pipeline([words], on_row)[0]
+
+    def talk(self, words, timeout=REPLY_TIMEOUT):
+        """Send one sentence and return its ``!re`` rows as attribute dicts."""
+        return self.submit(words).result(timeout)
+
+    def cancel(self, request):
+        """Stop a long-running request such as ``monitor-traffic``."""
+        if not request.done.is_set() and self.is_active():
+            self.submit(["/cancel", f"=tag={request.tag}"])
+
+    # -- reader ------------------------------------------------------------
+
+    def _read_loop(self):
+        reader = SentenceReader()
+        error = ApiConnectionError("API connection closed by the router")
+        try:
+            while True:
+                data = self._sock.recv(READ_SIZE)
+                if not data:
+                    break
+                for sentence in reader.feed(data):
+                    self._dispatch(sentence, sum(len(word) + 1 for word in sentence) + 1)
+        except OSError as e:
+            error = ApiConnectionError(str(e))
+        except ApiConnectionError as e:
+            error = e
+        except Exception as e:
+            error = ApiConnectionError(f"API reader failed: {e!r}")
+        finally:
+            # Whatever stopped the reader, nothing more will be answered on this connection
+            self._closed.set()
+            self._fail_all(error)
+
+    def _dispatch(self, sentence, size):
+        kind, tag, attrs = parse_reply(sentence)
+        if kind == "!fatal":
+            raise ApiConnectionError(next(iter(attrs.values()), None) or " ".join(sentence[1:]) or "!fatal")
+        with self._lock:
+            request = self._pending.get(tag)
+        if request is None:
+            return
+        request.received += size
+        if kind == "!re":
+            if request.on_row is not None:
+                try:
+                    request.on_row(attrs)
+                except Exception as e:
+                    # A failing callback ends its own request, not the connection
+                    request.error = e
+                    with self._lock:
+                        self._pending.pop(tag, None)
+                    self.cancel(request)
+                    request.done.set()
+            else:
+                request.rows.append(attrs)
+        elif kind == "!trap":
+            # ``!done`` still follows; keep the first error
+            if request.error is None:
+                request.error = ApiError(attrs.get("message", "command failed"), attrs.get("category"))
+        elif kind == "!done":
+            request.ret = attrs.get("ret")
+            with self._lock:
+                self._pending.pop(tag, None)
+            request.done.set()
+
+    def _fail_all(self, error):
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for request in pending:
+            if request.error is None:
+                request.error = error
+            request.done.set()
+
+
+def connect(host, port, username, password, use_tls=None, timeout=CONNECT_TIMEOUT):
+    """Open a logged-in ``ApiClient``; TLS defaults on for the api-ssl port."""
+    if use_tls is None:
+        use_tls = int(port) == API_SSL_PORT
+    return ApiClient(host, port, use_tls, timeout).connect(username, password)
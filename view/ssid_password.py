@@ -1,15 +1,14 @@
 import streamlit as st
-
-def execute_command(client, command):
-    stdin, stdout, stderr = client.exec_command(command)
-    return stdout.channel.recv_exit_status(), stdout.read().decode().strip(), stderr.read().decode().strip()
+import executor
+import job_panel
+import jobs
 
 def get_current_wifi_settings(client):
     ssid_cmd = "/interface wireless get wlan1 ssid"
     password_cmd = "/interface wireless security-profiles print terse"
 
-    _, ssid_output, ssid_error = execute_command(client, ssid_cmd)
-    _, password_output, password_error = execute_command(client, password_cmd)
+    ssid_output = executor.execute(client, ssid_cmd).output
+    password_output = executor.execute(client, password_cmd).output
 
     ssid = ssid_output if ssid_output else "❌ Unable to retrieve SSID"
     
@@ -22,32 +21,35 @@ def get_current_wifi_settings(client):
     
     return ssid, password
 
-def change_ssid(client, new_ssid):
-    command = f"/interface wireless set wlan1 ssid={new_ssid}"
-    _, _, error = execute_command(client, command)
-    if error:
-        st.error(f"❌ Failed to change SSID: {error}")
-    else:
-        st.success(f"✅ SSID changed to {new_ssid}")
+RESTART_WIRELESS_COMMANDS = [
+    "/interface wireless disable wlan1",
+    "/interface wireless enable wlan1",
+]
+
+def ssid_command(new_ssid):
+    return f"/interface wireless set wlan1 ssid={executor.quote(new_ssid)}"
 
-def change_password(client, new_password):
-    command = f"/interface wireless security-profiles set [find default=yes] mode=dynamic-keys authentication-types=wpa2-psk wpa2-pre-shared-key={new_password}"
-    _, _, error = execute_command(client, command)
-    if error:
-        st.error(f"❌ Failed to change WiFi password: {error}")
-    else:
-        st.success("✅ WiFi password changed successfully!")
+def password_command(new_password):
+    return ("/interface wireless security-profiles set [find default=yes] mode=dynamic-keys "
+            f"authentication-types=wpa2-psk wpa2-pre-shared-key={executor.quote(new_password)}")
 
-def restart_wireless(client):
-    execute_command(client, "/interface wireless disable wlan1")
-    execute_command(client, "/interface wireless enable wlan1")
-    st.success("🔄 Wireless restarted to apply changes.")
+def wifi_job(client, job, ssid=None, password=None):
+    """Background job: change SSID and/or password and restart wireless in one round trip."""
+    commands = ([ssid_command(ssid)] if ssid else []) + ([password_command(password)] if password else [])
+    job.progress(0, 1, "Applying and restarting wireless")
+    results = executor.execute_batch(client, commands + RESTART_WIRELESS_COMMANDS, stop_on_error=True)
+    failed = [result for result in results if not result.ok]
+    if failed:
+        raise RuntimeError(failed[0].error or "changes not applied")
+    job.progress(1, 1, "Wireless restarted")
+    changed = " and ".join(part for part, value in (("SSID", ssid), ("password", password)) if value)
+    return f"{changed} changed, wireless restarted"
 
 def run():
     st.header("🔧 WiFi SSID & Password Settings")
     
-    client = st.session_state.get("ssh_client")
-    if not client:
+    router = st.session_state.get("router")
+    if not router:
         st.warning("❌ No connection detected. Please log in first.")
         return
     
@@ -61,12 +63,11 @@ def run():
     new_password = st.text_input("Enter New WiFi Password:", placeholder="New Password", type="password")
 
     if st.button("Apply Changes"):
-        if new_ssid:
-            change_ssid(client, new_ssid)
-        if new_password:
-            change_password(client, new_password)
-        restart_wireless(client)
-        st.success("✅ Changes applied successfully!")
+        if new_ssid or new_password:
+            jobs.submit("wifi", router, ssid=new_ssid or None, password=new_password or None)
+        else:
+            st.warning("⚠️ Enter a new SSID or password.")
+    job_panel.show_jobs(router, kinds=["wifi"])
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
@@ -0,0 +1,20 @@
+import os
+
+DATA_DIR_ENV = "NETEZ_DATA_DIR"
+
+
+def data_dir(*parts):
+    """Return (and create) a directory under the app's local data folder.
+
+    Defaults to ``~/.netez``; set ``NETEZ_DATA_DIR`` to move it.
+    """
+    base = os.environ.get(DATA_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".netez")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def router_id(router):
+    """Stable identifier for a pooled router key ``(host, port, username)``."""
+    host, port = router[0], router[1]
+    return f"{host}:{port}"
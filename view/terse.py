@@ -0,0 +1,231 @@
+import re
+
+# " 12 XD name=foo comment="a \"quoted\" value" ..." -> index, flags, then key=value pairs
+_HEAD_RE = re.compile(r"\s*(\d+)((?:\s+[A-Z*]+)*)\s+(?=[\w.\-]+=)")
+_PAIR_RE = re.compile(r'([\w.\-]+)=("(?:[^"\\]|\\.)*"|\S*)')
+# A run of ``\XX`` byte escapes (UTF-8 text, e.g. ``\C3\A9``) or one ``\`` plus a character
+_ESCAPE_RE = re.compile(r"((?:\\[0-9A-Fa-f]{2})+)|\\(.)")
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "a": "\a", "b": "\b", "f": "\f", "v": "\v", "_": " "}
+
+FLAG_NAMES = {
+    "X": "Disabled",
+    "D": "Dynamic",
+    "I": "Invalid",
+    "R": "Running",
+    "S": "Slave",
+}
+
+
+def _unescape_match(match):
+    if match.group(1):
+        data = bytes.fromhex(match.group(1).replace("\\", ""))
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return data.decode("latin-1")
+    code = match.group(2)
+    return _ESCAPES.get(code, code)
+
+
+def unquote(value):
+    """Turn a RouterOS value token into its plain string."""
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+        if "\\" in value:
+            value = _ESCAPE_RE.sub(_unescape_match, value)
+    return value
+
+
+class TerseRecord:
+    """One row of ``print terse`` output: item number, flag letters and attributes.
+
+    Records made by ``parse_line`` keep their line and tokenize it the
+    first time an attribute is read, so rows that are only counted,
+    filtered on their flags or never looked at are not tokenized at all.
+    """
+
+    __slots__ = ("index", "flags", "_attrs", "_line")
+
+    def __init__(self, index, flags, attrs, line=None):
+        self.index = index
+        self.flags = flags
+        self._attrs = attrs
+        self._line = line
+
+    @property
+    def attrs(self):
+        if self._attrs is None:
+            self._attrs = _tokenize(self._line)
+        return self._attrs
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def __contains__(self, key):
+        return key in self.attrs
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.index}, {self.flags!r}, {self.attrs!r})"
+
+    @property
+    def disabled(self):
+        return "X" in self.flags
+
+    @property
+    def dynamic(self):
+        return "D" in self.flags
+
+    @property
+    def status(self):
+        """Human readable status taken from the first meaningful flag."""
+        for flag in self.flags:
+            if flag in ("X", "D", "I"):
+                return FLAG_NAMES[flag]
+        return "Active"
+
+
+class AddressRecord(TerseRecord):
+    """Row of ``/ip address print terse``."""
+
+    __slots__ = ()
+
+    address = property(lambda self: self.get("address", ""))
+    network = property(lambda self: self.get("network", ""))
+    interface = property(lambda self: self.get("interface", ""))
+
+
+class InterfaceRecord(TerseRecord):
+    """Row of ``/interface print terse``."""
+
+    __slots__ = ()
+
+    name = property(lambda self: self.get("name", ""))
+    type = property(lambda self: self.get("type", ""))
+
+    @property
+    def running(self):
+        return "R" in self.flags
+
+
+class QueueRecord(TerseRecord):
+    """Row of ``/queue simple print terse``."""
+
+    __slots__ = ()
+
+    name = property(lambda self: self.get("name", ""))
+    max_limit = property(lambda self: self.get("max-limit", ""))
+
+    @property
+    def target(self):
+        """First target without the ``/32`` host suffix."""
+        target = self.get("target", "").split(",")[0]
+        return target[:-3] if target.endswith("/32") else target
+
+
+def _tokenize_regex(line):
+    """Regex tokenizer for lines the fast path cannot split safely."""
+    head = _HEAD_RE.match(line)
+    if head is None:
+        return {}
+    return {key: unquote(value) if value[:1] == '"' else _decode(value)
+            for key, value in _PAIR_RE.findall(line, head.end())}
+
+
+def _restore(text):
+    return text.replace("\x01", "\\\\").replace("\x02", '\\"')
+
+
+def _decode(text):
+    """Plain value of a token whose escaped backslashes and quotes were masked."""
+    if "\\" in text:
+        text = _ESCAPE_RE.sub(_unescape_match, text)
+    return text.replace("\x01", "\\").replace("\x02", '"')
+
+
+def _tokenize(line):
+    """The ``key=value`` attributes of a terse line as a dict of plain values.
+
+    Lines are tokenized with plain ``str.split``: once escaped backslashes
+    and quotes are masked, splitting on ``"`` leaves unquoted text at even
+    positions and quoted values at odd ones. The unquoted text is split
+    into words in one go, and each quoted value is then filled in under the
+    ``key=`` word right before it. Anything irregular falls back to the
+    regex tokenizer.
+    """
+    escaped = "\\" in line
+    if escaped:
+        line = line.replace("\\\\", "\x01").replace('\\"', "\x02")
+    segments = line.split('"')
+    if len(segments) % 2 == 0:
+        # Unbalanced quotes: let the regex tokenizer sort it out
+        return _tokenize_regex(_restore(line) if escaped else line)
+    unquoted = "".join(segments[::2]) if len(segments) > 1 else line
+    words = unquoted.split()
+    position = 1
+    while position < len(words) and "=" not in words[position]:
+        position += 1
+    try:
+        attrs = dict([word.split("=", 1) for word in words[position:]])
+    except ValueError:
+        return _tokenize_regex(_restore(line) if escaped else line)
+    if escaped and ("\\" in unquoted or "\x01" in unquoted or "\x02" in unquoted):
+        attrs = {key: _decode(value) for key, value in attrs.items()}
+    for number in range(1, len(segments), 2):
+        # Quoted value: belongs to the ``key=`` word right before it
+        key = segments[number - 1].rpartition(" ")[2][:-1]
+        if attrs.get(key) != "":
+            return _tokenize_regex(_restore(line) if escaped else line)
+        attrs[key] = _decode(segments[number]) if escaped else segments[number]
+    return attrs
+
+
+def parse_line(line, record=TerseRecord):
+    """Parse a single terse line, returning ``None`` for lines that hold no item.
+
+    Only the item number and flags in front of the first ``key=`` are read
+    here; attributes are read from the line when asked for (see
+    ``TerseRecord``).
+    """
+    equals = line.find("=")
+    space = line.rfind(" ", 0, equals)
+    if equals < 0 or space < 0:
+        return None
+    head = line[:space].strip()
+    if head.isdigit():
+        return record(int(head), "", None, line)
+    head = head.split()
+    if not head or not head[0].isdigit():
+        return None
+    return record(int(head[0]), "".join(head[1:]), None, line)
+
+
+def parse_pairs(text):
+    """``key=value`` words of a command line or export line as a dict of plain values."""
+    return {key: unquote(value) if value[:1] == '"' else value for key, value in _PAIR_RE.findall(text)}
+
+
+def iter_terse(text, record=TerseRecord):
+    """Yield a record for every item line in ``print terse`` output."""
+    for line in text.splitlines():
+        item = parse_line(line, record)
+        if item is not None:
+            yield item
+
+
+def parse_terse(text, record=TerseRecord):
+    """Parse a whole ``print terse`` table into a list of records."""
+    return [item for item in [parse_line(line, record) for line in text.splitlines()] if item is not None]
+
+
+def parse_rate(value):
+    """Convert a RouterOS rate such as ``10M``, ``512k`` or ``1500`` to bits per second."""
+    value = value.strip()
+    if not value:
+        return 0
+    multiplier = {"k": 1000, "K": 1000, "M": 1000 ** 2, "G": 1000 ** 3}.get(value[-1])
+    if multiplier:
+        return round(float(value[:-1]) * multiplier)
+    return int(float(value))
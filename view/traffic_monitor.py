@@ -0,0 +1,296 @@
+import threading
+import time
+
+import connection_pool
+import executor
+import instrumentation
+import metrics_store
+import storage
+import terse
+
+VIEWER_TIMEOUT = 30      # stop streaming this long after the last page view
+RECONNECT_DELAY = 2.0
+READ_TIMEOUT = 1.0
+
+# Series written to the metrics store per interface and per queue
+METRIC_FIELDS = {"interfaces": ("interface", ("rx", "tx")), "queues": ("queue", ("up", "down"))}
+
+# Fields of ``monitor-traffic`` output that are kept, with the names used in samples
+MONITOR_FIELDS = {
+    "rx-bits-per-second": "rx",
+    "tx-bits-per-second": "tx",
+    "rx-packets-per-second": "rx_pps",
+    "tx-packets-per-second": "tx_pps",
+}
+
+
+def parse_speed(value):
+    """Convert ``12.3kbps``/``1520bps``/``3Mbps`` (or a plain count) to a number."""
+    value = value.strip()
+    if value.endswith("bps"):
+        value = value[:-3]
+    try:
+        return terse.parse_rate(value) if value else 0
+    except ValueError:
+        return 0
+
+
+class MonitorParser:
+    """Incremental parser for the column output of ``/interface monitor-traffic``.
+
+    Feed it whatever the channel returned; it keeps partial lines and a
+    partial frame between calls and returns every completed frame as
+    ``{interface: {"rx": bps, "tx": bps, "rx_pps": n, "tx_pps": n}}``.
+    """
+
+    def __init__(self):
+        self._partial = ""
+        self._names = None
+        self._values = {}
+
+    def _finish(self, frames):
+        if self._names and self._values:
+            columns = {field: self._values.get(field, []) for field in MONITOR_FIELDS.values()}
+            frames.append({
+                name: {field: values[i] if i < len(values) else 0 for field, values in columns.items()}
+                for i, name in enumerate(self._names)
+            })
+        self._names, self._values = None, {}
+
+    def feed(self, text):
+        frames = []
+        lines = (self._partial + text.replace("\r", "")).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            key, sep, rest = line.partition(":")
+            key = key.strip()
+            if not sep or not key or key.startswith("--"):
+                if not line.strip() or key.startswith("--"):
+                    self._finish(frames)        # blank line or the key help line ends a frame
+                continue
+            if key == "name":
+                self._finish(frames)
+                self._names = rest.split()
+            elif self._names is not None and key in MONITOR_FIELDS:
+                self._values[MONITOR_FIELDS[key]] = [parse_speed(v) for v in rest.split()]
+        return frames
+
+
+def queue_frame(text):
+    """Build a queue frame from ``/queue simple print stats terse`` output.
+
+    Returns ``{queue name: {"target", "up", "down", "bytes_up", "bytes_down"}}``
+    with rates in bits per second and byte counters since the last reset.
+    """
+    return records_frame(terse.iter_terse(text, terse.QueueRecord))
+
+
+def records_frame(records):
+    """Queue frame from ``QueueRecord``s, however they were read."""
+    frame = {}
+    for record in records:
+        up, _, down = record.get("rate", "0/0").partition("/")
+        bytes_up, _, bytes_down = record.get("bytes", "0/0").partition("/")
+        frame[record.name] = {
+            "target": record.target,
+            "up": parse_speed(up), "down": parse_speed(down or "0"),
+            "bytes_up": int(bytes_up or 0), "bytes_down": int(bytes_down or 0),
+        }
+    return frame
+
+
+class QueueParser:
+    """Incremental parser for the looped ``/queue simple print stats terse`` script.
+
+    Each loop ends with a marker line; returns completed frames as built
+    by ``queue_frame``.
+    """
+
+    def __init__(self, marker):
+        self._marker = marker
+        self._partial = ""
+        self._lines = []
+
+    def feed(self, text):
+        frames = []
+        lines = (self._partial + text.replace("\r", "")).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            if line.strip() != self._marker:
+                self._lines.append(line)
+                continue
+            frames.append(queue_frame("\n".join(self._lines)))
+            self._lines = []
+        return frames
+
+
+class TrafficMonitor:
+    """Streams interface and queue statistics for one router over long-lived channels.
+
+    Two commands keep running on the router, each on its own channel of
+    the pooled transport: ``monitor-traffic`` for every interface, and a
+    script that prints queue stats once a second. Their output is parsed
+    as it arrives, so a page refresh only reads the latest sample; history
+    goes to listeners such as the metrics store. The monitor stops itself
+    once nobody has looked at it for ``VIEWER_TIMEOUT``. On a RouterOS API
+    connection ``monitor-traffic`` runs as a tagged request on the shared
+    socket and queue stats are polled instead.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self.latest_interfaces = {}
+        self.latest_queues = {}
+        self.error = None
+        self.listeners = []           # called as listener(kind, timestamp, frame)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_view = time.monotonic()
+        self._threads = []
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._run, args=("interfaces",), name="monitor-traffic", daemon=True),
+            threading.Thread(target=self._run, args=("queues",), name="monitor-queues", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads) and not self._stop.is_set()
+
+    def touch(self):
+        """Record a page view; keeps the streams alive."""
+        self._last_view = time.monotonic()
+
+    def snapshot(self):
+        """Latest interface and queue frames, safe to read from the page."""
+        with self._lock:
+            return {"interfaces": dict(self.latest_interfaces), "queues": dict(self.latest_queues)}
+
+    def _record(self, kind, frame):
+        now = time.time()
+        with self._lock:
+            if kind == "interfaces":
+                self.latest_interfaces = frame
+            else:
+                self.latest_queues = frame
+            self.error = None
+        for listener in list(self.listeners):
+            listener(kind, now, frame)
+
+    def _command(self, client, kind):
+        if kind == "interfaces":
+            names = [r.name for r in executor.query(client, "/interface print terse", terse.InterfaceRecord)
+                     if not r.disabled]
+            return f"/interface monitor-traffic interface={executor.quote(','.join(names))}", MonitorParser()
+        marker = f"{executor.MARKER} frame"
+        script = f':while (true) do={{ /queue simple print stats terse; :put "{marker}"; :delay 1s }}'
+        return script, QueueParser(marker)
+
+    def _idle(self):
+        return time.monotonic() - self._last_view > VIEWER_TIMEOUT
+
+    def _run(self, kind):
+        while not self._stop.is_set() and not self._idle():
+            try:
+                with connection_pool.lease(self.router) as client:
+                    self._stream(client, kind)
+            except Exception as e:
+                self.error = f"{kind}: {e}"
+                self._stop.wait(RECONNECT_DELAY)
+        self._stop.set()
+
+    def _stream(self, client, kind):
+        if getattr(client, "is_api", False):
+            self._stream_api(client, kind)
+            return
+        command, parser = self._command(client, kind)
+        started = time.perf_counter()
+        channel = client.get_transport().open_session(timeout=executor.DEFAULT_TIMEOUT)
+        instrumentation.channel_opened(client, time.perf_counter() - started)
+        try:
+            channel.settimeout(READ_TIMEOUT)
+            channel.exec_command(command)
+            while not self._stop.is_set() and not self._idle():
+                try:
+                    data = channel.recv(executor.READ_SIZE)
+                except TimeoutError:
+                    continue
+                if not data:
+                    raise ConnectionError("stream closed by the router")
+                instrumentation.transferred(client, len(data))
+                for frame in parser.feed(data.decode(errors="replace")):
+                    self._record(kind, frame)
+        finally:
+            channel.close()
+
+    def _stream_api(self, client, kind):
+        """API version of ``_stream``: ``monitor-traffic`` replies arrive as rows, queues are polled."""
+        import api_cli
+
+        if kind == "queues":
+            while not self._stop.is_set() and not self._idle():
+                rows = client.talk(["/queue/simple/print", "=stats="])
+                self._record(kind, records_frame(api_cli.to_records(rows, terse.QueueRecord)))
+                self._stop.wait(1.0)
+            return
+
+        names = [r.name for r in executor.query(client, "/interface print terse", terse.InterfaceRecord)
+                 if not r.disabled]
+        pending = {}
+
+        def on_row(row):
+            # One row per interface and second; a frame is complete once every name has reported
+            pending[row.get("name", "")] = {field: parse_speed(row.get(key, "0"))
+                                            for key, field in MONITOR_FIELDS.items()}
+            if len(pending) >= len(names):
+                self._record(kind, dict(pending))
+                pending.clear()
+
+        request = client.submit(["/interface/monitor-traffic", f"=interface={','.join(names)}"], on_row)
+        try:
+            while not self._stop.is_set() and not self._idle():
+                if request.done.wait(READ_TIMEOUT):
+                    request.result(0)
+                    raise ConnectionError("stream closed by the router")
+        finally:
+            client.cancel(request)
+
+
+def metrics_recorder(store):
+    """Listener that writes every frame's rates into a ``metrics_store.MetricsStore``."""
+    def record(kind, timestamp, frame):
+        prefix, fields = METRIC_FIELDS[kind]
+        store.record(timestamp, {f"{prefix}/{name}/{field}": sample[field]
+                                 for name, sample in frame.items() for field in fields})
+    return record
+
+
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def get_monitor(router):
+    """Return the running monitor for ``router``, starting one if needed."""
+    with _monitors_lock:
+        monitor = _monitors.get(router)
+        if monitor is None or not monitor.running:
+            monitor = TrafficMonitor(router)
+            monitor.listeners.append(metrics_recorder(metrics_store.get_store(storage.router_id(router))))
+            monitor.start()
+            _monitors[router] = monitor
+    monitor.touch()
+    return monitor
+
+
+def stop_monitor(router):
+    with _monitors_lock:
+        monitor = _monitors.pop(router, None)
+    if monitor is not None:
+        monitor.stop()
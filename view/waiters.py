@@ -0,0 +1,56 @@
+import time
+
+DEFAULT_DEADLINE = 30.0   # seconds before giving up
+FIRST_DELAY = 0.1         # first poll comes quickly; small actions finish fast
+MAX_DELAY = 2.0
+BACKOFF = 1.6
+
+
+class WaitTimeout(TimeoutError):
+    """The router did not reach the expected state before the deadline."""
+
+
+def wait_until(check, deadline=DEFAULT_DEADLINE, first_delay=FIRST_DELAY, max_delay=MAX_DELAY,
+               backoff=BACKOFF, description="router"):
+    """Poll ``check()`` until it returns something truthy and return that value.
+
+    The delay between polls starts at ``first_delay`` and grows by
+    ``backoff`` up to ``max_delay``. Exceptions raised by ``check`` count as
+    "not done yet". Raises ``WaitTimeout`` once ``deadline`` seconds pass.
+    """
+    end = time.monotonic() + deadline
+    delay = first_delay
+    last_error = None
+    while True:
+        try:
+            value = check()
+            if value:
+                return value
+        except Exception as e:
+            last_error = e
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            detail = f": {last_error}" if last_error else ""
+            raise WaitTimeout(f"{description} not ready after {deadline:.0f}s{detail}")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * backoff, max_delay)
+
+
+def wait_for_stable_file(sftp, path, deadline=120.0, stable_polls=2):
+    """Wait until ``path`` exists with a non-zero size that stops changing.
+
+    Returns the final size. The size has to be unchanged for
+    ``stable_polls`` consecutive polls.
+    """
+    state = {"size": None, "same": 0}
+
+    def check():
+        size = sftp.stat(path).st_size
+        if size and size == state["size"]:
+            state["same"] += 1
+        else:
+            state["same"] = 0
+        state["size"] = size
+        return size if state["same"] >= stable_polls - 1 and state["size"] else None
+
+    return wait_until(check, deadline=deadline, description=path)
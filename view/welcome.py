@@ -1,6 +1,6 @@
 import streamlit as st
 
-st.title("Welcome")
 def run():
+    st.title("Welcome")
     st.header("You are at the **Main Page**")
     st.write("Klik tombol di sidebar untuk berpindah ke halaman lain.")